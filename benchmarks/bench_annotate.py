@@ -0,0 +1,214 @@
+"""Benchmarks for the overhead of :func:`doctor.annotate`.
+
+Each case times calls to an annotated function and to the same function
+undecorated, and reports the difference per call. Results can be saved as a
+baseline and compared against later, e.g. before and after an upgrade:
+
+    python benchmarks/bench_annotate.py --save baseline.json
+    python benchmarks/bench_annotate.py --compare baseline.json
+
+When comparing, the script exits with status 1 if any case's overhead grew
+by more than the threshold.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import sys
+import timeit
+
+from doctor import PASSTHROUGH, annotate
+from doctor._schema import Schema
+
+
+schema = Schema({
+    'definitions': {
+        'name': {'type': 'string', 'maxLength': 64},
+        'age': {'type': 'integer', 'minimum': 0},
+        'email': {'type': 'string', 'pattern': '^[^@]+@[^@]+$'},
+        'address': {
+            'type': 'object',
+            'properties': {
+                'street': {'type': 'string'},
+                'city': {'type': 'string'},
+                'zip': {'type': 'string', 'pattern': '^[0-9]{5}$'},
+            },
+            'required': ['street', 'city'],
+        },
+        'person': {
+            'type': 'object',
+            'properties': {
+                'name': {'$ref': '#/definitions/name'},
+                'age': {'$ref': '#/definitions/age'},
+                'address': {'$ref': '#/definitions/address'},
+            },
+            'required': ['name'],
+        },
+        'ages': {'type': 'array', 'items': {'$ref': '#/definitions/age'}},
+    },
+})
+
+PERSON = {'name': 'Ada', 'age': 36,
+          'address': {'street': '1 Main St', 'city': 'London',
+                      'zip': '12345'}}
+
+
+def named_definitions(name, age, email):
+    return name
+
+
+def list_of_names(name, age, email):
+    return name
+
+
+def inline_dict(name, age, email):
+    return name
+
+
+def passthrough(name, age, email):
+    return name
+
+
+def nested_object(person):
+    return person
+
+
+def large_array(ages):
+    return ages
+
+
+class Service(object):
+
+    def method(self, name, age, email):
+        return name
+
+
+def create_cases():
+    """Return a list of (name, plain function, annotated function, args)."""
+    service = Service()
+    annotated_service = Service()
+    annotated_service.method = annotate(schema, is_method=True)(
+        Service.method).__get__(annotated_service, Service)
+    args = ('Ada', 36, 'ada@example.com')
+    return [
+        ('named_definitions', named_definitions,
+         annotate(schema)(named_definitions), args),
+        ('list_of_names', list_of_names,
+         annotate(schema, args=['name', 'age', 'email'],
+                  required_args=['name'])(list_of_names), args),
+        ('inline_dict', inline_dict,
+         annotate(schema, args={
+             'type': 'object',
+             'properties': {
+                 'name': {'type': 'string'},
+                 'age': {'type': 'integer'},
+                 'email': {'type': 'string'},
+             },
+         })(inline_dict), args),
+        ('nested_object', nested_object,
+         annotate(schema, args={
+             'type': 'object',
+             'properties': {'person': {'$ref': '#/definitions/person'}},
+         }, result='person')(nested_object), (PERSON,)),
+        ('large_array', large_array,
+         annotate(schema, result='ages')(large_array),
+         (list(range(1000)),)),
+        ('is_method', service.method, annotated_service.method, args),
+        ('passthrough', passthrough,
+         annotate(schema, mode=PASSTHROUGH)(passthrough), args),
+    ]
+
+
+def time_call(func, args, number, repeat):
+    """Return the best time per call of func(*args), in nanoseconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def run(number, repeat, names=None):
+    """Run the benchmarks.
+
+    :param int number: Calls per timing.
+    :param int repeat: Timings per case. The best one is used.
+    :param list[str] names: If specified, only run these cases.
+    :returns: A dict mapping case names to dicts with 'plain' and
+        'annotated' times and the 'overhead' of annotation, in nanoseconds
+        per call.
+    """
+    results = {}
+    for name, plain, annotated, args in create_cases():
+        if names and name not in names:
+            continue
+        plain_time = time_call(plain, args, number, repeat)
+        annotated_time = time_call(annotated, args, number, repeat)
+        results[name] = {
+            'plain': plain_time,
+            'annotated': annotated_time,
+            'overhead': annotated_time - plain_time,
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare results to a baseline.
+
+    :param dict results: Results from :func:`run`.
+    :param dict baseline: Results from an earlier run.
+    :param float threshold: The fraction the overhead can grow by before it
+        counts as a regression.
+    :returns: A list of the names of cases that regressed.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        if result['overhead'] > baseline[name]['overhead'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('cases', nargs='*', help='Cases to run (default all)')
+    parser.add_argument('--number', type=int, default=10000,
+                        help='Calls per timing')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timings per case')
+    parser.add_argument('--save', metavar='PATH',
+                        help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='Compare the results to a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed growth in overhead (default 0.2)')
+    options = parser.parse_args(argv)
+
+    results = run(options.number, options.repeat, options.cases)
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as fp:
+            baseline = json.load(fp)
+
+    print('{:<20} {:>12} {:>12} {:>12} {:>10}'.format(
+        'case', 'plain ns', 'annotated ns', 'overhead ns', 'baseline'))
+    for name, result in sorted(results.items()):
+        change = ''
+        if name in baseline and baseline[name]['overhead'] > 0:
+            change = '{:+.0%}'.format(
+                result['overhead'] / baseline[name]['overhead'] - 1)
+        print('{:<20} {:>12.0f} {:>12.0f} {:>12.0f} {:>10}'.format(
+            name, result['plain'], result['annotated'], result['overhead'],
+            change))
+
+    if options.save:
+        with open(options.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    regressions = compare(results, baseline, options.threshold)
+    if regressions:
+        print('Regressions: {}'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
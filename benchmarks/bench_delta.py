@@ -0,0 +1,115 @@
+"""Benchmarks for validating large, mostly unchanged values with delta.
+
+Each case calls an annotated function with a large configuration document,
+changing one value between calls, and times it with and without
+``delta=True``:
+
+    python benchmarks/bench_delta.py
+
+Delta validation fingerprints every dict and list in the document on each
+call, so it only pays off when validating the unchanged parts would cost
+more than fingerprinting them. That's the case when the schema uses
+keywords that aren't compiled (like multipleOf or uniqueItems), which are
+checked by jsonschema instead. For schemas that are compiled entirely,
+validating the whole document is usually faster.
+"""
+from __future__ import print_function
+
+import argparse
+import sys
+import timeit
+
+from doctor import annotate
+from doctor._schema import Schema
+
+
+def make_schema(port):
+    return Schema({
+        'definitions': {
+            'server': {
+                'type': 'object',
+                'properties': {
+                    'host': {'type': 'string', 'maxLength': 64},
+                    'port': port,
+                },
+                'required': ['host'],
+            },
+        },
+    })
+
+
+#: Schemas whose keywords are all compiled, and one that falls back to
+#: jsonschema for multipleOf.
+SCHEMAS = {
+    'compiled': make_schema({'type': 'integer', 'minimum': 1}),
+    'fallback': make_schema({'type': 'integer', 'multipleOf': 1}),
+}
+
+
+def make_config(servers, depth):
+    """Return a document with servers entries in depth levels of dicts."""
+    if depth == 1:
+        return dict(('s{}'.format(i), {'host': 'host{}'.format(i),
+                                       'port': i + 1})
+                    for i in range(servers))
+    width = int(round(servers ** (1.0 / depth)))
+    return dict(('g{}'.format(i), make_config(servers // width, depth - 1))
+                for i in range(width))
+
+
+def make_args_schema(depth):
+    schema = {'$ref': '#/definitions/server'}
+    for _ in range(depth):
+        schema = {'type': 'object', 'additionalProperties': schema}
+    return {'type': 'object', 'properties': {'config': schema}}
+
+
+def first_server(config):
+    while 'host' not in config:
+        config = config[sorted(config)[0]]
+    return config
+
+
+def time_case(schema, depth, servers, delta, number, repeat):
+    """Return the best time per call, in microseconds."""
+    @annotate(schema, args=make_args_schema(depth), delta=delta)
+    def func(config):
+        return config
+
+    config = make_config(servers, depth)
+    server = first_server(config)
+    calls = [0]
+
+    def call():
+        calls[0] += 1
+        server['port'] = calls[0]
+        func(config)
+
+    timer = timeit.Timer(call)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--servers', type=int, default=2000,
+                        help='Entries in the document')
+    parser.add_argument('--number', type=int, default=50,
+                        help='Calls per timing')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timings per case')
+    options = parser.parse_args(argv)
+
+    print('{:<10} {:>6} {:>12} {:>12}'.format(
+        'schema', 'depth', 'full us', 'delta us'))
+    for name in sorted(SCHEMAS):
+        for depth in (1, 3):
+            times = [time_case(SCHEMAS[name], depth, options.servers, delta,
+                               options.number, options.repeat)
+                     for delta in (False, True)]
+            print('{:<10} {:>6} {:>12.0f} {:>12.0f}'.format(
+                name, depth, *times))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
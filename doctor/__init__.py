@@ -2,5 +2,21 @@
 
 from doctor._version import __name__, __version__
 
-from doctor._annotation import annotate, Annotation
+from doctor._annotation import (
+    annotate, Annotation, LazyAnnotation, set_lazy, warmup)
+from doctor._background import BackgroundValidator
+from doctor._cache import ValidationCache
+from doctor._delta import DeltaCache
+from doctor._diskcache import DiskCache
+from doctor._errors import FastValidationError, WarmupError
+from doctor._metrics import (
+    FunctionMetrics, get_metrics, reset_metrics, set_metrics,
+    snapshot_metrics)
+from doctor._mode import (
+    EveryNth, FirstN, FULL, PASSTHROUGH, Sampled, ValidationMode, get_mode,
+    set_mode)
+from doctor._registry import get_annotation, get_annotations
+from doctor._resolver import (
+    CachingRefResolver, ResolutionCache, resolution_cache)
+from doctor._tracing import add_hook, remove_hook
 from doctor._util import get_wrapped, with_wraps
@@ -0,0 +1,6 @@
+import sys
+
+from doctor._cli import main
+
+
+sys.exit(main())
@@ -1,9 +1,31 @@
 import functools
 import inspect
+import sys
+import threading
 
+from doctor import _metrics, _mode, _registry, _tracing
+from doctor._background import BackgroundValidator, get_background
+from doctor._cache import ValidationCache
+from doctor._coerce import get_coercers
+from doctor._compiler import compile_properties_collector
+from doctor._delta import DeltaCache
+from doctor._errors import FastValidationError, WarmupError
 from doctor._schema import Schema
 from doctor._util import UNSET, get_wrapped, make_schema_dict, with_wraps
 
+if sys.version_info >= (3, 5):
+    from doctor import _async
+else:
+    _async = None
+
+#: If True, annotations are created when first needed rather than when
+#: functions are decorated. See :func:`set_lazy`.
+lazy_by_default = False
+
+#: Lazy annotations that haven't been created yet.
+_pending = set()
+_pending_lock = threading.Lock()
+
 
 class Annotation(object):
 
@@ -23,15 +45,65 @@ class Annotation(object):
     :param Schema schema:
     :param dict args_schema:
     :param dict results_schema:
+    :param function args_validator: Compiled version of args_schema. See
+        :meth:`Schema.compile`.
+    :param function result_validator: Compiled version of result_schema.
+    :param dict args_view: Dereferenced version of args_schema, used when
+        validating with the schema's validator. See
+        :meth:`Schema.dereference`. Defaults to args_schema.
+    :param dict result_view: Dereferenced version of result_schema.
+        Defaults to result_schema.
+    :param ValidationCache args_cache: If specified, arguments that have
+        already been validated are looked up in this cache instead of being
+        validated again.
+    :param ValidationMode mode: Decides which calls are validated. If None,
+        the global mode is used. See :func:`set_mode`.
+    :param function properties_collector: A compiled function to use as
+        :attr:`collect_properties`. Defaults to one that works for any
+        arguments.
+    :param bool stream: If True, the function's result is treated as an
+        iterable, and each item is validated as it's consumed. See
+        :meth:`validate_result_stream`.
+    :param dict result_items_view: Dereferenced schema for each item of a
+        streamed result.
+    :param function result_items_validator: Compiled version of
+        result_items_view.
+    :param FunctionMetrics metrics: Where to record validation metrics for
+        the function, when metrics are enabled. See :func:`set_metrics`.
+    :param bool fast_fail: If True, invalid arguments and results raise a
+        :class:`FastValidationError` instead of a detailed error.
+    :param BackgroundValidator background: If specified, results are
+        validated by this instead of when the function returns.
+    :param bool coerce: If True, string arguments are converted to the
+        types their schemas declare as they're collected. See
+        :meth:`coerce_args`.
+    :param DeltaCache delta: If specified, arguments and results are
+        validated using this, so only the parts that changed since earlier
+        calls are validated.
     """
 
+    # There can be thousands of annotations, so they don't have a __dict__.
+    __slots__ = ('annotated_func', 'func', 'is_method', 'arg_names',
+                 'args_name', 'kwargs_name', 'default_values', 'schema',
+                 'args_schema', 'result_schema', 'args_validator',
+                 'result_validator', 'args_view', 'result_view', 'args_cache',
+                 'mode', 'call_count', 'collect_properties', 'stream',
+                 'result_items_view', 'result_items_validator', 'metrics',
+                 'fast_fail', 'background', 'coerce', 'coerced_args', 'delta',
+                 'dependencies', '__weakref__')
+
     _iterable_properties = ('annotated_func', 'func', 'is_method', 'arg_names',
                             'args_name', 'kwargs_name', 'default_values',
                             'schema', 'args_schema', 'result_schema')
 
     def __init__(self, annotated_func, func, is_method, arg_names, args_name,
                  kwargs_name, default_values, schema, args_schema=None,
-                 result_schema=None):
+                 result_schema=None, args_validator=None,
+                 result_validator=None, args_view=None, result_view=None,
+                 args_cache=None, mode=None, properties_collector=None,
+                 stream=False, result_items_view=None,
+                 result_items_validator=None, metrics=None,
+                 fast_fail=False, background=None, coerce=False, delta=None):
         self.annotated_func = annotated_func
         self.func = func
         self.is_method = is_method
@@ -42,6 +114,32 @@ class Annotation(object):
         self.schema = schema
         self.args_schema = args_schema
         self.result_schema = result_schema
+        self.args_validator = args_validator
+        self.result_validator = result_validator
+        self.args_view = args_schema if args_view is None else args_view
+        self.result_view = (result_schema if result_view is None
+                            else result_view)
+        self.args_cache = args_cache
+        self.mode = mode
+        self.call_count = 0
+        if properties_collector is None:
+            properties_collector = self._collect_properties
+        #: Returns a dict of properties for validation, from the positional
+        #: and keyword arguments of a call. This is compiled for the
+        #: function's arguments by :meth:`refresh`.
+        self.collect_properties = properties_collector
+        self.stream = stream
+        self.result_items_view = result_items_view
+        self.result_items_validator = result_items_validator
+        self.metrics = metrics
+        self.fast_fail = fast_fail
+        self.background = background
+        self.coerce = coerce
+        self.coerced_args = ()
+        self.delta = delta
+        self.dependencies = frozenset()
+
+    __hash__ = object.__hash__
 
     def __iter__(self):
         for attr in self._iterable_properties:
@@ -58,7 +156,70 @@ class Annotation(object):
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def collect_properties(self, call_args, call_kwargs):
+    def refresh(self):
+        """Compile and dereference the annotation's schemas.
+
+        This is called when the annotation is created, and again by
+        :meth:`Schema.reload` if any definitions the schemas depend on have
+        changed.
+
+        :raises TypeError: if stream is True and result_schema doesn't have
+            an items schema.
+        """
+        # Compile the schemas up front, so calls don't have to go through
+        # the generic validator unless validation fails. Detailed errors are
+        # generated using dereferenced views of the schemas, so the resolver
+        # isn't needed for flat definitions.
+        schema = self.schema
+        dependencies = set()
+        self.args_validator = None
+        self.args_view = self.args_schema
+        if self.args_schema is not None:
+            self.args_validator = schema.compile(self.args_schema)
+            self.args_view = schema.dereference(self.args_schema)
+            properties = {}
+            if isinstance(self.args_view, dict):
+                properties = self.args_view.get('properties', {})
+            coercers = None
+            if self.coerce:
+                coercers = get_coercers(properties)
+                self.coerced_args = tuple(
+                    (index, name) for index, name in enumerate(self.arg_names)
+                    if name in coercers)
+            self.collect_properties = compile_properties_collector(
+                self.arg_names, properties, coercers)
+            dependencies.update(schema.references(self.args_schema))
+        self.result_validator = None
+        self.result_view = self.result_schema
+        if self.result_schema is not None:
+            self.result_validator = schema.compile(self.result_schema)
+            self.result_view = schema.dereference(self.result_schema)
+            dependencies.update(schema.references(self.result_schema))
+        if self.delta is not None:
+            # Hashes of values that were valid might not be any more.
+            self.delta.clear()
+            if self.args_schema is not None:
+                self.args_validator = self.delta.compile(schema,
+                                                         self.args_view)
+            if self.result_schema is not None and not self.stream:
+                self.result_validator = self.delta.compile(schema,
+                                                           self.result_view)
+
+        self.result_items_view = self.result_items_validator = None
+        if self.stream:
+            if isinstance(self.result_view, dict):
+                self.result_items_view = self.result_view.get('items')
+            if not isinstance(self.result_items_view, dict):
+                raise TypeError(('stream requires a result schema with an '
+                                 'items schema (was {!r})').format(
+                                     self.result_schema))
+            self.result_items_validator = schema.compile(
+                self.result_items_view)
+
+        #: Absolute URLs of the references the schemas depend on.
+        self.dependencies = frozenset(dependencies)
+
+    def _collect_properties(self, call_args, call_kwargs):
         """Return a dict of properties for validation.
 
         :param tuple call_args: Positional arguments from the function call.
@@ -75,6 +236,261 @@ class Annotation(object):
                 properties[name] = call_kwargs[name]
         return properties
 
+    def coerce_args(self, call_args, call_kwargs, properties=None):
+        """Replace arguments with the values they were coerced to.
+
+        In coerce mode, :attr:`collect_properties` converts string arguments
+        to the types declared by their schemas, so they can be validated and
+        passed to the function without another pass over the arguments.
+
+        :param tuple call_args: Positional arguments from the function call.
+        :param dict call_kwargs: Keyword arguments from the function call.
+            This is updated in place.
+        :param dict properties: Result of :attr:`collect_properties`. If not
+            specified, the properties are collected.
+        :returns: A tuple of the new positional and keyword arguments.
+        """
+        if properties is None:
+            properties = self.collect_properties(call_args, call_kwargs)
+        args = None
+        for index, name in self.coerced_args:
+            if name not in properties:
+                continue
+            if index < len(call_args):
+                if args is None:
+                    args = list(call_args)
+                args[index] = properties[name]
+            else:
+                call_kwargs[name] = properties[name]
+        if args is not None:
+            call_args = tuple(args)
+        return call_args, call_kwargs
+
+    def validate_args(self, properties):
+        """Validate properties collected from the function's arguments.
+
+        The compiled validator is used if there is one. The schema's
+        validator is only used to raise a detailed error if the compiled
+        validator finds a problem (or if there is no compiled validator). In
+        fast fail mode, a :class:`FastValidationError` is raised instead.
+
+        :param dict properties: Result of :attr:`collect_properties`.
+        :raises jsonschema.ValidationError:
+        """
+        fingerprint = None
+        if self.args_cache is not None:
+            fingerprint = self.args_cache.fingerprint(properties)
+            if fingerprint is not None and fingerprint in self.args_cache:
+                return
+        if self.args_validator is None:
+            self.schema.validator.validate(properties, self.args_view)
+        else:
+            failure = self.args_validator(properties)
+            if failure is not None:
+                if self.fast_fail:
+                    raise FastValidationError(*failure)
+                self.schema.validator.validate(properties, self.args_view)
+        if fingerprint is not None:
+            self.args_cache.add(fingerprint)
+
+    def validate_result(self, result):
+        """Validate the result of the function.
+
+        :param result: Value returned by the function.
+        :raises jsonschema.ValidationError:
+        """
+        if self.result_validator is None:
+            self.schema.validator.validate(result, self.result_view)
+        else:
+            failure = self.result_validator(result)
+            if failure is not None:
+                if self.fast_fail:
+                    raise FastValidationError(*failure)
+                self.schema.validator.validate(result, self.result_view)
+
+    def is_valid_args(self, properties):
+        """Return True if properties collected from the function's
+        arguments are valid. No errors are built for invalid arguments.
+
+        :param dict properties: Result of :attr:`collect_properties`.
+        :returns: bool
+        """
+        if self.args_validator is None:
+            return self.schema.validator.is_valid(properties, self.args_view)
+        return self.args_validator(properties) is None
+
+    def is_valid_result(self, result):
+        """Return True if a result of the function is valid.
+
+        :param result: Value returned by the function.
+        :returns: bool
+        """
+        if self.result_validator is None:
+            return self.schema.validator.is_valid(result, self.result_view)
+        return self.result_validator(result) is None
+
+    def validate_result_item(self, item, index):
+        """Validate a single item from a streamed result.
+
+        :param item: The item to validate.
+        :param int index: Index of the item in the result. This is added to
+            the path of any validation error.
+        :raises jsonschema.ValidationError:
+        """
+        if self.result_items_validator is not None:
+            failure = self.result_items_validator(item)
+            if failure is None:
+                return
+            if self.fast_fail:
+                raise FastValidationError((index,) + failure[0], failure[1])
+        error = next(self.schema.validator.iter_errors(
+            item, self.result_items_view), None)
+        if error is not None:
+            error.path.appendleft(index)
+            raise error
+
+    def validate_result_stream(self, result):
+        """Return an iterator that validates items from result lazily.
+
+        Each item is validated against the items schema of result_schema as
+        it's consumed, so the result never needs to be held in memory.
+
+        :param result: An iterable returned by the function.
+        :returns: iterator
+        """
+        iterator = iter(result)
+        try:
+            for index, item in enumerate(iterator):
+                self.validate_result_item(item, index)
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def begin_call(self, call_args, call_kwargs, traced=False, check=True):
+        """Start a call to the annotated function.
+
+        The call is counted in the function's metrics, and the validation
+        mode decides whether it's validated. If it is, the arguments are
+        collected and validated (see :meth:`check_args`). Either way, they
+        are coerced in coerce mode.
+
+        :param tuple call_args: Positional arguments from the function call.
+        :param dict call_kwargs: Keyword arguments from the function call.
+        :param bool traced: If True, the phases are reported to the tracing
+            hooks.
+        :param bool check: If False, the collected properties are returned
+            instead of being validated, and should be passed to
+            :meth:`check_args` before the function is called.
+        :returns: A tuple of (call_args, call_kwargs, properties, metrics,
+            validate). properties is None unless the arguments still need to
+            be validated, metrics is None if metrics are disabled, and
+            validate is False if the call shouldn't be validated at all.
+        :raises jsonschema.ValidationError:
+        """
+        metrics = None
+        if _metrics.enabled:
+            metrics = self.metrics
+            if metrics is not None:
+                metrics.calls += 1
+        mode = self.mode
+        if mode is None:
+            mode = _mode.default_mode
+        if mode is not _mode.FULL and (mode is _mode.PASSTHROUGH or
+                                       not mode.should_validate(self)):
+            if self.coerced_args:
+                call_args, call_kwargs = self.coerce_args(call_args,
+                                                          call_kwargs)
+            return call_args, call_kwargs, None, metrics, False
+        if self.args_schema is None:
+            return call_args, call_kwargs, None, metrics, True
+        if traced:
+            properties = _tracing.trace(
+                self, _tracing.COLLECT, self.collect_properties, call_args,
+                call_kwargs)
+        else:
+            properties = self.collect_properties(call_args, call_kwargs)
+        if not check:
+            return call_args, call_kwargs, properties, metrics, True
+        call_args, call_kwargs = self.check_args(
+            call_args, call_kwargs, properties, metrics, traced)
+        return call_args, call_kwargs, None, metrics, True
+
+    def check_args(self, call_args, call_kwargs, properties, metrics=None,
+                   traced=False):
+        """Validate the arguments of a call, as collected by
+        :meth:`begin_call`.
+
+        :param tuple call_args: Positional arguments from the function call.
+        :param dict call_kwargs: Keyword arguments from the function call.
+        :param dict properties: Properties returned by :meth:`begin_call`.
+        :param FunctionMetrics metrics: If specified, validation is measured.
+        :param bool traced: If True, validation is reported to the tracing
+            hooks.
+        :returns: A tuple of the positional and keyword arguments to call the
+            function with. These are coerced in coerce mode.
+        :raises jsonschema.ValidationError:
+        """
+        if metrics is None and not traced:
+            self.validate_args(properties)
+        else:
+            _check(self, _tracing.ARGS, self.validate_args, properties,
+                   metrics, traced)
+        if self.coerced_args:
+            call_args, call_kwargs = self.coerce_args(call_args, call_kwargs,
+                                                      properties)
+        return call_args, call_kwargs
+
+    def check_result(self, result, metrics=None, traced=False):
+        """Validate the result of a call started with :meth:`begin_call`.
+
+        Streamed results are wrapped in a validating iterator, and results
+        are queued when validating in the background.
+
+        :param result: Value returned by the function.
+        :param FunctionMetrics metrics: If specified, validation is measured.
+        :param bool traced: If True, validation is reported to the tracing
+            hooks.
+        :returns: The value to return from the call.
+        :raises jsonschema.ValidationError:
+        """
+        if self.result_schema is None:
+            return result
+        if self.stream:
+            return self.validate_result_stream(result)
+        if self.background is not None:
+            self.background.submit(self, result)
+        elif metrics is None and not traced:
+            self.validate_result(result)
+        else:
+            _check(self, _tracing.RESULT, self.validate_result, result,
+                   metrics, traced)
+        return result
+
+    def validate_args_many(self, properties_list):
+        """Validate the properties for many calls in one pass.
+
+        :param properties_list: An iterable of dicts, as returned by
+            :attr:`collect_properties`.
+        :returns: A list of errors, with None for valid properties. See
+            :meth:`Schema.validate_many`.
+        """
+        return self.schema.validate_many(
+            properties_list, self.args_schema, validate=self.args_validator,
+            view=self.args_view)
+
+    def validate_result_many(self, results):
+        """Validate many results from the function in one pass.
+
+        :param results: An iterable of values returned by the function.
+        :returns: A list of errors, with None for valid results. See
+            :meth:`Schema.validate_many`.
+        """
+        return self.schema.validate_many(
+            results, self.result_schema, validate=self.result_validator,
+            view=self.result_view)
+
     @classmethod
     def create_args_schema(cls, schema, arg_names, default_values, is_method):
         """Create a schema using the annotated function's arguments.
@@ -102,7 +518,8 @@ class Annotation(object):
 
     @classmethod
     def create(cls, _callable, schema, args_schema=UNSET, result_schema=None,
-               is_method=False):
+               is_method=False, cache=None, mode=None, stream=False,
+               fast_fail=False, background=None, coerce=False, delta=None):
         """Create a new Annotation object for the given callable.
 
         :param callable _callable:
@@ -110,7 +527,26 @@ class Annotation(object):
         :param dict args_schema:
         :param dict result_schema:
         :param bool is_method:
+        :param cache: If True, cache valid arguments using a new
+            :class:`ValidationCache`. A cache instance can be passed to
+            configure its size and eviction policy.
+        :type cache: bool, ValidationCache, or None
+        :param ValidationMode mode:
+        :param bool stream: If True, validate the items of the result
+            lazily. result_schema must be an array schema with a single
+            items schema.
+        :param bool fast_fail:
+        :param background: If True, validate results with the shared
+            :class:`BackgroundValidator`. An instance can be passed to
+            configure the queue.
+        :type background: bool, BackgroundValidator, or None
+        :param bool coerce:
+        :param delta: If True, validate with a new :class:`DeltaCache`. A
+            cache instance can be passed to configure its size.
+        :type delta: bool, DeltaCache, or None
         :returns: Annotation
+        :raises TypeError: if stream is True and result_schema doesn't have
+            an items schema, or if both stream and background are used.
         """
         if not callable(_callable):
             raise TypeError('{!r} must be a callable (was {!s})'.format(
@@ -136,14 +572,218 @@ class Annotation(object):
             args_schema = cls.create_args_schema(schema, arg_names,
                                                  default_values, is_method)
 
-        return Annotation(_callable, func, is_method, arg_names, args_name,
-                          kwargs_name, default_values, schema,
-                          args_schema=args_schema, result_schema=result_schema)
+        if cache is True:
+            cache = ValidationCache()
+        elif cache is False:
+            cache = None
+        elif cache is not None and not isinstance(cache, ValidationCache):
+            raise TypeError(('cache should be a bool or an instance of '
+                             'ValidationCache (was {!r})').format(cache))
+        if background is True:
+            background = get_background()
+        elif background is False:
+            background = None
+        elif background is not None and not isinstance(
+                background, BackgroundValidator):
+            raise TypeError(('background should be a bool or an instance of '
+                             'BackgroundValidator (was {!r})').format(
+                                 background))
+        if background is not None and stream:
+            raise TypeError('background and stream cannot be used together')
+        if delta is True:
+            delta = DeltaCache()
+        elif delta is False:
+            delta = None
+        elif delta is not None and not isinstance(delta, DeltaCache):
+            raise TypeError(('delta should be a bool or an instance of '
+                             'DeltaCache (was {!r})').format(delta))
+        if mode is not None and not isinstance(mode, _mode.ValidationMode):
+            raise TypeError(('mode should be an instance of ValidationMode '
+                             '(was {!r})').format(mode))
+
+        annotation = Annotation(
+            _callable, func, is_method, arg_names, args_name, kwargs_name,
+            default_values, schema, args_schema=args_schema,
+            result_schema=result_schema, args_cache=cache, mode=mode,
+            stream=stream,
+            metrics=_metrics.get_metrics(_metrics.metrics_name(func)),
+            fast_fail=fast_fail, background=background, coerce=coerce,
+            delta=delta)
+        annotation.refresh()
+        schema.annotations.add(annotation)
+        return annotation
+
+
+def _check(annotation, phase, validate, value, metrics, traced):
+    # Call validate(value), measured for the metrics and reported to the
+    # tracing hooks as needed (at least one of them is). Phases are named
+    # like the metrics they're measured in.
+    if not traced:
+        metrics.measure(phase, validate, value)
+    elif metrics is None:
+        _tracing.trace(annotation, phase, validate, value)
+    else:
+        _tracing.trace(annotation, phase, metrics.measure, phase, validate,
+                       value)
+
+
+def _call(annotation, func, args, kwargs):
+    # Call an annotated function using tracing, metrics, coercion, streaming
+    # or background validation. The wrapper handles calls without these.
+    traced = bool(_tracing.hooks)
+    args, kwargs, _, metrics, validate = annotation.begin_call(args, kwargs,
+                                                               traced)
+    if traced:
+        result = _tracing.trace(annotation, _tracing.CALL, func, *args,
+                                **kwargs)
+    else:
+        result = func(*args, **kwargs)
+    if validate:
+        result = annotation.check_result(result, metrics, traced)
+    return result
+
+
+class LazyAnnotation(object):
+
+    """A placeholder for an annotation that hasn't been created yet.
+
+    When :func:`annotate` is used in lazy mode, this is attached to the
+    decorated function instead of an :class:`Annotation`. The real
+    annotation is created the first time the function is called, or the
+    first time an attribute of the placeholder is accessed. At that point
+    the placeholder replaces itself with the annotation on the function.
+
+    :param function func: The function the annotation is attached to.
+    :param callable create: Called with no arguments to create the
+        annotation.
+    :param str name: Name of the function in the registry. See
+        :func:`get_annotation`.
+    :param Schema schema: The schema the annotation will use.
+    """
+
+    __slots__ = ('func', 'create', 'name', 'schema', 'annotation', 'lock')
+
+    def __init__(self, func, create, name=None, schema=None):
+        self.func = func
+        self.create = create
+        self.name = name
+        self.schema = schema
+        self.annotation = None
+        # Each placeholder has its own lock, so creating one annotation
+        # doesn't block others, and create() can decorate other functions.
+        self.lock = threading.Lock()
+
+    __hash__ = object.__hash__
+
+    def resolve(self):
+        """Create the annotation, if it hasn't been created yet.
+
+        :returns: Annotation
+        """
+        if self.annotation is None:
+            with self.lock:
+                if self.annotation is None:
+                    try:
+                        annotation = self.create()
+                        self.func._doctor_annotation = annotation
+                        self.annotation = annotation
+                    finally:
+                        # Placeholders that failed are no longer pending
+                        # either. Calling the function will try again.
+                        if self in _pending:
+                            with _pending_lock:
+                                _pending.discard(self)
+        return self.annotation
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in LazyAnnotation.__slots__:
+            # Avoid recursing while the placeholder is being initialized
+            # (or copied, or pickled).
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name, value):
+        if name in LazyAnnotation.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.resolve(), name, value)
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __eq__(self, other):
+        return self.resolve() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+def set_lazy(lazy):
+    """Set whether :func:`annotate` creates annotations lazily by default.
+
+    This only affects functions decorated after it's called, so it should be
+    called before importing any modules with annotated functions.
+
+    :param bool lazy:
+    """
+    global lazy_by_default
+    lazy_by_default = bool(lazy)
+
+
+def warmup(*funcs, **kwargs):
+    """Create any lazy annotations that haven't been created yet.
+
+    This can be used by programs that use lazy annotations for fast imports,
+    but would prefer to pay the cost of creating the annotations up front
+    (e.g. before a server starts handling requests).
+
+    :param funcs: Annotated functions to warm up. If none are given, every
+        pending lazy annotation is created.
+    :param int processes: If specified, the schemas are compiled in this
+        many forked worker processes, and the compiled code is sent back to
+        be loaded. This is worthwhile when there are many annotations with
+        large schemas.
+    :returns: list[Annotation]
+    :raises WarmupError: If any of the annotations couldn't be created. The
+        others are still created first.
+    """
+    processes = kwargs.pop('processes', None)
+    if kwargs:
+        raise TypeError('Unexpected keyword arguments: {}'.format(
+            ', '.join(sorted(kwargs))))
+    if funcs:
+        placeholders = [get_wrapped(func)._doctor_annotation
+                        for func in funcs]
+    else:
+        with _pending_lock:
+            placeholders = list(_pending)
+    if processes:
+        registered = _registry.get_placeholders()
+        names = [placeholder.name for placeholder in placeholders
+                 if isinstance(placeholder, LazyAnnotation) and
+                 placeholder.annotation is None and
+                 registered.get(placeholder.name) is placeholder]
+        _registry.compile_in_processes(names, processes)
+    annotations = []
+    errors = []
+    for placeholder in placeholders:
+        if isinstance(placeholder, LazyAnnotation):
+            try:
+                placeholder = placeholder.resolve()
+            except Exception as e:
+                errors.append((placeholder.name, e))
+                continue
+        annotations.append(placeholder)
+    if errors:
+        raise WarmupError(errors)
+    return annotations
 
 
 @with_wraps(arguments=True)
 def annotate(schema, args=UNSET, required_args=None, result=None,
-             is_method=False):
+             is_method=False, cache=None, mode=None, offload_size=None,
+             stream=False, lazy=None, fast_fail=False, background=None,
+             coerce=False, delta=None):
     """Annotate schema metadata for a method.
 
     The method's arguments and result will be validated using the schema when
@@ -160,24 +800,126 @@ def annotate(schema, args=UNSET, required_args=None, result=None,
     :type result: str, dict, list[str], or None
     :param bool is_method: If True, treat the annotated function as a method.
         This will ignore the initial argument (self) for validation.
+    :param cache: If True, arguments that are known to be valid will be
+        cached and won't be validated again. Pass a :class:`ValidationCache`
+        to configure the cache.
+    :type cache: bool, ValidationCache, or None
+    :param ValidationMode mode: Decides which calls will be validated. If not
+        specified, the global mode is used. It can be changed later by
+        setting the mode attribute of the annotation.
+    :param int offload_size: For coroutine functions, arguments and results
+        with more than this many items are validated in the event loop's
+        default executor instead of blocking the event loop.
+    :param bool stream: If True, the result should be an array schema and
+        the function should return an iterable (like a generator). Instead
+        of validating the iterable itself, it will be wrapped in an iterator
+        that validates each item against the array's items schema as it's
+        consumed. Validation errors include the index of the bad item.
+    :param bool lazy: If True, the annotation isn't created until the
+        function is first called (or the annotation is first accessed).
+        This makes decorating functions much cheaper, but means errors in
+        the schema won't be raised until then. If None, the default set by
+        :func:`set_lazy` is used. See :func:`warmup`.
+    :param bool fast_fail: If True, invalid arguments and results raise a
+        :class:`FastValidationError` with only the path and keyword of the
+        first problem, instead of a detailed
+        :class:`jsonschema.ValidationError`. This makes rejecting invalid
+        calls much cheaper.
+    :param background: If True, results are queued and validated on a
+        background thread after the function returns, so result validation
+        doesn't add to the latency of calls. Invalid results are reported to
+        the validator's sink instead of raising. Pass a
+        :class:`BackgroundValidator` to configure the queue size, what to
+        drop when it's full, and the sink. Arguments are still validated
+        before the call.
+    :type background: bool, BackgroundValidator, or None
+    :param bool coerce: If True, string arguments (like values from a query
+        string) are converted to the types declared by their schemas before
+        they're validated, and the converted values are passed to the
+        function. Integers, numbers, booleans ('true', 'false', '1' and
+        '0') and arrays (from comma separated strings) are converted.
+        Strings that can't be converted are left as they are, so validation
+        reports them. Arguments are converted even for calls that the
+        validation mode skips.
+    :param delta: If True, the parts of arguments and results that were
+        valid in earlier calls are remembered (by hashing their contents),
+        and aren't validated again. This makes validating large values that
+        change slightly between calls much cheaper, if their schemas use
+        keywords that can't be compiled. See :class:`DeltaCache`. Pass a
+        :class:`DeltaCache` to configure how many hashes are kept.
+    :type delta: bool, DeltaCache, or None
+
+    Coroutine functions are supported on Python 3.5 and later. Their
+    arguments are validated before the coroutine is awaited, and the awaited
+    value is validated as the result.
     """
-    args_schema = make_schema_dict(schema, 'args', args, required_args)
-    result_schema = make_schema_dict(schema, 'result', result)
+    if lazy is None:
+        lazy = lazy_by_default
+    schemas = []
+    if not lazy:
+        schemas = [make_schema_dict(schema, 'args', args, required_args),
+                   make_schema_dict(schema, 'result', result)]
 
     def decorator(func):
-        annotation = Annotation.create(
-            get_wrapped(func), schema, args_schema=args_schema,
-            result_schema=result_schema, is_method=is_method)
-        func._doctor_annotation = annotation
+        wrapped_func = get_wrapped(func)
+
+        def create():
+            if not schemas:
+                schemas.extend([
+                    make_schema_dict(schema, 'args', args, required_args),
+                    make_schema_dict(schema, 'result', result)])
+            return Annotation.create(
+                wrapped_func, schema, args_schema=schemas[0],
+                result_schema=schemas[1], is_method=is_method, cache=cache,
+                mode=mode, stream=stream, fast_fail=fast_fail,
+                background=background, coerce=coerce, delta=delta)
+
+        name = _metrics.metrics_name(wrapped_func)
+        placeholder = LazyAnnotation(func, create, name=name, schema=schema)
+        if lazy:
+            _registry.register(name, placeholder, schema)
+            func._doctor_annotation = placeholder
+            with _pending_lock:
+                _pending.add(placeholder)
+        else:
+            placeholder.resolve()
+            # Only register functions that were annotated successfully.
+            _registry.register(name, placeholder, schema)
+
+        if _async is not None and _async.iscoroutinefunction(func):
+            wrapper = _async.create_wrapper(func, placeholder,
+                                            offload_size=offload_size)
+            wrapper._decorated = func
+            return wrapper
 
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            annotation = placeholder.annotation
+            if annotation is None:
+                annotation = placeholder.resolve()
+            mode = annotation.mode
+            if mode is None:
+                mode = _mode.default_mode
+            # Passthrough calls skip everything else, unless their arguments
+            # need converting or hooks or metrics should see them.
+            if (mode is _mode.PASSTHROUGH and not annotation.coerced_args and
+                    not _tracing.hooks and not _metrics.enabled):
+                return func(*args, **kwargs)
+            if (_tracing.hooks or _metrics.enabled or
+                    annotation.coerced_args or annotation.stream or
+                    annotation.background is not None):
+                return _call(annotation, func, args, kwargs)
+            # The common case, kept in a straight line so that calls don't
+            # pay for features they don't use.
+            if mode is not _mode.FULL and not mode.should_validate(
+                    annotation):
+                return func(*args, **kwargs)
             if annotation.args_schema is not None:
-                properties = annotation.collect_properties(args, kwargs)
-                schema.validator.validate(properties, annotation.args_schema)
+                annotation.validate_args(
+                    annotation.collect_properties(args, kwargs))
             result = func(*args, **kwargs)
             if annotation.result_schema is not None:
-                schema.validator.validate(result, annotation.result_schema)
+                annotation.validate_result(result)
             return result
         wrapper._decorated = func
         return wrapper
@@ -0,0 +1,83 @@
+# This module uses async/await syntax, so it's only imported on Python 3.5+.
+import asyncio
+import functools
+import inspect
+
+from doctor import _tracing
+
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # Python 3.5 and 3.6 don't have get_running_loop. get_event_loop returns
+    # the running loop when it's called from a coroutine.
+    _get_running_loop = asyncio.get_event_loop
+
+
+def iscoroutinefunction(func):
+    """Return True if func is a coroutine function."""
+    if inspect.iscoroutinefunction(func):
+        return True
+    # Generator based coroutines (@asyncio.coroutine) were removed in 3.11.
+    return (hasattr(asyncio, 'coroutine') and
+            asyncio.iscoroutinefunction(func))
+
+
+def _payload_size(value):
+    if isinstance(value, (dict, list)):
+        return len(value)
+    return 0
+
+
+def create_wrapper(func, placeholder, offload_size=None):
+    """Create an async wrapper that validates calls to a coroutine function.
+
+    Arguments are validated before the coroutine is awaited, and the result
+    is validated after it has been awaited.
+
+    :param function func: The coroutine function to wrap.
+    :param LazyAnnotation placeholder: Placeholder for the function's
+        annotation.
+    :param int offload_size: If specified, arguments or results containing
+        more than this many items (counting the items in any lists and dicts
+        passed as arguments) are validated in the event loop's default
+        executor, so that the event loop isn't blocked.
+    :returns: function
+    """
+    async def offload(size, check, *args):
+        if offload_size is not None and size > offload_size:
+            loop = _get_running_loop()
+            return await loop.run_in_executor(None, check, *args)
+        return check(*args)
+
+    async def call(annotation, traced, args, kwargs):
+        if not traced:
+            return await func(*args, **kwargs)
+        start = _tracing._timer()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            _tracing.emit(annotation, _tracing.CALL, start, exc)
+            raise
+        _tracing.emit(annotation, _tracing.CALL, start)
+        return result
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        annotation = placeholder.annotation
+        if annotation is None:
+            annotation = placeholder.resolve()
+        traced = bool(_tracing.hooks)
+        args, kwargs, properties, metrics, validate = annotation.begin_call(
+            args, kwargs, traced, check=offload_size is None)
+        if properties is not None:
+            size = sum(_payload_size(value) for value in properties.values())
+            args, kwargs = await offload(size, annotation.check_args, args,
+                                         kwargs, properties, metrics, traced)
+        result = await call(annotation, traced, args, kwargs)
+        if validate and annotation.result_schema is not None:
+            result = await offload(_payload_size(result),
+                                   annotation.check_result, result, metrics,
+                                   traced)
+        return result
+    return wrapper
@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+
+from jsonschema.exceptions import ValidationError
+from six.moves import queue
+
+from doctor import _metrics
+
+
+logger = logging.getLogger(__name__)
+
+_fork_lock = threading.Lock()
+
+
+def log_violation(annotation, result, error):
+    """The default sink for :class:`BackgroundValidator`, which logs
+    violations as warnings."""
+    logger.warning('Invalid result from %s: %s',
+                   getattr(annotation.func, '__name__', annotation.func),
+                   error.message)
+
+
+class BackgroundValidator(object):
+
+    """Validates function results on background threads.
+
+    This is useful when result validation is only used to detect drift
+    between functions and their schemas, and shouldn't add to the latency
+    of calls. Results are queued when the function returns, and validated
+    later by worker threads. Invalid results are passed to a sink instead
+    of raising.
+
+    Results are validated as they are when the worker gets to them, so
+    functions shouldn't return values that are modified after the call.
+
+    :param int size: The maximum number of results waiting to be validated.
+    :param str policy: What to do when the queue is full. 'newest' drops the
+        result that was just returned, and 'oldest' drops the result that
+        has been waiting the longest.
+    :param callable sink: Called with (annotation, result, error) for each
+        invalid result. Defaults to :func:`log_violation`.
+    :param int workers: The number of worker threads. They are started when
+        the first result is queued.
+    """
+
+    policies = ('newest', 'oldest')
+
+    def __init__(self, size=1024, policy='newest', sink=None, workers=1):
+        if size < 1:
+            raise ValueError('size must be at least 1 (was {!r})'.format(
+                size))
+        if policy not in self.policies:
+            raise ValueError('policy must be one of {!r} (was {!r})'.format(
+                self.policies, policy))
+        if workers < 1:
+            raise ValueError('workers must be at least 1 (was {!r})'.format(
+                workers))
+        self.size = size
+        self.policy = policy
+        self.sink = log_violation if sink is None else sink
+        self.workers = workers
+        self.submitted = 0
+        self.dropped = 0
+        self.validated = 0
+        self.violations = 0
+        self._queue = queue.Queue(size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def submit(self, annotation, result):
+        """Queue a result to be validated. This never blocks.
+
+        :param Annotation annotation: Annotation of the function that
+            returned the result.
+        :param result: The value returned by the function.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        if not self._threads:
+            self._start()
+        self.submitted += 1
+        item = (annotation, result)
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            if self.policy == 'newest':
+                self.dropped += 1
+                return
+        try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Other threads filled the space back up.
+            self.dropped += 1
+
+    def join(self):
+        """Wait until every queued result has been validated."""
+        self._queue.join()
+
+    def _after_fork(self):
+        # Threads aren't copied into a forked child, so it needs its own
+        # workers. Results queued in the parent are left to the parent.
+        with _fork_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.size)
+            self._threads = []
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work,
+                                          name='doctor-background')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            annotation, result = self._queue.get()
+            try:
+                self._validate(annotation, result)
+            except Exception:
+                logger.exception('Error validating result in the background')
+            finally:
+                self._queue.task_done()
+
+    def _validate(self, annotation, result):
+        metrics = annotation.metrics if _metrics.enabled else None
+        try:
+            if metrics is None:
+                annotation.validate_result(result)
+            else:
+                metrics.measure('result', annotation.validate_result, result)
+        except ValidationError as error:
+            self.violations += 1
+            self.sink(annotation, result, error)
+        finally:
+            self.validated += 1
+
+
+#: The validator used by annotate(background=True).
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_background():
+    """Return the shared :class:`BackgroundValidator`, creating it if
+    necessary.
+
+    :returns: BackgroundValidator
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = BackgroundValidator()
+    return _default
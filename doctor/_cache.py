@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+import six
+
+
+#: Types of values that can be part of a fingerprint. These are immutable,
+#: so a value that validated once will always validate.
+_FINGERPRINT_TYPES = frozenset(
+    (bool, float, type(None), six.binary_type, six.text_type) +
+    six.integer_types)
+
+
+class ValidationCache(object):
+
+    """A bounded cache of argument values that are known to be valid.
+
+    Arguments are identified by a fingerprint made from the names, types and
+    values of the properties collected for validation. Only immutable scalar
+    values (strings, numbers, booleans and None) can be fingerprinted. Calls
+    with any other kind of value bypass the cache and are always validated.
+
+    :param int size: The maximum number of fingerprints to keep.
+    :param str policy: How to choose which fingerprint to evict when the
+        cache is full. 'lru' evicts the least recently used fingerprint, and
+        'fifo' evicts the oldest one.
+    """
+
+    policies = ('lru', 'fifo')
+
+    def __init__(self, size=128, policy='lru'):
+        if size < 1:
+            raise ValueError('size must be at least 1 (was {!r})'.format(
+                size))
+        if policy not in self.policies:
+            raise ValueError('policy must be one of {!r} (was {!r})'.format(
+                self.policies, policy))
+        self.size = size
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def __contains__(self, fingerprint):
+        """Check for a fingerprint and update the hit and miss counters."""
+        fingerprints = self._fingerprints
+        with self._lock:
+            if fingerprint not in fingerprints:
+                self.misses += 1
+                return False
+            if self.policy == 'lru':
+                del fingerprints[fingerprint]
+                fingerprints[fingerprint] = True
+            self.hits += 1
+            return True
+
+    def fingerprint(self, properties):
+        """Return a hashable fingerprint for a dict of properties.
+
+        :param dict properties: The properties being validated.
+        :returns: A hashable fingerprint, or None if any of the values can't
+            be safely cached.
+        """
+        items = []
+        for name, value in six.iteritems(properties):
+            value_type = type(value)
+            if value_type not in _FINGERPRINT_TYPES:
+                self.bypasses += 1
+                return None
+            # Include the type, so that values like 1, 1.0 and True don't
+            # share a fingerprint.
+            items.append((name, value_type, value))
+        return frozenset(items)
+
+    def add(self, fingerprint):
+        """Remember that the properties for a fingerprint are valid."""
+        fingerprints = self._fingerprints
+        with self._lock:
+            fingerprints[fingerprint] = True
+            while len(fingerprints) > self.size:
+                fingerprints.popitem(last=False)
+
+    def clear(self):
+        """Remove all fingerprints and reset the counters."""
+        with self._lock:
+            self._fingerprints.clear()
+            self.hits = self.misses = self.bypasses = 0
@@ -0,0 +1,51 @@
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+
+from doctor._precompile import generate_module, precompiled_path
+from doctor._schema import Schema
+
+
+def compile_command(options):
+    schema = Schema.from_file(options.schema, precompiled=None)
+    name = os.path.basename(options.schema)
+    try:
+        source = generate_module(schema, name=name)
+    except ValueError as exc:
+        print('error: {}'.format(exc), file=sys.stderr)
+        return 1
+    output = options.output or precompiled_path(options.schema)
+    if output == '-':
+        sys.stdout.write(source)
+    else:
+        with open(output, 'w') as fp:
+            fp.write(source)
+    return 0
+
+
+def main(argv=None):
+    """Run the doctor command line tool.
+
+    :param list[str] argv: Arguments, not including the program name.
+        Defaults to sys.argv.
+    :returns: int exit status
+    """
+    parser = argparse.ArgumentParser(prog='python -m doctor')
+    subparsers = parser.add_subparsers(dest='command')
+    compile_parser = subparsers.add_parser(
+        'compile', help='Generate a module of precompiled validators for a '
+                        'JSON schema file.')
+    compile_parser.add_argument('schema', help='Path to the schema file.')
+    compile_parser.add_argument(
+        '-o', '--output', help='Where to write the module, or - for stdout. '
+                               'Defaults to schema_validators.py next to '
+                               'schema.json, where Schema.from_file will '
+                               'find it.')
+    compile_parser.set_defaults(func=compile_command)
+    options = parser.parse_args(argv)
+    if getattr(options, 'func', None) is None:
+        parser.print_help()
+        return 2
+    return options.func(options)
@@ -0,0 +1,149 @@
+import math
+import re
+
+import six
+
+
+_TRUE = frozenset([u'true', u'1'])
+_FALSE = frozenset([u'false', u'0'])
+
+#: Strings that are JSON integers and numbers. int() and float() also
+#: accept whitespace, underscores and non-ASCII digits, which query strings
+#: shouldn't contain.
+_INTEGER_RE = re.compile(r'-?(?:0|[1-9][0-9]*)\Z')
+_NUMBER_RE = re.compile(
+    r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?\Z')
+
+
+def coerce_integer(value):
+    """Convert a string like '42' to an int.
+
+    Values that aren't strings, or aren't JSON integers, are returned
+    unchanged so that validation reports them.
+    """
+    if isinstance(value, six.string_types) and _INTEGER_RE.match(value):
+        return int(value)
+    return value
+
+
+def coerce_number(value):
+    """Convert a string like '42' or '4.2' to an int or a float."""
+    if isinstance(value, six.string_types):
+        if _INTEGER_RE.match(value):
+            return int(value)
+        if _NUMBER_RE.match(value):
+            number = float(value)
+            # JSON doesn't have infinity, so numbers too large for a float
+            # are left as strings.
+            if not math.isinf(number):
+                return number
+    return value
+
+
+def coerce_boolean(value):
+    """Convert 'true', 'false', '1' or '0' (in any case) to a bool."""
+    if isinstance(value, six.string_types):
+        lowered = value.lower()
+        if lowered in _TRUE:
+            return True
+        if lowered in _FALSE:
+            return False
+    return value
+
+
+#: Array coercers, keyed by the coercer for their items, so that arrays of
+#: the same type share one (compiled collectors are cached by coercer).
+_array_coercers = {}
+
+
+def make_array_coercer(coerce_item=None):
+    """Return a function that converts a comma separated string to a list.
+
+    The same function is returned every time for the same coerce_item.
+
+    :param callable coerce_item: If specified, each item is converted with
+        this.
+    :returns: function
+    """
+    coerce_array = _array_coercers.get(coerce_item)
+    if coerce_array is None:
+        coerce_array = _array_coercers.setdefault(
+            coerce_item, _make_array_coercer(coerce_item))
+    return coerce_array
+
+
+def _make_array_coercer(coerce_item):
+    def coerce_array(value):
+        if not isinstance(value, six.string_types):
+            return value
+        if not value:
+            return []
+        items = value.split(u',')
+        if coerce_item is None:
+            return items
+        return [coerce_item(item) for item in items]
+    return coerce_array
+
+
+_COERCERS = {
+    u'integer': coerce_integer,
+    u'number': coerce_number,
+    u'boolean': coerce_boolean,
+}
+
+
+def _declared_types(view):
+    types = view.get(u'type')
+    if types is None:
+        # Definitions are often combined with allOf, so look for the type in
+        # there too.
+        for subschema in view.get(u'allOf', ()):
+            if isinstance(subschema, dict) and u'type' in subschema:
+                types = subschema[u'type']
+                break
+    if isinstance(types, six.string_types):
+        return [types]
+    return types or []
+
+
+def get_coercer(view):
+    """Return a function that converts strings to the type a schema
+    declares.
+
+    Only integers, numbers, booleans and arrays (of those, or of strings)
+    are converted. No coercer is returned for schemas that accept strings,
+    since their values are already valid as they are.
+
+    :param dict view: A dereferenced schema. See :meth:`Schema.dereference`.
+    :returns: function or None
+    """
+    if not isinstance(view, dict):
+        return None
+    types = _declared_types(view)
+    if u'string' in types:
+        return None
+    for type_name in types:
+        if type_name in _COERCERS:
+            return _COERCERS[type_name]
+        if type_name == u'array':
+            items = view.get(u'items')
+            coerce_item = None
+            if isinstance(items, dict):
+                coerce_item = get_coercer(items)
+            return make_array_coercer(coerce_item)
+    return None
+
+
+def get_coercers(properties):
+    """Return coercers for the properties of an args schema.
+
+    :param dict properties: Dereferenced schemas for each property.
+    :returns: A dict mapping property names to coercers, only including the
+        properties that need one.
+    """
+    coercers = {}
+    for name, view in six.iteritems(properties):
+        coercer = get_coercer(view)
+        if coercer is not None:
+            coercers[name] = coercer
+    return coercers
@@ -0,0 +1,749 @@
+import contextlib
+import json
+import marshal
+import numbers
+import re
+
+import six
+from jsonschema import Draft4Validator
+from jsonschema.exceptions import RefResolutionError
+from six.moves.urllib.parse import urljoin
+
+
+#: Keywords that only apply to a particular JSON type. The compiler groups
+#: these under a single type check, mirroring the early return that each of
+#: the jsonschema keyword functions does for other types.
+_TYPE_KEYWORDS = {
+    u'array': (u'items', u'minItems', u'maxItems'),
+    u'number': (u'minimum', u'maximum'),
+    u'object': (u'properties', u'patternProperties', u'required',
+                u'additionalProperties', u'minProperties', u'maxProperties'),
+    u'string': (u'minLength', u'maxLength', u'pattern'),
+}
+
+#: Keywords that aren't tied to a particular JSON type.
+_GENERIC_KEYWORDS = (u'type', u'enum', u'allOf', u'anyOf', u'oneOf', u'not',
+                     u'format')
+
+_COMPILED_KEYWORDS = frozenset(
+    _GENERIC_KEYWORDS + sum(_TYPE_KEYWORDS.values(), ()))
+
+
+def _first_error(validator, scope, errors):
+    """Return the path and keyword for the first error from an iterable.
+
+    :param jsonschema.Validator validator:
+    :param str scope: The resolution scope the errors should be generated in.
+    :param callable errors: Called to create the iterable of errors.
+    :returns: None, or a tuple of (path, keyword).
+    """
+    resolver = validator.resolver
+    pushed = scope != resolver.resolution_scope
+    if pushed:
+        resolver.push_scope(scope)
+    try:
+        for error in errors() or ():
+            return tuple(error.relative_path), error.validator
+    finally:
+        if pushed:
+            resolver.pop_scope()
+    return None
+
+
+def _base_namespace(schema):
+    """Return the namespace that generated code is executed in.
+
+    :param Schema schema: The schema the code validates against. If None,
+        the names are returned without any values.
+    """
+    if schema is None:
+        return dict.fromkeys(['_first_error', '_format', '_pattern',
+                              '_validator', 'numbers', 're', 'six'])
+    return {
+        '_first_error': _first_error,
+        '_format': schema.get_format,
+        '_pattern': schema.get_pattern,
+        '_validator': schema.local_validator,
+        'numbers': numbers,
+        're': re,
+        'six': six,
+    }
+
+
+def _literal(value):
+    """Return Python source for a JSON value, or None if it has none."""
+    if value is None or isinstance(value, (bool, six.string_types)):
+        return repr(value)
+    elif isinstance(value, six.integer_types):
+        return repr(value)
+    elif isinstance(value, float):
+        if value != value or value in (float('inf'), float('-inf')):
+            return None
+        return repr(value)
+    elif isinstance(value, list):
+        items = [_literal(item) for item in value]
+        if None in items:
+            return None
+        return '[{}]'.format(', '.join(items))
+    elif isinstance(value, dict):
+        items = []
+        for key in sorted(value):
+            key_source = _literal(key)
+            value_source = _literal(value[key])
+            if (not isinstance(key, six.string_types) or
+                    value_source is None):
+                return None
+            items.append('{}: {}'.format(key_source, value_source))
+        return '{{{}}}'.format(', '.join(items))
+    return None
+
+
+class _Writer(object):
+
+    """Accumulates indented lines of generated source code."""
+
+    def __init__(self):
+        self.lines = []
+        self.depth = 0
+
+    def line(self, text):
+        self.lines.append('    ' * self.depth + text)
+
+    @contextlib.contextmanager
+    def indented(self):
+        self.depth += 1
+        count = len(self.lines)
+        try:
+            yield
+            if len(self.lines) == count:
+                # Nothing was emitted for the block (e.g. for an empty
+                # subschema), but it still needs a body.
+                self.line('pass')
+        finally:
+            self.depth -= 1
+
+
+class Compiler(object):
+
+    """Generates Python source for validating instances against a schema.
+
+    Each compiled subschema becomes a function that accepts an instance and
+    returns None if it is valid. If it isn't valid, the function returns a
+    tuple of (path, keyword) describing the first failure that was found.
+    The generated code uses plain isinstance checks, inlined bounds and
+    precomputed property names rather than dispatching through the keyword
+    table of the validator.
+
+    Keywords the compiler doesn't understand (or which have been overridden
+    by a custom validator class) fall back to calling the validator's own
+    implementation of that keyword, so compiled functions always agree with
+    jsonschema about what is valid.
+
+    :param Schema schema: The schema that references will be resolved in.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.validator = schema.validator
+        self.resolver = schema.validator.resolver
+        self.namespace = _base_namespace(schema)
+        #: True if any constants were injected into the namespace because
+        #: they couldn't be expressed as source. Code for compilers like this
+        #: can't be cached, since it's not self contained.
+        self.injected = False
+        self.constants = []
+        self.constant_count = 0
+        self.functions = []
+        self.function_names = {}
+        # Keep a reference to anything keyed by id(), so the ids can't be
+        # reused while the compiler is alive.
+        self._keep_alive = []
+
+    def compile(self, subschema):
+        """Compile a subschema and return the name of its function.
+
+        :param dict subschema:
+        :returns: str
+        """
+        return self.function(subschema, ('schema', id(subschema)))
+
+    @property
+    def source(self):
+        """The generated source for everything compiled so far."""
+        lines = list(self.constants)
+        for writer in self.functions:
+            lines.append('')
+            lines.extend(writer.lines)
+        return '\n'.join(lines) + '\n'
+
+    @property
+    def code(self):
+        """A code object for the generated source."""
+        return compile(self.source, '<doctor compiled schema>', 'exec')
+
+    def build(self, name, code=None):
+        """Execute the generated source and return the named function.
+
+        :param str name: Name returned by :meth:`compile`.
+        :param code: The code object to execute, if the caller already has
+            one. See :attr:`code`.
+        :returns: function
+        """
+        namespace = dict(self.namespace)
+        six.exec_(self.code if code is None else code, namespace)
+        return namespace[name]
+
+    def constant(self, value, source=None):
+        """Add a constant to the generated module and return its name.
+
+        :param value: The value of the constant.
+        :param str source: Python source that evaluates to the value. If not
+            specified, source will be generated for JSON values. Values
+            without any source are injected into the namespace directly.
+        :returns: str
+        """
+        name = '_c{}'.format(self.constant_count)
+        self.constant_count += 1
+        if source is None:
+            source = _literal(value)
+        if source is None:
+            self.namespace[name] = value
+            self.injected = True
+        else:
+            self.constants.append('{} = {}'.format(name, source))
+        return name
+
+    def function(self, subschema, key):
+        name = self.function_names.get(key)
+        if name is not None:
+            return name
+        name = '_f{}'.format(len(self.functions))
+        self.function_names[key] = name
+        self._keep_alive.append(subschema)
+        writer = _Writer()
+        self.functions.append(writer)
+        writer.line('def {}(v0):'.format(name))
+        with writer.indented():
+            self.emit(writer, subschema, 'v0', [], 0)
+            writer.line('return None')
+        return name
+
+    def emit(self, writer, subschema, var, path, depth):
+        """Emit checks for an instance stored in var.
+
+        :param _Writer writer:
+        :param dict subschema: Schema the instance should be checked against.
+        :param str var: Name of the variable holding the instance.
+        :param list[str] path: Source expressions for the instance's path.
+        :param int depth: Nesting depth, used to create unique names.
+        """
+        if not isinstance(subschema, dict) or subschema.get(u'id'):
+            # Scope changes (and invalid schemas) are left to jsonschema.
+            self.emit_fallback(writer, subschema, var, path)
+            return
+
+        ref = subschema.get(u'$ref')
+        if ref is not None:
+            self.emit_ref(writer, subschema, ref, var, path)
+            return
+
+        for keyword in _GENERIC_KEYWORDS:
+            if keyword in subschema and self.is_compilable(keyword):
+                getattr(self, 'emit_' + keyword)(
+                    writer, subschema, subschema[keyword], var, path, depth)
+        for type_name in sorted(_TYPE_KEYWORDS):
+            keywords = [keyword for keyword in _TYPE_KEYWORDS[type_name]
+                        if keyword in subschema and
+                        self.is_compilable(keyword)]
+            if not keywords:
+                continue
+            condition = self.type_condition(type_name, var)
+            if condition is None:
+                for keyword in keywords:
+                    self.emit_keyword_fallback(writer, subschema, keyword,
+                                               var, path)
+                continue
+            writer.line('if {}:'.format(condition))
+            with writer.indented():
+                for keyword in keywords:
+                    getattr(self, 'emit_' + keyword)(
+                        writer, subschema, subschema[keyword], var, path,
+                        depth)
+        validators = self.validator.VALIDATORS
+        for keyword in sorted(subschema):
+            if keyword in validators and not self.is_compilable(keyword):
+                self.emit_keyword_fallback(writer, subschema, keyword, var,
+                                           path)
+
+    def is_compilable(self, keyword):
+        """Return True if a keyword can be turned into generated code."""
+        if keyword not in _COMPILED_KEYWORDS:
+            return False
+        implementation = self.validator.VALIDATORS.get(keyword)
+        return (implementation is not None and
+                implementation is Draft4Validator.VALIDATORS.get(keyword))
+
+    def type_condition(self, type_name, var):
+        """Return a source expression checking the JSON type of var.
+
+        :returns: str, or None if the type isn't known to the validator.
+        """
+        types = getattr(self.validator, '_types', {})
+        if type_name not in types:
+            return None
+        pytypes = types[type_name]
+        flat_types = tuple(_flatten(pytypes))
+        name = self.constant(pytypes, '_validator._types[{!r}]'.format(
+            type_name))
+        condition = 'isinstance({}, {})'.format(var, name)
+        if (bool not in flat_types and
+                any(issubclass(t, numbers.Number) for t in flat_types)):
+            # bool is a subclass of int, but jsonschema doesn't treat
+            # booleans as numbers.
+            condition = '({} and not isinstance({}, bool))'.format(
+                condition, var)
+        return condition
+
+    def scope_constant(self):
+        """Add the current resolution scope as a constant.
+
+        :returns: str
+        """
+        return self.constant(self.resolver.resolution_scope)
+
+    def fail(self, writer, path, keyword):
+        writer.line('return ({}, {!r})'.format(_path_source(path), keyword))
+
+    def emit_call(self, writer, name, var, path):
+        writer.line('e = {}({})'.format(name, var))
+        writer.line('if e is not None:')
+        with writer.indented():
+            if path:
+                writer.line('return ({} + e[0], e[1])'.format(
+                    _path_source(path)))
+            else:
+                writer.line('return e')
+
+    def emit_fallback(self, writer, subschema, var, path):
+        """Emit a call that validates the entire subschema with jsonschema."""
+        schema_name = self.constant(subschema)
+        scope_name = self.scope_constant()
+        writer.line(
+            'e = _first_error(_validator, {scope}, lambda: '
+            '_validator.iter_errors({var}, {schema}))'.format(
+                scope=scope_name, var=var, schema=schema_name))
+        self._emit_error_return(writer, path)
+
+    def emit_keyword_fallback(self, writer, subschema, keyword, var, path):
+        """Emit a call to the validator's implementation of a keyword."""
+        function_name = self.constant(
+            self.validator.VALIDATORS[keyword],
+            '_validator.VALIDATORS[{!r}]'.format(keyword))
+        value_name = self.constant(subschema[keyword])
+        schema_name = self.constant(subschema)
+        scope_name = self.scope_constant()
+        keyword_name = self.constant(keyword)
+        writer.line(
+            'e = _first_error(_validator, {scope}, lambda: {function}('
+            '_validator, {value}, {var}, {schema}))'.format(
+                scope=scope_name, function=function_name, value=value_name,
+                var=var, schema=schema_name))
+        writer.line('if e is not None:')
+        with writer.indented():
+            # Errors yielded directly by a keyword function haven't had
+            # their validator set yet.
+            writer.line('if not isinstance(e[1], six.string_types):')
+            with writer.indented():
+                writer.line('e = (e[0], {})'.format(keyword_name))
+            writer.line('return ({} + e[0], e[1])'.format(_path_source(path)))
+
+    def _emit_error_return(self, writer, path):
+        writer.line('if e is not None:')
+        with writer.indented():
+            writer.line('return ({} + e[0], e[1])'.format(_path_source(path)))
+
+    def compile_ref(self, ref):
+        """Compile the target of a reference and return its function's name.
+
+        If the schema has a precompiled function for the reference, that is
+        used instead of generating a new one.
+
+        :param str ref: The reference, relative to the current scope.
+        :returns: str, or None if the reference can't be resolved.
+        """
+        try:
+            url, resolved = self.resolver.resolve(ref)
+        except RefResolutionError:
+            return None
+        name = self.function_names.get(('ref', url))
+        if name is None:
+            precompiled = self.schema.precompiled.get(url)
+            if precompiled is not None:
+                name = self.constant(precompiled)
+                self.function_names[('ref', url)] = name
+            else:
+                with self.resolver.in_scope(url):
+                    name = self.function(resolved, ('ref', url))
+        return name
+
+    def emit_ref(self, writer, subschema, ref, var, path):
+        name = self.compile_ref(ref)
+        if name is None:
+            # Leave it to jsonschema to raise the error when validating.
+            self.emit_fallback(writer, subschema, var, path)
+            return
+        self.emit_call(writer, name, var, path)
+
+    def emit_type(self, writer, subschema, value, var, path, depth):
+        type_names = value if isinstance(value, list) else [value]
+        conditions = []
+        for type_name in type_names:
+            condition = self.type_condition(type_name, var)
+            if condition is None:
+                self.emit_keyword_fallback(writer, subschema, u'type', var,
+                                           path)
+                return
+            conditions.append(condition)
+        writer.line('if not ({}):'.format(' or '.join(conditions) or 'False'))
+        with writer.indented():
+            self.fail(writer, path, u'type')
+
+    def emit_enum(self, writer, subschema, value, var, path, depth):
+        writer.line('if {} not in {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'enum')
+
+    def emit_allOf(self, writer, subschema, value, var, path, depth):
+        for item in value:
+            self.emit(writer, item, var, path, depth)
+
+    def emit_anyOf(self, writer, subschema, value, var, path, depth):
+        names = [self.compile(item) for item in value]
+        writer.line('if {}:'.format(' and '.join(
+            '{}({}) is not None'.format(name, var) for name in names) or
+            'True'))
+        with writer.indented():
+            self.fail(writer, path, u'anyOf')
+
+    def emit_oneOf(self, writer, subschema, value, var, path, depth):
+        names = [self.compile(item) for item in value]
+        writer.line('if ({}) != 1:'.format(' + '.join(
+            '({}({}) is None)'.format(name, var) for name in names) or '0'))
+        with writer.indented():
+            self.fail(writer, path, u'oneOf')
+
+    def emit_not(self, writer, subschema, value, var, path, depth):
+        writer.line('if {}({}) is None:'.format(self.compile(value), var))
+        with writer.indented():
+            self.fail(writer, path, u'not')
+
+    def emit_minimum(self, writer, subschema, value, var, path, depth):
+        operator = '<=' if subschema.get(u'exclusiveMinimum', False) else '<'
+        writer.line('if {} {} {}:'.format(var, operator,
+                                          self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'minimum')
+
+    def emit_maximum(self, writer, subschema, value, var, path, depth):
+        operator = '>=' if subschema.get(u'exclusiveMaximum', False) else '>'
+        writer.line('if {} {} {}:'.format(var, operator,
+                                          self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'maximum')
+
+    def emit_minLength(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) < {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'minLength')
+
+    def emit_maxLength(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) > {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'maxLength')
+
+    def emit_format(self, writer, subschema, value, var, path, depth):
+        if not isinstance(value, six.string_types):
+            self.emit_keyword_fallback(writer, subschema, u'format', var,
+                                       path)
+            return
+        # The check is looked up when the code is executed, and is None if
+        # the schema doesn't check the format, so the same code works with
+        # or without a format checker.
+        name = self.constant(self.schema.get_format(value),
+                             '_format({!r})'.format(value))
+        writer.line('if {0} is not None and not {0}({1}):'.format(name, var))
+        with writer.indented():
+            self.fail(writer, path, u'format')
+
+    def pattern_constant(self, pattern):
+        """Add a compiled regular expression as a constant.
+
+        :param str pattern:
+        :returns: str, or None if the pattern isn't a valid regular
+            expression.
+        """
+        try:
+            regex = self.schema.get_pattern(pattern)
+        except (TypeError, re.error):
+            return None
+        return self.constant(regex, '_pattern({!r})'.format(pattern))
+
+    def emit_pattern(self, writer, subschema, value, var, path, depth):
+        name = self.pattern_constant(value)
+        if name is None:
+            # Let jsonschema raise the error when validating.
+            self.emit_keyword_fallback(writer, subschema, u'pattern', var,
+                                       path)
+            return
+        writer.line('if {}.search({}) is None:'.format(name, var))
+        with writer.indented():
+            self.fail(writer, path, u'pattern')
+
+    def emit_minItems(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) < {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'minItems')
+
+    def emit_maxItems(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) > {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'maxItems')
+
+    def emit_items(self, writer, subschema, value, var, path, depth):
+        item_var = 'v{}'.format(depth + 1)
+        if isinstance(value, dict):
+            index_var = 'i{}'.format(depth)
+            writer.line('for {}, {} in enumerate({}):'.format(
+                index_var, item_var, var))
+            with writer.indented():
+                self.emit(writer, value, item_var, path + [index_var],
+                          depth + 1)
+        else:
+            for index, item in enumerate(value):
+                writer.line('if len({}) > {}:'.format(var, index))
+                with writer.indented():
+                    writer.line('{} = {}[{}]'.format(item_var, var, index))
+                    self.emit(writer, item, item_var, path + [repr(index)],
+                              depth + 1)
+
+    def emit_properties(self, writer, subschema, value, var, path, depth):
+        item_var = 'v{}'.format(depth + 1)
+        for name in sorted(value):
+            writer.line('if {!r} in {}:'.format(name, var))
+            with writer.indented():
+                writer.line('{} = {}[{!r}]'.format(item_var, var, name))
+                self.emit(writer, value[name], item_var, path + [repr(name)],
+                          depth + 1)
+
+    def emit_patternProperties(self, writer, subschema, value, var, path,
+                               depth):
+        names = None
+        if isinstance(value, dict):
+            names = [(self.pattern_constant(pattern), value[pattern])
+                     for pattern in sorted(value)]
+        if names is None or any(name is None for name, _ in names):
+            self.emit_keyword_fallback(writer, subschema,
+                                       u'patternProperties', var, path)
+            return
+        key_var = 'k{}'.format(depth)
+        item_var = 'v{}'.format(depth + 1)
+        writer.line('for {}, {} in six.iteritems({}):'.format(
+            key_var, item_var, var))
+        with writer.indented():
+            for name, item in names:
+                writer.line('if {}.search({}):'.format(name, key_var))
+                with writer.indented():
+                    self.emit(writer, item, item_var, path + [key_var],
+                              depth + 1)
+
+    def emit_required(self, writer, subschema, value, var, path, depth):
+        if not isinstance(value, list):
+            self.emit_keyword_fallback(writer, subschema, u'required', var,
+                                       path)
+            return
+        if not value:
+            return
+        writer.line('if {}:'.format(' or '.join(
+            '{!r} not in {}'.format(name, var) for name in value)))
+        with writer.indented():
+            self.fail(writer, path, u'required')
+
+    def emit_additionalProperties(self, writer, subschema, value, var, path,
+                                  depth):
+        patterns = subschema.get(u'patternProperties', {})
+        pattern_names = None
+        if isinstance(patterns, dict):
+            pattern_names = [self.pattern_constant(pattern)
+                             for pattern in sorted(patterns)]
+        if pattern_names is None or None in pattern_names:
+            self.emit_keyword_fallback(writer, subschema,
+                                       u'additionalProperties', var, path)
+            return
+        if value and not isinstance(value, dict):
+            # additionalProperties: true doesn't need any checks.
+            return
+        names = self.constant(frozenset(subschema.get(u'properties', {})),
+                              'frozenset({!r})'.format(
+                                  sorted(subschema.get(u'properties', {}))))
+        key_var = 'k{}'.format(depth)
+        writer.line('for {} in {}:'.format(key_var, var))
+        with writer.indented():
+            writer.line('if {} not in {}{}:'.format(key_var, names, ''.join(
+                ' and {}.search({}) is None'.format(name, key_var)
+                for name in pattern_names)))
+            with writer.indented():
+                if isinstance(value, dict):
+                    item_var = 'v{}'.format(depth + 1)
+                    writer.line('{} = {}[{}]'.format(item_var, var, key_var))
+                    self.emit(writer, value, item_var, path + [key_var],
+                              depth + 1)
+                else:
+                    self.fail(writer, path, u'additionalProperties')
+
+    def emit_minProperties(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) < {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'minProperties')
+
+    def emit_maxProperties(self, writer, subschema, value, var, path, depth):
+        writer.line('if len({}) > {}:'.format(var, self.constant(value)))
+        with writer.indented():
+            self.fail(writer, path, u'maxProperties')
+
+
+def _flatten(types):
+    if isinstance(types, tuple):
+        for item in types:
+            for flat_type in _flatten(item):
+                yield flat_type
+    else:
+        yield types
+
+
+def _path_source(path):
+    if not path:
+        return '()'
+    return '({},)'.format(', '.join(path))
+
+
+def _cache_key(schema, subschema):
+    try:
+        source = json.dumps(subschema, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return ('validator', schema.resolver.resolution_scope, source)
+
+
+def compile_validator(schema, subschema, cache=None):
+    """Compile a subschema into a Python validation function.
+
+    The returned function accepts an instance and returns None if it is
+    valid against the subschema. Otherwise it returns a tuple of (path,
+    keyword) for the first failure it found. It doesn't build any error
+    messages, so callers should use the schema's validator to generate a
+    full :class:`jsonschema.ValidationError` when validation fails.
+
+    :param Schema schema: The schema used to resolve references.
+    :param dict subschema: The schema to compile.
+    :param DiskCache cache: If specified, the compiled code is stored in and
+        loaded from this cache, keyed by the contents of subschema. Code in
+        the schema's :attr:`~doctor._schema.Schema.compiled_code` is loaded
+        the same way, whether or not there's a cache.
+    :returns: function
+    """
+    if (schema.precompiled and isinstance(subschema, dict) and
+            len(subschema) == 1 and u'$ref' in subschema):
+        # Precompiled definitions can be used as they are.
+        precompiled = schema.precompiled.get(urljoin(
+            schema.resolver.resolution_scope, subschema[u'$ref']))
+        if precompiled is not None:
+            return precompiled
+
+    key = entry = None
+    if cache is not None or schema.compiled_code:
+        key = _cache_key(schema, subschema)
+        if key is not None:
+            entry = schema.compiled_code.get(key)
+            if entry is None and cache is not None:
+                entry = cache.get(key)
+        if entry is not None:
+            code, name = entry
+            namespace = _base_namespace(schema)
+            six.exec_(marshal.loads(code), namespace)
+            return namespace[name]
+
+    compiler = Compiler(schema)
+    name = compiler.compile(subschema)
+    code = compiler.code
+    if key is not None and cache is not None and not compiler.injected:
+        cache.set(key, (marshal.dumps(code), name))
+    return compiler.build(name, code)
+
+
+#: Compiled properties collectors, keyed by the plan they were compiled from.
+#: Functions with the same signature share a collector.
+_collectors = {}
+
+
+def compile_properties_collector(arg_names, property_names, coercers=None):
+    """Compile a function that collects properties from call arguments.
+
+    The generated function takes the positional and keyword arguments from
+    a call and returns a dict mapping property names to argument values.
+    Only arguments that appear in property_names are collected. The plan
+    for which positional index (or keyword) to read each property from is
+    worked out once, here, rather than on every call.
+
+    :param list[str] arg_names: Names of the function's arguments.
+    :param property_names: Names of the properties that are validated.
+    :param dict coercers: If specified, maps property names to functions
+        that convert their values as they're collected. See
+        :func:`get_coercers`.
+    :returns: function
+    """
+    plan = [(index, name) for index, name in enumerate(arg_names)
+            if name in property_names]
+    key = tuple((index, name, (coercers or {}).get(name))
+                for index, name in plan)
+    collector = _collectors.get(key)
+    if collector is not None:
+        return collector
+    namespace = {}
+    sources = {}
+    for index, name in plan:
+        sources[name] = '{}'
+        if coercers and name in coercers:
+            function_name = '_coerce_{}'.format(index)
+            namespace[function_name] = coercers[name]
+            sources[name] = function_name + '({})'
+    writer = _Writer()
+    writer.line('def collect_properties(call_args, call_kwargs):')
+    with writer.indented():
+        if not plan:
+            writer.line('return {}')
+        else:
+            writer.line('n = len(call_args)')
+            # Fast path for when every property was passed positionally.
+            writer.line('if n > {}:'.format(plan[-1][0]))
+            with writer.indented():
+                writer.line('return {{{}}}'.format(', '.join(
+                    '{!r}: {}'.format(name, sources[name].format(
+                        'call_args[{}]'.format(index)))
+                    for index, name in plan)))
+            writer.line('properties = {}')
+            for index, name in plan:
+                writer.line('if n > {}:'.format(index))
+                with writer.indented():
+                    writer.line('properties[{!r}] = {}'.format(
+                        name, sources[name].format(
+                            'call_args[{}]'.format(index))))
+                writer.line('elif {!r} in call_kwargs:'.format(name))
+                with writer.indented():
+                    writer.line('properties[{!r}] = {}'.format(
+                        name, sources[name].format(
+                            'call_kwargs[{!r}]'.format(name))))
+            writer.line('return properties')
+    code = compile('\n'.join(writer.lines) + '\n',
+                   '<doctor properties collector>', 'exec')
+    six.exec_(code, namespace)
+    return _collectors.setdefault(key, namespace['collect_properties'])
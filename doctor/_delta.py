@@ -0,0 +1,336 @@
+import functools
+import hashlib
+import marshal
+import threading
+from collections import OrderedDict
+from itertools import repeat
+
+import six
+from six.moves import map, zip
+
+
+#: Keywords of object schemas that only depend on an object's keys, not on
+#: its values. Schemas that only use these (and properties) are validated
+#: one property at a time.
+_OBJECT_KEYWORDS = frozenset([
+    u'type', u'properties', u'required', u'additionalProperties',
+    u'minProperties', u'maxProperties', u'title', u'description'])
+
+#: Keywords of array schemas that only depend on an array's length.
+_ARRAY_KEYWORDS = frozenset([
+    u'type', u'items', u'minItems', u'maxItems', u'title', u'description'])
+
+#: Types of values that are decomposed when they're fingerprinted.
+_CONTAINER_TYPES = frozenset([dict, list])
+
+#: Values that serialize to at most this many bytes are fingerprinted by
+#: their serialized form, which is cheaper than hashing it.
+_MAX_RAW_SIZE = 128
+
+#: Always valid, used in place of the subschemas of decomposed schemas.
+_ANYTHING = {}
+
+
+def _digest_leaves(kind, children, digests):
+    # Return the digests of a list of dicts (or of lists), if none of them
+    # contain dicts or lists, and add them to digests. Returns False if some
+    # of them do. This is done with map so the loops run in C, since wide
+    # containers of small records are the common case.
+    if kind is dict:
+        grandchildren = map(dict.values, children)
+    else:
+        grandchildren = children
+    if not all(map(_CONTAINER_TYPES.isdisjoint,
+                   map(map, repeat(type), grandchildren))):
+        return False
+    child_digests = [
+        data if len(data) <= _MAX_RAW_SIZE else hashlib.sha256(data).digest()
+        for data in map(marshal.dumps, children, repeat(2))]
+    digests.update(zip(map(id, children), child_digests))
+    return child_digests
+
+
+def _digest(value, digests):
+    # Return the digest of a dict or list, and add it (and the digests of
+    # any dicts and lists inside it) to digests, keyed by id. Dicts and
+    # lists inside the value are replaced by their digests before it's
+    # serialized, along with a tuple of the keys that were replaced, so each
+    # part of the value is only serialized once. Returns None if the value
+    # can't be serialized.
+    if type(value) is dict:
+        keys = list(value)
+        children = list(value.values())
+    else:
+        keys = None
+        children = value
+    kinds = list(map(type, children))
+    try:
+        # Version 2 doesn't share repeated objects, so equal values are
+        # serialized the same way however they were built.
+        if _CONTAINER_TYPES.isdisjoint(kinds):
+            data = marshal.dumps(value, 2)
+        else:
+            child_digests = False
+            if kinds.count(kinds[0]) == len(kinds):
+                child_digests = _digest_leaves(kinds[0], children, digests)
+            if child_digests is not False:
+                replaced = keys if keys is not None else range(len(kinds))
+            else:
+                child_digests = list(children)
+                replaced = []
+                for index, kind in enumerate(kinds):
+                    if kind is not dict and kind is not list:
+                        continue
+                    child = children[index]
+                    child_digest = digests.get(id(child))
+                    if child_digest is None:
+                        child_digest = _digest(child, digests)
+                        if child_digest is None:
+                            return None
+                    child_digests[index] = child_digest
+                    replaced.append(index if keys is None else keys[index])
+            if keys is None:
+                serialized = child_digests
+            else:
+                serialized = dict(zip(keys, child_digests))
+            data = marshal.dumps((serialized, tuple(replaced)), 2)
+    except ValueError:
+        return None
+    if len(data) > _MAX_RAW_SIZE:
+        data = hashlib.sha256(data).digest()
+    digests[id(value)] = data
+    return data
+
+
+def fingerprint(value):
+    """Return a fingerprint of a value's contents.
+
+    Values with the same contents and types (so 1, 1.0 and True differ)
+    usually have the same fingerprint. The value is serialized with
+    :mod:`marshal`, which is fast and exact about types. Short results are
+    the fingerprint themselves, and longer ones are hashed with SHA-256.
+    Python's built-in hash isn't used, because collisions for it can be
+    found on purpose, and an invalid value that collided with a valid one
+    wouldn't be validated. The fingerprints of dicts and lists are made from
+    the fingerprints of the dicts and lists inside them, so they can all be
+    computed in one pass.
+
+    :param value: The value to fingerprint.
+    :returns: A hashable fingerprint, or None if the value contains
+        something that can't be serialized (like an instance of a custom
+        class, or of a subclass of dict or list).
+    """
+    value_type = type(value)
+    if value_type is dict or value_type is list:
+        return _digest(value, {})
+    try:
+        data = marshal.dumps(value, 2)
+    except ValueError:
+        return None
+    if len(data) > _MAX_RAW_SIZE:
+        data = hashlib.sha256(data).digest()
+    return data
+
+
+class _Node(object):
+
+    """Part of a schema, as validated by a :class:`DeltaCache`.
+
+    Schemas for objects and arrays whose keywords only depend on the keys
+    or length of the instance are decomposed: the instance itself is checked
+    against a shallow copy of the schema, and each of its values against a
+    child node. Other schemas are validated as a whole.
+    """
+
+    __slots__ = ('schema', 'view', 'container_type', 'properties',
+                 'additional', '_validate', '_shallow_validate')
+
+    def __init__(self, schema, view):
+        self.schema = schema
+        self.view = view
+        self.container_type = None
+        self.properties = {}
+        self.additional = None
+        self._validate = None
+        self._shallow_validate = None
+
+    def validate(self, instance):
+        if self._validate is None:
+            self._validate = self.schema.compile(self.view)
+        return self._validate(instance)
+
+    def shallow_validate(self, instance):
+        if self._shallow_validate is None:
+            shallow = dict(self.view)
+            if self.container_type is dict:
+                shallow[u'properties'] = dict(
+                    (name, _ANYTHING) for name in self.properties)
+                if self.additional is not None:
+                    shallow[u'additionalProperties'] = _ANYTHING
+            else:
+                shallow[u'items'] = _ANYTHING
+            self._shallow_validate = self.schema.compile(shallow)
+        return self._shallow_validate(instance)
+
+
+def _build(schema, view, nodes):
+    node = nodes.get(id(view))
+    if node is not None:
+        return node
+    node = nodes[id(view)] = _Node(schema, view)
+    if not isinstance(view, dict):
+        return node
+    if view.get(u'type') == u'object' and _OBJECT_KEYWORDS.issuperset(view):
+        properties = view.get(u'properties', {})
+        additional = view.get(u'additionalProperties')
+        if isinstance(properties, dict) and all(
+                isinstance(item, dict) for item in properties.values()):
+            node.container_type = dict
+            node.properties = dict(
+                (name, _build(schema, item, nodes))
+                for name, item in six.iteritems(properties))
+            if isinstance(additional, dict):
+                node.additional = _build(schema, additional, nodes)
+    elif (view.get(u'type') == u'array' and
+            _ARRAY_KEYWORDS.issuperset(view) and
+            isinstance(view.get(u'items', {}), dict)):
+        node.container_type = list
+        node.additional = _build(schema, view.get(u'items', _ANYTHING), nodes)
+    return node
+
+
+class DeltaCache(object):
+
+    """A bounded cache of the fingerprints of valid values.
+
+    This is useful for functions that are called over and over with large
+    values (like configuration documents) that only change slightly between
+    calls. Values are fingerprinted by their contents (see
+    :func:`fingerprint`), and each part of the value that has been validated
+    before is skipped, so only the parts that changed are validated again.
+
+    Only the parts of the schema made of plain object and array schemas are
+    split up. Anything else (including parts of the value that can't be
+    fingerprinted) is validated as a whole.
+
+    Every dict and list in the value is still fingerprinted on each call,
+    which costs about as much as validating it with a compiled validator
+    (see :meth:`Schema.compile`). So this only pays off when the schema uses
+    keywords that aren't compiled, and are checked by jsonschema instead.
+    ``benchmarks/bench_delta.py`` compares both cases.
+
+    :param int size: The maximum number of fingerprints to keep.
+    """
+
+    def __init__(self, size=4096):
+        if size < 1:
+            raise ValueError('size must be at least 1 (was {!r})'.format(
+                size))
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def compile(self, schema, view):
+        """Return a validator that skips parts of values that haven't
+        changed.
+
+        :param Schema schema:
+        :param dict view: A dereferenced subschema. See
+            :meth:`Schema.dereference`.
+        :returns: A function like the ones returned by
+            :meth:`Schema.compile`.
+        """
+        root = _build(schema, view, {})
+        return functools.partial(self._validate_root, root)
+
+    def _validate_root(self, node, instance):
+        instance_type = type(instance)
+        if instance_type is not dict and instance_type is not list:
+            return node.validate(instance)
+        # Digests of every dict and list in the instance, keyed by id.
+        digests = {}
+        digest = _digest(instance, digests)
+        if digest is None:
+            return node.validate(instance)
+        key = (node, digest)
+        with self._lock:
+            if key in self._fingerprints:
+                self._touch([key])
+                return None
+            self.misses += 1
+        return self._validate_changed(node, instance, key, digests)
+
+    def _touch(self, keys):
+        # Count hits, and mark the fingerprints as recently used. The lock
+        # must be held.
+        fingerprints = self._fingerprints
+        for key in keys:
+            if key in fingerprints:
+                del fingerprints[key]
+                fingerprints[key] = True
+        self.hits += len(keys)
+
+    def _validate_changed(self, node, instance, key, digests):
+        # Validate a dict or list that wasn't in the cache, and add it if
+        # it's valid.
+        if node.container_type is not type(instance):
+            failure = node.validate(instance)
+        else:
+            failure = node.shallow_validate(instance)
+            if failure is None:
+                failure = self._validate_items(node, instance, digests)
+        if failure is None:
+            fingerprints = self._fingerprints
+            with self._lock:
+                fingerprints[key] = True
+                while len(fingerprints) > self.size:
+                    fingerprints.popitem(last=False)
+        return failure
+
+    def _validate_items(self, node, instance, digests):
+        if type(instance) is dict:
+            items = six.iteritems(instance)
+        else:
+            items = enumerate(instance)
+        properties = node.properties
+        additional = node.additional
+        fingerprints = self._fingerprints
+        # Hits are counted once for the whole instance, rather than taking
+        # the lock for each item.
+        hits = []
+        failure = None
+        for key, item in items:
+            child = properties.get(key, additional)
+            if child is None:
+                continue
+            item_type = type(item)
+            if item_type is dict or item_type is list:
+                item_key = (child, digests[id(item)])
+                if item_key in fingerprints:
+                    hits.append(item_key)
+                    continue
+                with self._lock:
+                    self.misses += 1
+                failure = self._validate_changed(child, item, item_key,
+                                                 digests)
+            else:
+                # Scalars are cheaper to validate than to look up.
+                failure = child.validate(item)
+            if failure is not None:
+                failure = (key,) + tuple(failure[0]), failure[1]
+                break
+        if hits:
+            with self._lock:
+                self._touch(hits)
+        return failure
+
+    def clear(self):
+        """Remove all fingerprints and reset the counters."""
+        with self._lock:
+            self._fingerprints.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,81 @@
+import errno
+import os
+import tempfile
+
+from six.moves import cPickle as pickle
+
+
+class DiskCache(object):
+
+    """A persistent key/value cache stored in a single pickle file.
+
+    Doctor uses this to keep the preprocessed forms of a schema (the parsed
+    schema, dereferenced definitions and compiled validators) between
+    processes. The file is only read once, when the cache is created, and
+    is only written when :meth:`save` is called.
+
+    The cache doesn't know anything about invalidation. Callers should
+    include a hash of whatever the cached data was generated from in the
+    path, so that a new cache is used when the source changes.
+
+    :param str path: Path to the cache file. It doesn't need to exist yet.
+        If None, the cache is only kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self.entries = self._load()
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, 'rb') as fp:
+                entries = pickle.load(fp)
+        except Exception:
+            # Missing, corrupt or incompatible caches are treated as empty.
+            return {}
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def set(self, key, value):
+        self.entries[key] = value
+        self.dirty = True
+
+    def clear(self):
+        """Remove all entries. The file isn't changed until :meth:`save`
+        is called."""
+        self.entries = {}
+        self.dirty = True
+
+    def save(self):
+        """Write the cache to disk, if anything has changed.
+
+        The file is written atomically, so other processes reading the cache
+        at the same time will see either the old or the new version.
+        """
+        if not self.dirty or self.path is None:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(directory)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(self.entries, fp, pickle.HIGHEST_PROTOCOL)
+            getattr(os, 'replace', os.rename)(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.dirty = False
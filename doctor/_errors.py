@@ -0,0 +1,69 @@
+from collections import deque
+
+from jsonschema.exceptions import ValidationError, _unset
+
+
+class FastValidationError(ValidationError):
+
+    """A lightweight validation error, raised in fast fail mode.
+
+    Unlike the errors raised by jsonschema, these are created straight from
+    the result of a compiled validator, so they only contain the path to
+    the first invalid value and the keyword that failed. They don't have a
+    detailed message, a schema path, or any context for anyOf and oneOf
+    failures.
+
+    This is a subclass of :class:`jsonschema.ValidationError`, so existing
+    error handling still works.
+
+    :param tuple path: Path to the invalid value within the instance.
+    :param str keyword: The schema keyword that failed.
+    """
+
+    def __init__(self, path, keyword):
+        # ValidationError.__init__ sets up a lot of attributes that aren't
+        # used here, and is slow enough to matter when most calls fail, so
+        # only the attributes that are used are set. The message is only
+        # formatted if it's asked for.
+        Exception.__init__(self, path, keyword)
+        self.path = self.relative_path = deque(path)
+        self.schema_path = self.relative_schema_path = deque()
+        self.context = []
+        self.cause = None
+        self.validator = keyword
+        self.validator_value = self.instance = self.schema = _unset
+        self.parent = None
+
+    @property
+    def message(self):
+        return 'Failed validating {!r} at {!r}'.format(self.validator,
+                                                       list(self.path))
+
+    def __str__(self):
+        return self.message
+
+    __unicode__ = __str__
+
+    def __repr__(self):
+        return '<{}: {!r}>'.format(self.__class__.__name__, self.message)
+
+
+class WarmupError(Exception):
+
+    """Raised by :func:`warmup` if any lazy annotations couldn't be created.
+
+    Every annotation is tried before this is raised, so the ones that could
+    be created are ready to use.
+
+    :param list errors: A list of (name, exception) tuples, one for each
+        annotation that couldn't be created.
+    """
+
+    def __init__(self, errors):
+        Exception.__init__(self, errors)
+        self.errors = errors
+
+    def __str__(self):
+        return 'Failed to create {} annotation(s): {}'.format(
+            len(self.errors), ', '.join(
+                '{} ({})'.format(name, error) for name, error in self.errors))
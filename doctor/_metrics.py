@@ -0,0 +1,155 @@
+import bisect
+import threading
+import timeit
+
+from jsonschema.exceptions import ValidationError
+
+
+#: Upper bounds (in seconds) of the buckets in the validation latency
+#: histograms. The last bucket counts everything slower than the last bound.
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2,
+                   1e-1)
+
+#: If True, annotated functions record metrics. See :func:`set_metrics`.
+enabled = False
+
+#: Metrics for each annotated function, keyed by name.
+_registry = {}
+_registry_lock = threading.Lock()
+
+_timer = timeit.default_timer
+
+
+class FunctionMetrics(object):
+
+    """Validation metrics for an annotated function.
+
+    Counters are updated without locking, so they are cheap to maintain but
+    may miss the odd update when a function is called from many threads at
+    once.
+
+    :param str name: Name of the function, as used in
+        :func:`snapshot_metrics`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        """Set all the metrics back to zero."""
+        self.calls = 0
+        self.args_validations = 0
+        self.args_failures = 0
+        self.result_validations = 0
+        self.result_failures = 0
+        self.validation_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def measure(self, kind, validate, value):
+        """Call validate(value) and record how long it took.
+
+        :param str kind: 'args' or 'result'.
+        :param function validate: The validation function to call.
+        :param value: Value to pass to validate.
+        :raises jsonschema.ValidationError: if validate raises it.
+        """
+        failed = False
+        start = _timer()
+        try:
+            return validate(value)
+        except ValidationError:
+            failed = True
+            raise
+        finally:
+            elapsed = _timer() - start
+            self.validation_time += elapsed
+            self.histogram[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            if kind == 'args':
+                self.args_validations += 1
+                self.args_failures += failed
+            else:
+                self.result_validations += 1
+                self.result_failures += failed
+
+    def snapshot(self):
+        """Return a copy of the metrics as a dict.
+
+        The histogram is a list of (upper bound, count) pairs, where the
+        upper bound of the last bucket is None.
+
+        :returns: dict
+        """
+        bounds = LATENCY_BUCKETS + (None,)
+        return {
+            'calls': self.calls,
+            'args_validations': self.args_validations,
+            'args_failures': self.args_failures,
+            'result_validations': self.result_validations,
+            'result_failures': self.result_failures,
+            'validation_time': self.validation_time,
+            'histogram': list(zip(bounds, self.histogram)),
+        }
+
+
+def get_metrics(name):
+    """Return the metrics registered with the given name, creating them if
+    they don't exist yet.
+
+    Annotated functions are registered using their module and qualified
+    name, so functions with the same name share metrics.
+
+    :param str name:
+    :returns: FunctionMetrics
+    """
+    metrics = _registry.get(name)
+    if metrics is None:
+        with _registry_lock:
+            metrics = _registry.setdefault(name, FunctionMetrics(name))
+    return metrics
+
+
+def metrics_name(func):
+    """Return the name metrics for func are registered with.
+
+    Callable instances are named after their class's __call__ method, like
+    their annotations.
+
+    :param function func:
+    :returns: str
+    """
+    if not hasattr(func, '__name__'):
+        func = type(func).__call__
+    name = getattr(func, '__qualname__', None) or func.__name__
+    return '{}.{}'.format(func.__module__, name)
+
+
+def set_metrics(enable):
+    """Turn metrics collection on or off for all annotated functions.
+
+    Metrics are off by default. When they're off, the only cost is checking
+    this setting once per call.
+
+    :param bool enable:
+    """
+    global enabled
+    enabled = bool(enable)
+
+
+def snapshot_metrics():
+    """Return the metrics for every annotated function.
+
+    :returns: A dict mapping function names to the dicts returned by
+        :meth:`FunctionMetrics.snapshot`.
+    """
+    with _registry_lock:
+        registered = list(_registry.values())
+    return dict((metrics.name, metrics.snapshot()) for metrics in registered)
+
+
+def reset_metrics():
+    """Set the metrics for every annotated function back to zero."""
+    with _registry_lock:
+        registered = list(_registry.values())
+    for metrics in registered:
+        metrics.reset()
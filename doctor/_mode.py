@@ -0,0 +1,147 @@
+import random
+
+
+class ValidationMode(object):
+
+    """Decides which calls to an annotated function should be validated.
+
+    Modes can be set globally with :func:`set_mode`, or for a single
+    function by setting the mode attribute of its :class:`Annotation`. Both
+    can be changed at any time, and take effect on the next call.
+
+    Subclasses override :meth:`should_validate`. By default, every call is
+    validated, like :data:`FULL`.
+    """
+
+    def should_validate(self, annotation):
+        """Return True if the current call should be validated.
+
+        :param Annotation annotation: Annotation for the function being
+            called.
+        :returns: bool
+        """
+        return True
+
+
+class Full(ValidationMode):
+
+    """Validate every call."""
+
+    def should_validate(self, annotation):
+        return True
+
+    def __repr__(self):
+        return 'FULL'
+
+
+class Passthrough(ValidationMode):
+
+    """Don't validate any calls, and call the function directly."""
+
+    def should_validate(self, annotation):
+        return False
+
+    def __repr__(self):
+        return 'PASSTHROUGH'
+
+
+class Sampled(ValidationMode):
+
+    """Validate a random sample of calls.
+
+    :param float rate: The fraction of calls to validate, between 0 and 1.
+    :param callable random: Function returning a float in [0, 1).
+    """
+
+    def __init__(self, rate, random=random.random):
+        if not 0 <= rate <= 1:
+            raise ValueError('rate must be between 0 and 1 (was {!r})'.format(
+                rate))
+        self.rate = rate
+        self.random = random
+
+    def should_validate(self, annotation):
+        return self.random() < self.rate
+
+    def __repr__(self):
+        return 'Sampled({!r})'.format(self.rate)
+
+
+class EveryNth(ValidationMode):
+
+    """Validate the first call, and then every nth call after that.
+
+    Calls are counted separately for each annotated function.
+
+    :param int n:
+    """
+
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError('n must be at least 1 (was {!r})'.format(n))
+        self.n = n
+
+    def should_validate(self, annotation):
+        count = annotation.call_count
+        annotation.call_count = count + 1
+        return count % self.n == 0
+
+    def __repr__(self):
+        return 'EveryNth({!r})'.format(self.n)
+
+
+class FirstN(ValidationMode):
+
+    """Validate only the first n calls to each annotated function.
+
+    :param int n:
+    """
+
+    def __init__(self, n):
+        if n < 0:
+            raise ValueError('n must not be negative (was {!r})'.format(n))
+        self.n = n
+
+    def should_validate(self, annotation):
+        count = annotation.call_count
+        if count >= self.n:
+            return False
+        annotation.call_count = count + 1
+        return True
+
+    def __repr__(self):
+        return 'FirstN({!r})'.format(self.n)
+
+
+#: Validate every call. This is the default mode.
+FULL = Full()
+
+#: Don't validate anything.
+PASSTHROUGH = Passthrough()
+
+#: The mode used by annotations that don't have a mode of their own.
+default_mode = FULL
+
+
+def get_mode():
+    """Return the global validation mode.
+
+    :returns: ValidationMode
+    """
+    return default_mode
+
+
+def set_mode(mode):
+    """Set the global validation mode.
+
+    This applies to all annotated functions that haven't been given a mode
+    of their own, including ones that have already been decorated.
+
+    :param ValidationMode mode:
+    :raises TypeError: if mode isn't a :class:`ValidationMode`.
+    """
+    global default_mode
+    if not isinstance(mode, ValidationMode):
+        raise TypeError(('mode should be an instance of ValidationMode '
+                         '(was {!r})').format(mode))
+    default_mode = mode
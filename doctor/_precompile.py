@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sys
+import warnings
+
+import jsonschema
+import six
+from six.moves.urllib.parse import urljoin
+
+from doctor._compiler import Compiler, _base_namespace, _literal
+from doctor._version import __version__
+
+
+_HEADER = '''\
+# flake8: noqa
+# Validators for {name}, generated by "python -m doctor compile".
+# Don't edit this file. Regenerate it whenever the schema changes.
+
+SCHEMA_HASH = {hash!r}
+
+
+def bind({params}):
+'''
+
+
+def schema_hash(schema):
+    """Return a hash identifying the compiled form of a schema.
+
+    The hash covers the contents of the schema and of any other documents
+    it refers to (since checks for their definitions are generated too),
+    the validator class and the versions of Doctor and jsonschema. It
+    doesn't cover the URLs of the documents, so a precompiled module can be
+    generated on one machine and used on another.
+
+    :param Schema schema:
+    :returns: str
+    """
+    validator_cls = type(schema.validator)
+    documents = sorted(six.itervalues(schema.document_digests()))
+    identity = json.dumps([
+        __version__, jsonschema.__version__, validator_cls.__module__,
+        validator_cls.__name__, schema.raw_schema, documents], sort_keys=True)
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+class _PrecompileCompiler(Compiler):
+
+    """A compiler whose output doesn't depend on where the schema lives."""
+
+    def scope_constant(self):
+        root = self.schema.resolver.base_uri
+        scope = self.resolver.resolution_scope
+        if root and scope.startswith(root):
+            return self.constant(scope, '_root_scope + {}'.format(
+                _literal(scope[len(root):])))
+        return super(_PrecompileCompiler, self).scope_constant()
+
+
+def generate_module(schema, name='schema'):
+    """Generate the source of a module with validators for a schema.
+
+    The module contains a compiled validator for each of the schema's
+    definitions. It can be imported normally, so its bytecode is cached
+    like any other module, and passed to :class:`Schema` as precompiled.
+
+    :param Schema schema:
+    :param str name: Name of the schema, for the comment at the top.
+    :returns: str
+    :raises ValueError: if the validators can't be written as source (like
+        when the schema uses a custom validator whose keywords can't be
+        compiled).
+    """
+    compiler = _PrecompileCompiler(schema)
+    refs = []
+    for definition in sorted(schema.raw_schema.get(u'definitions', {})):
+        ref = u'#/definitions/{}'.format(definition)
+        function_name = compiler.compile_ref(ref)
+        if function_name is not None:
+            refs.append((ref, function_name))
+    if compiler.injected:
+        raise ValueError('{} uses values that cannot be compiled ahead of '
+                         'time'.format(name))
+
+    params = sorted(_base_namespace(None)) + ['_root_scope']
+    lines = [_HEADER.format(name=name, hash=schema_hash(schema),
+                            params=', '.join(params)).rstrip()]
+    body = list(compiler.constants)
+    for writer in compiler.functions:
+        body.append('')
+        body.extend(writer.lines)
+    body.append('')
+    body.append('return {')
+    for ref, function_name in refs:
+        body.append('    {}: {},'.format(_literal(ref), function_name))
+    body.append('}')
+    lines.extend(('    ' + line).rstrip() for line in body)
+    return '\n'.join(lines) + '\n'
+
+
+def precompiled_path(schema_path):
+    """Return the default path of the precompiled module for a schema file.
+
+    :param str schema_path: Path to the JSON schema file.
+    :returns: str
+    """
+    return os.path.splitext(schema_path)[0] + '_validators.py'
+
+
+def load_module(path):
+    """Import a precompiled module from a file.
+
+    :param str path:
+    :returns: module
+    """
+    name = '_doctor_precompiled_{}'.format(
+        hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest())
+    if sys.version_info >= (3, 5):
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    import imp
+    return imp.load_source(name, path)
+
+
+def bind_module(schema, module):
+    """Return the validators from a precompiled module, for a schema.
+
+    :param Schema schema:
+    :param module: A module created by :func:`generate_module`.
+    :returns: A dict mapping absolute reference URLs to validators. This is
+        empty if the module was generated from a different schema.
+    """
+    if getattr(module, 'SCHEMA_HASH', None) != schema_hash(schema):
+        warnings.warn('Ignoring precompiled validators in {!r}, because they '
+                      'were generated for a different schema. Regenerate them '
+                      'with "python -m doctor compile".'.format(
+                          getattr(module, '__file__', module)))
+        return {}
+    namespace = _base_namespace(schema)
+    validators = module.bind(_root_scope=schema.resolver.base_uri,
+                             **namespace)
+    scope = schema.resolver.resolution_scope
+    return dict((urljoin(scope, ref), validator)
+                for ref, validator in six.iteritems(validators))
@@ -0,0 +1,179 @@
+import multiprocessing
+import threading
+import weakref
+
+from doctor._diskcache import DiskCache
+from doctor._util import get_wrapped
+
+
+#: Placeholders for every annotated function, keyed by name. Each name maps
+#: to a list, since different functions can have the same name.
+_by_name = {}
+
+#: Names of annotated functions, keyed by schema.
+_by_schema = weakref.WeakKeyDictionary()
+
+_lock = threading.Lock()
+
+
+def _location(func):
+    # Where a function was defined. Functions created again from the same
+    # definition (when a module is reloaded, or by a factory function) are
+    # defined in the same place.
+    func = get_wrapped(func)
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return func
+    return code.co_filename, code.co_firstlineno
+
+
+def register(name, placeholder, schema):
+    """Add an annotated function to the registry.
+
+    If a function with the same name was registered before, it's replaced,
+    as long as both were defined in the same place. Otherwise both are kept,
+    but the name no longer identifies either of them, so
+    :func:`get_annotation` can't be used to look them up.
+
+    This happens for the getter and setter of a property, and on Python 2
+    (where functions don't have a qualified name) for methods with the same
+    name in different classes of a module (like A.get and B.get).
+
+    :param str name: Module and qualified name of the function.
+    :param LazyAnnotation placeholder: Placeholder for the function's
+        annotation.
+    :param Schema schema: The schema the function was annotated with.
+    """
+    location = _location(placeholder.func)
+    with _lock:
+        placeholders = [existing for existing in _by_name.get(name, ())
+                        if _location(existing.func) != location]
+        placeholders.append(placeholder)
+        _by_name[name] = placeholders
+        _by_schema.setdefault(schema, set()).add(name)
+
+
+def _get_placeholder(name):
+    # Return the only placeholder registered with a name.
+    with _lock:
+        placeholders = _by_name[name]
+    if len(placeholders) > 1:
+        raise ValueError(
+            '{} different functions were annotated with the name {!r}'.format(
+                len(placeholders), name))
+    return placeholders[0]
+
+
+def get_annotation(name):
+    """Return the annotation for an annotated function.
+
+    Lazy annotations are created if necessary.
+
+    :param str name: Module and qualified name of the function, like
+        'myapp.handlers.get_user' (or 'myapp.handlers.Users.get' for a
+        method).
+    :returns: Annotation
+    :raises KeyError: if no function with that name has been annotated.
+    :raises ValueError: if more than one function with that name has been
+        annotated.
+    """
+    placeholder = _get_placeholder(name)
+    annotation = placeholder.annotation
+    if annotation is None:
+        annotation = placeholder.resolve()
+    return annotation
+
+
+def get_placeholders(schema=None):
+    """Return the placeholders for annotated functions.
+
+    Names shared by more than one function are left out, since they don't
+    identify a single placeholder.
+
+    :param Schema schema: If specified, only functions annotated with this
+        schema are returned.
+    :returns: A dict mapping names to :class:`LazyAnnotation` instances.
+    """
+    with _lock:
+        if schema is None:
+            names = list(_by_name)
+        else:
+            names = list(_by_schema.get(schema, ()))
+        placeholders = {}
+        for name in names:
+            registered = _by_name.get(name, ())
+            if len(registered) != 1:
+                continue
+            if schema is None or registered[0].schema is schema:
+                placeholders[name] = registered[0]
+        return placeholders
+
+
+def get_annotations(schema=None):
+    """Return the annotations for annotated functions.
+
+    Lazy annotations are created if necessary.
+
+    :param Schema schema: If specified, only functions annotated with this
+        schema are returned.
+    :returns: A dict mapping names to :class:`Annotation` instances. Names
+        shared by more than one function are left out.
+    """
+    return dict((name, placeholder.resolve()) for name, placeholder in
+                get_placeholders(schema).items())
+
+
+def _compile_names(names):
+    # This runs in a worker process forked from the one calling
+    # compile_in_processes, so it has the same registry. Each schema gets a
+    # temporary cache to collect the compiled code in.
+    results = []
+    for name in names:
+        placeholder = _get_placeholder(name)
+        schema = placeholder.schema
+        cache = schema.cache
+        schema.cache = DiskCache(None)
+        try:
+            placeholder.resolve()
+            entries = [(key, value) for key, value in
+                       schema.cache.entries.items()
+                       if isinstance(key, tuple) and key[0] == 'validator']
+        finally:
+            schema.cache = cache
+        results.append((name, entries))
+    return results
+
+
+def compile_in_processes(names, processes):
+    """Compile the schemas for lazy annotations in worker processes.
+
+    The compiled code is added to :attr:`Schema.compiled_code` for each
+    annotation's schema, so creating the annotations afterwards only needs
+    to load it. The schemas' caches aren't changed. Workers are forked, so
+    this does nothing on platforms without fork.
+
+    :param list[str] names: Names of the annotations to compile.
+    :param int processes: How many worker processes to use.
+    """
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:
+        # Python 2 always forks.
+        context = multiprocessing
+    except ValueError:
+        return
+    processes = min(processes, len(names))
+    if processes < 1:
+        return
+    pool = context.Pool(processes)
+    try:
+        results = pool.map(_compile_names, [names[i::processes]
+                                            for i in range(processes)])
+    finally:
+        pool.close()
+        pool.join()
+    for chunk in results:
+        for name, entries in chunk:
+            compiled_code = _get_placeholder(name).schema.compiled_code
+            for key, value in entries:
+                compiled_code.setdefault(key, value)
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import jsonschema
+import six
+from jsonschema.exceptions import RefResolutionError
+from six.moves.urllib.parse import urldefrag, urlsplit
+from six.moves.urllib.request import url2pathname
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+
+class ResolutionCache(object):
+
+    """A bounded, thread-safe LRU cache of resolved references.
+
+    Entries are keyed by the URL of a document and a fragment within it.
+    Each entry also records the document the fragment was resolved in, so
+    that resolvers with different documents stored under the same URL
+    (like two in-memory schemas with no id) never share results.
+
+    :param int size: The maximum number of entries to keep.
+    """
+
+    def __init__(self, size=1024):
+        if size < 1:
+            raise ValueError('size must be at least 1 (was {!r})'.format(
+                size))
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, url, fragment, document=None):
+        """Return a cached resolution, or None.
+
+        :param str url: URL of the document, without a fragment.
+        :param str fragment: The fragment to resolve within the document.
+        :param document: If specified, only return an entry that was
+            resolved in this exact document.
+        """
+        key = (url, fragment)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (document is not None and
+                                 entry[0] is not document):
+                self.misses += 1
+                return None
+            del self._entries[key]
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, url, fragment, document, resolved):
+        with self._lock:
+            self._entries.pop((url, fragment), None)
+            self._entries[(url, fragment)] = (document, resolved)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url=None):
+        """Remove cached entries.
+
+        :param str url: If specified, only entries for the document at this
+            URL are removed. Otherwise, the whole cache is cleared.
+        """
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+                return
+            url, _ = urldefrag(url)
+            for key in [key for key in self._entries if key[0] == url]:
+                del self._entries[key]
+
+
+#: The cache shared by all :class:`CachingRefResolver` instances.
+resolution_cache = ResolutionCache()
+
+
+class CachingRefResolver(jsonschema.RefResolver):
+
+    """A resolver that shares resolved references across the process.
+
+    Resolved fragments are kept in a :class:`ResolutionCache` instead of a
+    cache per resolver, so schemas that share documents (like common
+    definitions in another file) only fetch and walk them once. This is
+    the default resolver used by :class:`Schema`.
+
+    Accepts the same arguments as :class:`jsonschema.RefResolver`, plus:
+
+    :param ResolutionCache resolution_cache: The cache to use. Defaults to
+        the process-wide cache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.resolution_cache = kwargs.pop('resolution_cache',
+                                           resolution_cache)
+        # Resolutions are cached in the shared cache, so don't cache them in
+        # the resolver as well. Otherwise invalidating the shared cache
+        # wouldn't have any effect.
+        kwargs.setdefault('remote_cache', self.resolve_from_url)
+        super(CachingRefResolver, self).__init__(*args, **kwargs)
+
+    def resolve_from_url(self, url):
+        url, fragment = urldefrag(url)
+        cache = self.resolution_cache
+        document = self.store.get(url)
+        if document is None:
+            # Remote documents are identified by their URL alone, so they
+            # can be shared with other resolvers.
+            document = cache.get(url, u'')
+            if document is None:
+                try:
+                    document = self.resolve_remote(url)
+                except Exception as exc:
+                    raise RefResolutionError(exc)
+                cache.set(url, u'', document, document)
+            elif self.cache_remote:
+                self.store[url] = document
+
+        resolved = cache.get(url, fragment, document)
+        if resolved is None:
+            resolved = self.resolve_fragment(document, fragment)
+            cache.set(url, fragment, document, resolved)
+        return resolved
+
+
+#: Documents fetched by :func:`fetch_document`, keyed by URL. Each entry is
+#: a tuple of (validator, document, digest), where the validator identifies
+#: the version that was fetched.
+_fetched = {}
+_fetched_lock = threading.Lock()
+
+
+def _fetch_file(url, known):
+    # Files are identified by their inode, modification time and size, so
+    # they're only read again when those change.
+    path = url2pathname(urlsplit(url).path)
+    stat = os.stat(path)
+    validator = (stat.st_ino, stat.st_mtime, stat.st_size)
+    if known is not None and known[0] == validator:
+        return known
+    with open(path, 'rb') as fp:
+        document = json.loads(fp.read().decode('utf-8'))
+    return validator, document, None
+
+
+def _fetch_http(url, known):
+    # Requests are conditional on the ETag or Last-Modified date of the
+    # version that was fetched before, so an unchanged document isn't sent
+    # again.
+    headers = {}
+    if known is not None:
+        etag, modified = known[0]
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+    response = requests.get(url, headers=headers)
+    if known is not None and response.status_code == 304:
+        return known
+    response.raise_for_status()
+    validator = (response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'))
+    if validator == (None, None):
+        validator = None
+    return validator, response.json(), None
+
+
+def fetch_document(resolver, url):
+    """Fetch the current version of a remote document, and a digest of it.
+
+    The digest is a SHA-256 hash of the document's JSON, so it only changes
+    when the content does. Documents fetched with the resolver's default
+    :meth:`~jsonschema.RefResolver.resolve_remote` are remembered for the
+    life of the process, with a validator for the version that was
+    fetched:
+
+    - For file URLs, the validator is the file's inode, modification time
+      and size. Fetching an unchanged file costs a stat. A file rewritten
+      in place with the same size, faster than the file system's timestamp
+      resolution, isn't noticed.
+    - For HTTP URLs (when requests is installed), it's the ETag and
+      Last-Modified headers. Fetching an unchanged document costs a
+      conditional request, which the server answers without a body.
+      Servers that send neither header are asked for the whole document
+      every time.
+
+    Other documents (like ones with a custom handler, or a resolver that
+    overrides resolve_remote) are fetched and hashed every time.
+
+    :param jsonschema.RefResolver resolver:
+    :param str url: URL of the document, without a fragment.
+    :returns: A tuple of (document, digest).
+    """
+    scheme = urlsplit(url).scheme
+    fetch = None
+    if scheme not in resolver.handlers and six.get_unbound_function(
+            type(resolver).resolve_remote) is six.get_unbound_function(
+                jsonschema.RefResolver.resolve_remote):
+        if scheme == 'file':
+            fetch = _fetch_file
+        elif scheme in ('http', 'https') and requests is not None:
+            fetch = _fetch_http
+    if fetch is None:
+        document = resolver.resolve_remote(url)
+        return document, _digest(document)
+
+    with _fetched_lock:
+        known = _fetched.get(url)
+    entry = fetch(url, known)
+    if entry is not known:
+        validator, document, _ = entry
+        entry = (validator, document, _digest(document))
+        with _fetched_lock:
+            if validator is None:
+                _fetched.pop(url, None)
+            else:
+                _fetched[url] = entry
+    return entry[1], entry[2]
+
+
+def _digest(document):
+    return hashlib.sha256(json.dumps(
+        document, sort_keys=True).encode('utf-8')).hexdigest()
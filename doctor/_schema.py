@@ -1,5 +1,66 @@
+import copy
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+import threading
+import weakref
+
 import jsonschema
+import six
+from jsonschema import FormatChecker
+from jsonschema.exceptions import RefResolutionError
 from jsonschema.validators import validator_for
+from six.moves.urllib.parse import urldefrag, urljoin
+from six.moves.urllib.request import pathname2url
+
+from doctor._compiler import compile_validator
+from doctor._diskcache import DiskCache
+from doctor._errors import FastValidationError
+from doctor._precompile import bind_module, load_module, precompiled_path
+from doctor._resolver import CachingRefResolver, fetch_document
+from doctor._version import __version__
+from doctor._stream import validate_file, validate_stream
+
+
+#: Keywords whose value is a subschema (or a list of subschemas).
+_SUBSCHEMA_KEYWORDS = frozenset([
+    u'additionalItems', u'additionalProperties', u'allOf', u'anyOf',
+    u'items', u'not', u'oneOf'])
+
+#: Keywords whose value is a dict mapping names to subschemas.
+_SUBSCHEMA_DICT_KEYWORDS = frozenset([
+    u'dependencies', u'patternProperties', u'properties'])
+
+
+class _LocalValidator(object):
+
+    """Forwards attribute lookups to the calling thread's validator."""
+
+    def __init__(self, schema):
+        self._schema = schema
+
+    def __getattr__(self, name):
+        return getattr(self._schema.validator, name)
+
+
+def _make_format_check(func, raises):
+    """Return a function that checks a format like
+    :meth:`jsonschema.FormatChecker.check`, but returns a bool instead of
+    raising an error.
+
+    :param callable func: The format checker's function for the format.
+    :param raises: Exceptions that func raises for nonconforming instances.
+    :returns: function
+    """
+    def conforms(instance):
+        try:
+            return bool(func(instance))
+        except raises:
+            return False
+    return conforms
 
 
 class Schema(object):
@@ -10,6 +71,9 @@ class Schema(object):
     they don't need to be created elsewhere. It can be useful for cases where
     a schema uses a custom resolver (which they do for Doctor).
 
+    Schemas can be used from many threads at once. Each thread gets its own
+    copy of the resolver and validator the first time it uses them.
+
     :param dict raw_schema: The actual JSON schema dictionary.
     :param str base_uri: The base URI for this schema. When created from a
         file, this is set to the directory the schema was contained in, so that
@@ -20,31 +84,235 @@ class Schema(object):
         schema. If unspecified, a new resolver will be created using
         resolver_cls.
     :param class resolver_cls: The class to use for the resolver, if creating
-        a new resolver on the fly. Defaults to :class:`jsonschema.RefResolver`.
+        a new resolver on the fly. Defaults to :class:`CachingRefResolver`,
+        which shares resolved references with other schemas.
     :param jsonschema.Validator validator: A validator to use for this schema.
         If unspecified, a new validator will be created using validator_cls.
     :param class validator_cls: The class to use for the validator, if creating
         a new validator on the fly. Defaults to the value returned by
         :func:`jsonschema.validators.validator_for()` for the given schema.
+    :param DiskCache cache: A persistent cache for dereferenced definitions
+        and compiled validators. See :meth:`from_file`.
+    :param module precompiled: A module of validators for the schema's
+        definitions, generated by "python -m doctor compile". It's ignored
+        (with a warning) if it was generated for a different schema.
+    :param format_checker: If True, the format keyword is checked using a
+        :class:`jsonschema.FormatChecker` with every format jsonschema
+        supports. A checker can be passed to choose the formats. By default,
+        formats aren't checked. Only used when the validator is created
+        here.
+    :type format_checker: bool, jsonschema.FormatChecker, or None
     """
 
     def __init__(self, raw_schema, base_uri=None, resolver=None,
-                 resolver_cls=None, validator=None, validator_cls=None):
+                 resolver_cls=None, validator=None, validator_cls=None,
+                 cache=None, precompiled=None, format_checker=None):
         self.raw_schema = raw_schema
+        self.cache = cache
+
+        if format_checker is True:
+            format_checker = FormatChecker()
+        elif format_checker is False:
+            format_checker = None
+        elif format_checker is not None and not isinstance(
+                format_checker, FormatChecker):
+            raise TypeError(('format_checker should be a bool or an instance '
+                             'of FormatChecker (was {!r})').format(
+                                 format_checker))
 
         if resolver is None:
             if resolver_cls is None:
-                resolver_cls = jsonschema.RefResolver
+                resolver_cls = CachingRefResolver
             if base_uri is None:
                 base_uri = self.raw_schema.get(u'id', u'')
             resolver = resolver_cls(base_uri, self.raw_schema)
-        self.resolver = resolver
 
         if validator is None:
             if validator_cls is None:
                 validator_cls = validator_for(self.raw_schema)
-            validator = validator_cls(self.raw_schema, resolver=self.resolver)
-        self.validator = validator
+            validator_kwargs = {}
+            if format_checker is not None:
+                # Custom validator classes might not take a format_checker.
+                validator_kwargs['format_checker'] = format_checker
+            validator = validator_cls(self.raw_schema, resolver=resolver,
+                                      **validator_kwargs)
+
+        # Resolvers keep a stack of scopes while resolving references, so
+        # each thread gets its own copy of the resolver and validator. The
+        # thread that created the schema uses the originals.
+        self._resolver = resolver
+        self._validator = validator
+        self._local = threading.local()
+        self._local.resolver = resolver
+        self._local.validator = validator
+
+        #: A stand-in for :attr:`validator` that always uses the calling
+        #: thread's validator. Compiled code refers to this, so it can be
+        #: shared by all threads.
+        self.local_validator = _LocalValidator(self)
+
+        #: Compiled regular expressions, keyed by pattern. See
+        #: :meth:`get_pattern`.
+        self.patterns = {}
+        #: Functions that check formats, keyed by format name. See
+        #: :meth:`get_format`.
+        self.formats = {}
+        self._prepare_tables(raw_schema)
+
+        # Digests of the other documents the schema refers to. See
+        # document_digests.
+        self._document_digests = None
+
+        #: Precompiled validators, keyed by the absolute URL of the
+        #: definition they validate.
+        self.precompiled = {}
+        if precompiled is not None:
+            self.precompiled = bind_module(self, precompiled)
+
+        #: Code for compiled validators that was compiled in other
+        #: processes, keyed like the validators in :attr:`cache`. This is
+        #: kept apart from the cache, so the schema's cache setting doesn't
+        #: change. See :func:`doctor.warmup`.
+        self.compiled_code = {}
+
+        #: Annotations created with this schema, which are refreshed by
+        #: :meth:`reload`.
+        self.annotations = weakref.WeakSet()
+
+        # Dereferenced subschemas, keyed by the absolute URL of the
+        # reference that pointed to them.
+        self._dereferenced = {}
+        if cache is not None:
+            self._dereferenced.update(cache.get('dereferenced', {}))
+
+        # Interned subschemas, and the validators and views built from them,
+        # keyed by their contents. Annotations with identical schemas share
+        # these instead of building their own.
+        self._interned = {}
+        self._compiled = {}
+        self._views = {}
+
+    @property
+    def resolver(self):
+        """The resolver for the calling thread."""
+        try:
+            return self._local.resolver
+        except AttributeError:
+            self._create_local()
+            return self._local.resolver
+
+    @resolver.setter
+    def resolver(self, resolver):
+        self._resolver = resolver
+        self._local = threading.local()
+        self._local.resolver = resolver
+        self._local.validator = self._validator
+
+    @property
+    def validator(self):
+        """The validator for the calling thread."""
+        try:
+            return self._local.validator
+        except AttributeError:
+            self._create_local()
+            return self._local.validator
+
+    @validator.setter
+    def validator(self, validator):
+        self._validator = validator
+        self._local = threading.local()
+        self._local.resolver = self._resolver
+        self._local.validator = validator
+
+    def _create_local(self):
+        # Copies share everything with the originals (including the store of
+        # documents and the resolution cache) except for the scope stack.
+        resolver = copy.copy(self._resolver)
+        resolver._scopes_stack = [self._resolver._scopes_stack[0]]
+        validator = copy.copy(self._validator)
+        validator.resolver = resolver
+        self._local.resolver = resolver
+        self._local.validator = validator
+
+    @classmethod
+    def from_file(cls, path, cache_dir=None, **kwargs):
+        """Create a schema from a JSON file.
+
+        The base URI for the schema is set to the directory containing the
+        file, so relative references to other files work as expected.
+
+        If cache_dir is specified, the parsed schema, dereferenced
+        definitions and compiled validators are kept in a cache file in that
+        directory. The cache is keyed by a hash of the file's contents (and
+        the versions of Doctor, jsonschema and Python), and records hashes
+        of any other documents the schema refers to, so it's invalidated
+        automatically when any of them change. Call :meth:`save_cache` once
+        the schema has been used (e.g. after importing all the annotated
+        functions) to write the cache, so that later processes can load
+        everything by unpickling it.
+
+        If a module generated by "python -m doctor compile" exists next to
+        the file (named like schema_validators.py for schema.json), and
+        precompiled isn't passed explicitly, its validators are used instead
+        of compiling the definitions at runtime.
+
+        :param str path: Path to the JSON schema file.
+        :param str cache_dir: Directory to keep cache files in.
+        :param kwargs: Passed to the constructor.
+        :returns: Schema
+        """
+        path = os.path.abspath(path)
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        kwargs.setdefault('base_uri', 'file:' + pathname2url(
+            os.path.dirname(path)) + '/')
+        if 'precompiled' not in kwargs:
+            module_path = precompiled_path(path)
+            if os.path.exists(module_path):
+                kwargs['precompiled'] = load_module(module_path)
+
+        cache = raw_schema = None
+        if cache_dir is not None:
+            validator_cls = kwargs.get('validator_cls')
+            identity = repr((
+                __version__, jsonschema.__version__, sys.version_info[:2],
+                marshal.version, kwargs['base_uri'],
+                validator_cls and (validator_cls.__module__,
+                                   validator_cls.__name__)))
+            digest = hashlib.sha256(data + identity.encode('utf-8'))
+            cache = DiskCache(os.path.join(cache_dir, '{}-{}.cache'.format(
+                os.path.basename(path), digest.hexdigest()[:32])))
+            raw_schema = cache.get('raw_schema')
+        if raw_schema is None:
+            raw_schema = json.loads(data.decode('utf-8'))
+            if cache is not None:
+                cache.set('raw_schema', raw_schema)
+        schema = cls(raw_schema, **kwargs)
+        if cache is not None:
+            # The cached views and validators include content from other
+            # documents the schema refers to, so they're only used if those
+            # haven't changed either.
+            digests = schema.document_digests()
+            if cache.get('documents') != digests:
+                cache.clear()
+                cache.set('raw_schema', raw_schema)
+                cache.set('documents', digests)
+            schema.cache = cache
+            schema._dereferenced.update(cache.get('dereferenced', {}))
+        return schema
+
+    def save_cache(self):
+        """Write the schema's cache to disk, if it has one.
+
+        Anything compiled or dereferenced since the cache was loaded is
+        included. Does nothing if the schema doesn't have a cache, or if
+        nothing has changed.
+        """
+        if self.cache is None:
+            return
+        if len(self._dereferenced) != len(self.cache.get('dereferenced', {})):
+            self.cache.set('dereferenced', dict(self._dereferenced))
+        self.cache.save()
 
     def resolve(self, ref):
         """Resolve a reference within the schema.
@@ -55,3 +323,482 @@ class Schema(object):
         :raises jsonschema.RefResolutionError:
         """
         return self.resolver.resolve(ref)
+
+    def validate(self, instance, subschema, fast_fail=False, validate=None,
+                 view=None):
+        """Validate an instance against a subschema.
+
+        :param instance: The instance to validate.
+        :param dict subschema: The schema to validate the instance against.
+        :param bool fast_fail: If True, stop at the first problem and raise
+            a :class:`FastValidationError` for it, rather than building a
+            detailed error with the schema's validator.
+        :param function validate: A compiled version of subschema, if the
+            caller has one already. See :meth:`compile`.
+        :param dict view: A dereferenced version of subschema, if the caller
+            has one already. See :meth:`dereference`.
+        :raises jsonschema.ValidationError:
+        """
+        if validate is None:
+            validate = self.compile(subschema)
+        failure = validate(instance)
+        if failure is not None:
+            if fast_fail:
+                raise FastValidationError(*failure)
+            if view is None:
+                view = self.dereference(subschema)
+            self.validator.validate(instance, view)
+
+    def is_valid(self, instance, subschema, validate=None):
+        """Return True if an instance is valid against a subschema.
+
+        This never builds any errors, so it's the cheapest way to check
+        invalid instances.
+
+        :param instance: The instance to check.
+        :param dict subschema: The schema to check the instance against.
+        :param function validate: A compiled version of subschema, if the
+            caller has one already. See :meth:`compile`.
+        :returns: bool
+        """
+        if validate is None:
+            validate = self.compile(subschema)
+        return validate(instance) is None
+
+    def validate_many(self, instances, subschema, validate=None, view=None):
+        """Validate a sequence of instances against the same subschema.
+
+        The subschema is compiled and dereferenced once for the whole batch,
+        rather than once per instance. Unlike :meth:`validator.validate`,
+        this doesn't raise on the first invalid instance.
+
+        :param instances: An iterable of instances to validate.
+        :param dict subschema: The schema to validate the instances against.
+        :param function validate: A compiled version of subschema, if the
+            caller has one already. See :meth:`compile`.
+        :param dict view: A dereferenced version of subschema, if the caller
+            has one already. See :meth:`dereference`.
+        :returns: A list with an entry for each instance, which is None if
+            the instance was valid or the first
+            :class:`jsonschema.ValidationError` for it if not.
+        """
+        if validate is None:
+            validate = self.compile(subschema)
+        if view is None:
+            view = self.dereference(subschema)
+        iter_errors = self.validator.iter_errors
+        errors = []
+        append = errors.append
+        for instance in instances:
+            if validate(instance) is None:
+                append(None)
+            else:
+                append(next(iter_errors(instance, view), None))
+        return errors
+
+    def validate_stream(self, fp, subschema, chunk_size=65536):
+        """Validate a JSON document read incrementally from a file object.
+
+        Elements of arrays and members of objects are validated as they're
+        parsed and then discarded, at any depth, so memory use is bounded by
+        the largest value that can't be streamed rather than the whole
+        document. See :func:`doctor._stream.validate_stream`.
+
+        :param fp: A file-like object, opened in binary or text mode.
+        :param dict subschema: The schema to validate the document against.
+        :param int chunk_size: How much data to read at a time.
+        :raises jsonschema.ValidationError:
+        :raises ValueError: if the document isn't valid JSON.
+        """
+        validate_stream(self, fp, subschema, chunk_size=chunk_size)
+
+    def validate_file(self, path, subschema, use_mmap=False,
+                      chunk_size=65536):
+        """Validate a JSON file incrementally. See :meth:`validate_stream`.
+
+        :param str path: Path to the JSON file.
+        :param dict subschema: The schema to validate the document against.
+        :param bool use_mmap: If True, memory map the file instead of
+            reading it into buffers.
+        :param int chunk_size: How much data to read at a time.
+        :raises jsonschema.ValidationError:
+        :raises ValueError: if the document isn't valid JSON.
+        """
+        validate_file(self, path, subschema, use_mmap=use_mmap,
+                      chunk_size=chunk_size)
+
+    def dereference(self, subschema):
+        """Return a view of a subschema with its references inlined.
+
+        Each `$ref` is replaced by the subschema it refers to, so validating
+        against the view doesn't need to go through the resolver. The
+        inlined subschemas are shared between all views created by this
+        schema, so they must not be modified. References that would recurse
+        forever, or that can't be resolved, are left in place (as absolute
+        URLs, so they can still be resolved from anywhere in the view).
+
+        :param dict subschema: The schema to dereference.
+        :returns: dict
+        """
+        key = self._content_key(subschema)
+        view = self._views.get(key) if key is not None else None
+        if view is None:
+            view = self._dereference(subschema, set())
+            if key is not None:
+                view = self._views.setdefault(key, view)
+        return view
+
+    def _dereference(self, subschema, in_progress):
+        if isinstance(subschema, list):
+            return [self._dereference(item, in_progress)
+                    for item in subschema]
+        elif not isinstance(subschema, dict):
+            return subschema
+
+        ref = subschema.get(u'$ref')
+        if ref is not None:
+            return self._dereference_ref(ref, in_progress)
+
+        scope = subschema.get(u'id')
+        if scope:
+            self.resolver.push_scope(scope)
+        try:
+            view = {}
+            for keyword, value in six.iteritems(subschema):
+                if keyword in _SUBSCHEMA_KEYWORDS:
+                    value = self._dereference(value, in_progress)
+                elif (keyword in _SUBSCHEMA_DICT_KEYWORDS and
+                        isinstance(value, dict)):
+                    value = dict(
+                        (name, self._dereference(item, in_progress))
+                        for name, item in six.iteritems(value))
+                view[keyword] = value
+        finally:
+            if scope:
+                self.resolver.pop_scope()
+        return view
+
+    def _dereference_ref(self, ref, in_progress):
+        url = urljoin(self.resolver.resolution_scope, ref)
+        view = self._dereferenced.get(url)
+        if view is not None:
+            return view
+        if url in in_progress:
+            # This is a recursive reference, which can't be inlined.
+            return {u'$ref': url}
+        try:
+            url, resolved = self.resolver.resolve(url)
+        except RefResolutionError:
+            # Leave it to the validator to raise the error.
+            return {u'$ref': url}
+        in_progress.add(url)
+        try:
+            with self.resolver.in_scope(url):
+                view = self._dereference(resolved, in_progress)
+        finally:
+            in_progress.discard(url)
+        self._dereferenced[url] = view
+        return view
+
+    def references(self, subschema):
+        """Return every reference a subschema depends on.
+
+        This includes references made by the subschemas that are referred
+        to, and so on.
+
+        :param dict subschema:
+        :returns: A set of absolute reference URLs.
+        """
+        urls = set()
+        self._references(subschema, urls)
+        return urls
+
+    def external_documents(self):
+        """Return the other documents the schema refers to.
+
+        This includes documents referred to by those documents, and so on.
+        Each document is fetched again (or checked for changes, if it was
+        fetched before), instead of being taken from the resolution cache,
+        so that content derived from it (like cached or precompiled
+        validators) can be checked against its current version. Cached
+        copies that have changed are replaced.
+
+        Digests of the documents are kept for :meth:`document_digests`.
+        See :func:`doctor._resolver.fetch_document` for what fetching them
+        costs.
+
+        :returns: A dict mapping document URLs to their contents. Documents
+            that can't be fetched are left out.
+        """
+        resolver = self.resolver
+        # References to this document are normalized by urljoin (which
+        # turns file:/path into file:///path), so both forms are skipped.
+        own_url = urldefrag(resolver._scopes_stack[0])[0]
+        own_urls = set([own_url, urldefrag(urljoin(own_url, u'#'))[0], u''])
+        roots = [self.raw_schema]
+        definitions = self.raw_schema.get(u'definitions')
+        if isinstance(definitions, dict):
+            roots.extend(six.itervalues(definitions))
+        documents = {}
+        digests = {}
+        failed = set()
+        while True:
+            urls = set(urldefrag(url)[0] for url in self.references(roots))
+            urls -= set(documents) | failed | own_urls
+            if not urls:
+                self._document_digests = digests
+                return documents
+            for url in urls:
+                try:
+                    document, digests[url] = fetch_document(resolver, url)
+                except Exception:
+                    failed.add(url)
+                    continue
+                documents[url] = document
+                resolution_cache = getattr(resolver, 'resolution_cache', None)
+                cached = resolver.store.get(url)
+                if cached is None and resolution_cache is not None:
+                    cached = resolution_cache.get(url, u'')
+                if cached == document:
+                    # Keep using the cached copy, so fragments resolved in
+                    # it stay cached.
+                    resolver.store[url] = cached
+                    continue
+                if resolution_cache is not None:
+                    resolution_cache.invalidate(url)
+                # References are looked for again in the current version.
+                resolver.store[url] = document
+
+    def document_digests(self):
+        """Return digests of the other documents the schema refers to.
+
+        The digests are computed the first time this is called (or when
+        :meth:`external_documents` is), and shared by everything that
+        checks content derived from those documents, like the disk cache
+        and precompiled validators. So each document is only fetched once
+        while a schema is created.
+
+        :returns: A dict mapping document URLs to SHA-256 hashes of their
+            contents.
+        """
+        digests = self._document_digests
+        if digests is None:
+            self.external_documents()
+            digests = self._document_digests
+        return digests
+
+    def _references(self, subschema, urls):
+        if isinstance(subschema, list):
+            for item in subschema:
+                self._references(item, urls)
+            return
+        elif not isinstance(subschema, dict):
+            return
+
+        ref = subschema.get(u'$ref')
+        if ref is not None:
+            url = urljoin(self.resolver.resolution_scope, ref)
+            if url in urls:
+                return
+            urls.add(url)
+            try:
+                url, resolved = self.resolver.resolve(url)
+            except RefResolutionError:
+                return
+            with self.resolver.in_scope(url):
+                self._references(resolved, urls)
+            return
+
+        scope = subschema.get(u'id')
+        if scope:
+            self.resolver.push_scope(scope)
+        try:
+            for keyword, value in six.iteritems(subschema):
+                if keyword in _SUBSCHEMA_KEYWORDS:
+                    self._references(value, urls)
+                elif (keyword in _SUBSCHEMA_DICT_KEYWORDS and
+                        isinstance(value, dict)):
+                    for item in six.itervalues(value):
+                        self._references(item, urls)
+        finally:
+            if scope:
+                self.resolver.pop_scope()
+
+    def reload(self, raw_schema):
+        """Replace the schema with a new version.
+
+        Only the annotations whose schemas depend on something that changed
+        (like a definition they refer to, directly or through other
+        definitions) are refreshed. Other annotations are left alone, and
+        keep using the validators they already have.
+
+        Reloading isn't atomic, so calls made while a schema is being
+        reloaded may be validated against either version. Precompiled
+        validators and the disk cache are for the old version, so they
+        aren't used after reloading.
+
+        :param dict raw_schema: The new schema. Its id (and so its base URI)
+            must be the same as before.
+        :returns: A list of the annotations that were refreshed.
+        """
+        old_schema = self.raw_schema
+        resolver = self._resolver
+        base_uri = resolver._scopes_stack[0]
+        document_url = urldefrag(base_uri)[0]
+
+        self.raw_schema = raw_schema
+        resolver.referrer = raw_schema
+        resolver.store[base_uri] = raw_schema
+        clear_remote_cache = getattr(resolver._remote_cache, 'cache_clear',
+                                     None)
+        if clear_remote_cache is not None:
+            clear_remote_cache()
+        resolution_cache = getattr(resolver, 'resolution_cache', None)
+        if resolution_cache is not None:
+            resolution_cache.invalidate(document_url)
+        self._validator.schema = raw_schema
+        self._prepare_tables(raw_schema)
+        # Threads (including this one) get new copies of the resolver and
+        # validator when they next use them.
+        self._local = threading.local()
+        self._dereferenced = {}
+        self._compiled = {}
+        self._views = {}
+        self.precompiled = {}
+        self.compiled_code = {}
+        self.cache = None
+        self._document_digests = None
+
+        changed = {}
+
+        def has_changed(url):
+            url, fragment = urldefrag(url)
+            if url != document_url:
+                # Other documents aren't affected by reloading this one.
+                return False
+            if fragment not in changed:
+                values = []
+                for document in (old_schema, raw_schema):
+                    try:
+                        values.append(resolver.resolve_fragment(
+                            document, fragment))
+                    except RefResolutionError:
+                        values.append(RefResolutionError)
+                changed[fragment] = values[0] != values[1]
+            return changed[fragment]
+
+        refreshed = []
+        for annotation in list(self.annotations):
+            if any(has_changed(url) for url in annotation.dependencies):
+                annotation.refresh()
+                if annotation.args_cache is not None:
+                    # Arguments that were valid might not be any more.
+                    annotation.args_cache.clear()
+                refreshed.append(annotation)
+        return refreshed
+
+    def compile(self, subschema):
+        """Compile a subschema into a Python validation function.
+
+        The function returns None for valid instances, or a tuple of (path,
+        keyword) for the first failure. See
+        :func:`doctor._compiler.compile_validator`.
+
+        :param dict subschema: The schema to compile. References are
+            resolved using this schema's resolver.
+        :returns: function
+        """
+        key = self._content_key(subschema)
+        validator = self._compiled.get(key) if key is not None else None
+        if validator is None:
+            validator = compile_validator(self, subschema, cache=self.cache)
+            if key is not None:
+                validator = self._compiled.setdefault(key, validator)
+        return validator
+
+    def get_pattern(self, pattern):
+        """Return a compiled regular expression for a pattern.
+
+        The patterns in the schema are compiled when it's created, so
+        compiled validators share them instead of compiling their own.
+
+        :param str pattern:
+        :returns: A compiled regular expression.
+        :raises re.error: if the pattern isn't valid.
+        """
+        regex = self.patterns.get(pattern)
+        if regex is None:
+            regex = self.patterns[pattern] = re.compile(pattern)
+        return regex
+
+    def get_format(self, name):
+        """Return a function that checks a format.
+
+        The function takes an instance and returns True if it conforms to
+        the format (instances of types the format doesn't apply to always
+        conform).
+
+        :param str name: Name of the format, like 'email'.
+        :returns: function, or None if the schema's validator doesn't check
+            the format.
+        """
+        try:
+            return self.formats[name]
+        except KeyError:
+            pass
+        checker = getattr(self._validator, 'format_checker', None)
+        conforms = None
+        if checker is not None and name in checker.checkers:
+            conforms = _make_format_check(*checker.checkers[name])
+        return self.formats.setdefault(name, conforms)
+
+    def _prepare_tables(self, subschema):
+        # Compile every pattern and look up every format up front. Values
+        # that look like keywords but aren't (like properties named
+        # "pattern") just add unused entries.
+        if isinstance(subschema, list):
+            for item in subschema:
+                self._prepare_tables(item)
+            return
+        elif not isinstance(subschema, dict):
+            return
+        for keyword, value in six.iteritems(subschema):
+            if keyword == u'pattern' and isinstance(value, six.string_types):
+                patterns = [value]
+            elif keyword == u'patternProperties' and isinstance(value, dict):
+                patterns = list(value)
+            else:
+                patterns = ()
+            for pattern in patterns:
+                try:
+                    self.get_pattern(pattern)
+                except (TypeError, re.error):
+                    # Invalid patterns are reported when validating.
+                    pass
+            if keyword == u'format' and isinstance(value, six.string_types):
+                self.get_format(value)
+            self._prepare_tables(value)
+
+    def intern(self, subschema):
+        """Return a shared copy of a subschema.
+
+        Subschemas with the same contents are interned to the same object,
+        so annotations generated from the same arguments or definitions
+        don't each keep their own copy.
+
+        :param dict subschema:
+        :returns: dict
+        """
+        key = self._content_key(subschema)
+        if key is None:
+            return subschema
+        return self._interned.setdefault(key, subschema)
+
+    def _content_key(self, subschema):
+        # References are resolved relative to the current scope, so the same
+        # contents can mean different things in different scopes.
+        try:
+            source = json.dumps(subschema, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return self.resolver.resolution_scope, source
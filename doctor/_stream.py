@@ -0,0 +1,365 @@
+import codecs
+import json
+import mmap
+
+import six
+from jsonschema.exceptions import ValidationError
+
+
+#: Keywords that can be checked for an array without holding the whole
+#: array in memory.
+_ARRAY_KEYWORDS = frozenset([
+    u'type', u'items', u'additionalItems', u'minItems', u'maxItems'])
+
+#: Keywords that can be checked for an object without holding the whole
+#: object in memory. Only the member names are kept.
+_OBJECT_KEYWORDS = frozenset([
+    u'type', u'properties', u'patternProperties', u'additionalProperties',
+    u'required', u'minProperties', u'maxProperties'])
+
+#: Used for members without a subschema, so they're streamed too.
+_ANYTHING = {}
+
+_WHITESPACE = u' \t\n\r'
+
+#: Characters that can follow a number in a valid document.
+_NUMBER_END = _WHITESPACE + u',]}'
+
+
+class _Reader(object):
+
+    """Reads JSON values one at a time from a file-like object.
+
+    Only the part of the document that hasn't been consumed yet is kept in
+    memory, so the memory used depends on the size of the largest value
+    read, rather than the size of the whole document.
+
+    :param fp: A file-like object with a read() method. It can return either
+        bytes (which are decoded as UTF-8) or text.
+    :param int chunk_size: How much to read from fp at a time.
+    """
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = None
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = u''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Read more of the document into the buffer.
+
+        :returns: False if the end of the document has been reached.
+        """
+        if self.eof:
+            return False
+        data = self.fp.read(max(size or 0, self.chunk_size))
+        if isinstance(data, six.binary_type):
+            if self.decoder is None:
+                self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            text = self.decoder.decode(data, final=not data)
+        else:
+            text = data
+        if not data:
+            self.eof = True
+        # Drop whatever has already been consumed.
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return not self.eof or bool(text)
+
+    def peek(self):
+        """Skip whitespace and return the next character.
+
+        :returns: The next character, or an empty string at the end of the
+            document.
+        """
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            length = len(buffer)
+            while pos < length and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < length:
+                return buffer[pos]
+            if not self.fill():
+                return u''
+
+    def advance(self):
+        self.pos += 1
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expecting one of {!r} (found {!r})'.format(
+                chars, char))
+        self.advance()
+        return char
+
+    def expect_end(self):
+        char = self.peek()
+        if char:
+            raise ValueError('Extra data after JSON document (found '
+                             '{!r})'.format(char))
+
+    def read_value(self):
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer,
+                                                          self.pos)
+            except ValueError:
+                # The value is probably incomplete, so read more. The read
+                # size grows with the buffer so large values don't take a
+                # quadratic number of attempts.
+                if not self.fill(len(self.buffer) - self.pos):
+                    raise
+                continue
+            if (not self.eof and isinstance(value, (float,) +
+                                            six.integer_types) and
+                    not isinstance(value, bool) and
+                    (end >= len(self.buffer) or
+                     self.buffer[end] not in _NUMBER_END)):
+                # The number might continue in the next chunk (like '2.'
+                # followed by '5'), so it's only complete once something
+                # that can't be part of it follows.
+                self.fill(len(self.buffer) - self.pos)
+                continue
+            self.pos = end
+            return value
+
+
+def _error(keyword, view, message):
+    return ValidationError(message, validator=keyword,
+                           validator_value=view[keyword], schema=view)
+
+
+def _check_type(view, type_name):
+    if u'type' not in view:
+        return
+    types = view[u'type']
+    if not isinstance(types, list):
+        types = [types]
+    if type_name not in types:
+        raise _error(u'type', view, '{} is not of type {}'.format(
+            type_name, ', '.join(repr(t) for t in types)))
+
+
+class _StreamValidator(object):
+
+    """Validates the values read by a :class:`_Reader`.
+
+    Arrays and objects whose subschemas can be checked one member at a time
+    are validated as they're read, recursively, so only scalars and the
+    members that can't be streamed are ever decoded.
+
+    :param Schema schema: Schema used for references and validation.
+    :param _Reader reader:
+    """
+
+    def __init__(self, schema, reader):
+        self.schema = schema
+        self.reader = reader
+        self.compiled = {}
+        self.streamable = {}
+        # Keeps the subschemas alive while their ids are used as keys.
+        self._subschemas = []
+
+    def _is_streamable(self, view, first):
+        key = (id(view), first)
+        streamable = self.streamable.get(key)
+        if streamable is None:
+            keywords = {u'[': _ARRAY_KEYWORDS,
+                        u'{': _OBJECT_KEYWORDS}.get(first)
+            validators = self.schema.validator.VALIDATORS
+            streamable = self.streamable[key] = (
+                keywords is not None and isinstance(view, dict) and
+                u'$ref' not in view and not view.get(u'id') and
+                all(keyword in keywords or keyword not in validators
+                    for keyword in view))
+            self._subschemas.append(view)
+        return streamable
+
+    def _validate_instance(self, value, view, path):
+        key = id(view)
+        validate = self.compiled.get(key)
+        if validate is None:
+            validate = self.compiled[key] = self.schema.compile(view)
+            self._subschemas.append(view)
+        if validate(value) is not None:
+            error = next(self.schema.validator.iter_errors(value, view),
+                         None)
+            if error is not None:
+                if path is not None:
+                    error.path.appendleft(path)
+                raise error
+
+    def validate_value(self, views, path=None):
+        """Read the next value and validate it against each of views.
+
+        :param list views: Dereferenced subschemas the value must match.
+        :param path: Index or name of the value in its container, which is
+            added to the path of validation errors.
+        """
+        if len(views) == 1:
+            first = self.reader.peek()
+            if self._is_streamable(views[0], first):
+                try:
+                    if first == u'[':
+                        self.validate_array(views[0])
+                    else:
+                        self.validate_object(views[0])
+                except ValidationError as error:
+                    if path is not None:
+                        error.path.appendleft(path)
+                    raise
+                return
+        value = self.reader.read_value()
+        for view in views:
+            self._validate_instance(value, view, path)
+
+    def validate_array(self, view):
+        reader = self.reader
+        _check_type(view, u'array')
+        items = view.get(u'items', {})
+        additional_items = view.get(u'additionalItems', True)
+        count = 0
+        reader.expect(u'[')
+        if reader.peek() == u']':
+            reader.advance()
+        else:
+            while True:
+                if isinstance(items, dict):
+                    views = [items]
+                elif count < len(items):
+                    views = [items[count]]
+                elif isinstance(additional_items, dict):
+                    views = [additional_items]
+                elif not additional_items:
+                    raise _error(u'additionalItems', view,
+                                 'Additional items are not allowed')
+                else:
+                    views = [_ANYTHING]
+                self.validate_value(views, count)
+                count += 1
+                if reader.expect(u',]') == u']':
+                    break
+
+        if u'minItems' in view and count < view[u'minItems']:
+            raise _error(u'minItems', view, 'array of {} items is too '
+                                            'short'.format(count))
+        if u'maxItems' in view and count > view[u'maxItems']:
+            raise _error(u'maxItems', view, 'array of {} items is too '
+                                            'long'.format(count))
+
+    def validate_object(self, view):
+        reader = self.reader
+        _check_type(view, u'object')
+        properties = view.get(u'properties', {})
+        patterns = [(self.schema.get_pattern(pattern), subschema)
+                    for pattern, subschema in
+                    six.iteritems(view.get(u'patternProperties', {}))]
+        additional_properties = view.get(u'additionalProperties', True)
+        # Only the required names are remembered, so memory doesn't grow
+        # with the size of the object.
+        required = set(view.get(u'required', []))
+        found = set()
+        count = 0
+        reader.expect(u'{')
+        if reader.peek() == u'}':
+            reader.advance()
+        else:
+            while True:
+                name = reader.read_value()
+                if not isinstance(name, six.string_types):
+                    raise ValueError('Expecting property name (found '
+                                     '{!r})'.format(name))
+                reader.expect(u':')
+                count += 1
+                if name in required:
+                    found.add(name)
+                views = []
+                if name in properties:
+                    views.append(properties[name])
+                for regex, subschema in patterns:
+                    if regex.search(name):
+                        views.append(subschema)
+                if not views:
+                    if isinstance(additional_properties, dict):
+                        views.append(additional_properties)
+                    elif not additional_properties:
+                        raise _error(u'additionalProperties', view,
+                                     'Additional properties are not allowed '
+                                     '({!r} was unexpected)'.format(name))
+                    else:
+                        views.append(_ANYTHING)
+                self.validate_value(views, name)
+                if reader.expect(u',}') == u'}':
+                    break
+
+        for name in view.get(u'required', []):
+            if name not in found:
+                raise _error(u'required', view,
+                             '{!r} is a required property'.format(name))
+        if u'minProperties' in view and count < view[u'minProperties']:
+            raise _error(u'minProperties', view,
+                         'object does not have enough properties')
+        if u'maxProperties' in view and count > view[u'maxProperties']:
+            raise _error(u'maxProperties', view,
+                         'object has too many properties')
+
+
+def validate_stream(schema, fp, subschema, chunk_size=65536):
+    """Validate a JSON document from a file-like object incrementally.
+
+    If the document is an array or an object, its elements or members are
+    read and validated one at a time and then discarded, so the whole
+    document is never held in memory. Arrays and objects inside it are
+    streamed the same way, so a document like ``{"meta": ..., "rows": [...]}``
+    only holds one row at a time. This only works for values whose
+    subschemas use keywords that can be checked one member at a time (like
+    items, properties, required and maxItems). Other values, and scalars,
+    are loaded and validated normally.
+
+    :param Schema schema: Schema used for references and validation.
+    :param fp: A file-like object containing the JSON document.
+    :param dict subschema: The schema to validate the document against.
+    :param int chunk_size: How much data to read from fp at a time.
+    :raises jsonschema.ValidationError: if the document isn't valid.
+    :raises ValueError: if the document isn't valid JSON.
+    """
+    reader = _Reader(fp, chunk_size)
+    _StreamValidator(schema, reader).validate_value(
+        [schema.dereference(subschema)])
+    reader.expect_end()
+
+
+def validate_file(schema, path, subschema, use_mmap=False,
+                  chunk_size=65536):
+    """Validate a JSON file incrementally. See :func:`validate_stream`.
+
+    :param Schema schema:
+    :param str path: Path to the JSON file.
+    :param dict subschema:
+    :param bool use_mmap: If True, the file is memory mapped rather than
+        read into buffers, so its contents are only held by the OS page
+        cache.
+    :param int chunk_size:
+    """
+    with open(path, 'rb') as fp:
+        if use_mmap:
+            try:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can't be mapped.
+                mapped = None
+            if mapped is not None:
+                try:
+                    return validate_stream(schema, mapped, subschema,
+                                           chunk_size=chunk_size)
+                finally:
+                    mapped.close()
+        return validate_stream(schema, fp, subschema, chunk_size=chunk_size)
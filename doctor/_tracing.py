@@ -0,0 +1,91 @@
+import threading
+import timeit
+
+
+#: Phases of an annotated call, in the order hooks are called for them.
+COLLECT = 'collect'
+ARGS = 'args'
+CALL = 'call'
+RESULT = 'result'
+
+#: Registered hooks. This is replaced rather than modified, so wrappers can
+#: check it without locking.
+hooks = ()
+_hooks_lock = threading.Lock()
+
+_timer = timeit.default_timer
+
+
+def add_hook(hook):
+    """Register a hook to be called after each phase of an annotated call.
+
+    Hooks are called with five arguments:
+
+    - annotation: The :class:`Annotation` of the function being called.
+    - phase: One of 'collect' (collecting the arguments to validate),
+      'args' (validating the arguments), 'call' (calling the function) and
+      'result' (validating the result).
+    - start: When the phase started, from :func:`timeit.default_timer`.
+    - duration: How long the phase took, in seconds.
+    - error: The exception raised during the phase, or None.
+
+    Phases that don't happen (like validating arguments for a function
+    without an args schema, or any validation for calls skipped by the
+    validation mode) aren't reported. Streamed results and results validated
+    in the background are validated after the call returns, so they don't
+    have a result phase.
+
+    Hooks are called synchronously, so they should be fast and shouldn't
+    raise exceptions. When no hooks are registered, calls aren't timed at
+    all.
+
+    :param callable hook:
+    """
+    global hooks
+    if not callable(hook):
+        raise TypeError('hook must be callable (was {!r})'.format(hook))
+    with _hooks_lock:
+        hooks = hooks + (hook,)
+
+
+def remove_hook(hook):
+    """Unregister a hook added with :func:`add_hook`.
+
+    :param callable hook:
+    :raises ValueError: if the hook isn't registered.
+    """
+    global hooks
+    with _hooks_lock:
+        if hook not in hooks:
+            raise ValueError('hook is not registered ({!r})'.format(hook))
+        remaining = list(hooks)
+        remaining.remove(hook)
+        hooks = tuple(remaining)
+
+
+def emit(annotation, phase, start, error=None):
+    """Call the registered hooks for a phase that has just finished.
+
+    :param Annotation annotation:
+    :param str phase:
+    :param float start: When the phase started.
+    :param Exception error: The exception raised during the phase, if any.
+    """
+    duration = _timer() - start
+    for hook in hooks:
+        hook(annotation, phase, start, duration, error)
+
+
+def trace(annotation, phase, func, *args, **kwargs):
+    """Call func with the given arguments, and report it as a phase.
+
+    :returns: The result of func.
+    """
+    start = _timer()
+    try:
+        result = func(*args, **kwargs)
+    except Exception as exc:
+        emit(annotation, phase, start, exc)
+        raise
+    emit(annotation, phase, start)
+    return result
@@ -43,7 +43,8 @@ def make_schema_dict(schema, usage, names, required_names=None):
     :type names: str, dict, list[str], or None
     :param list[str] required_names: If names is a list of strings, this will
         be used to enumerate which of those named properties are required.
-    :returns: dict
+    :returns: dict. Schemas generated from names are interned, so identical
+        ones are shared. See :meth:`Schema.intern`.
     :raises TypeError: if the names argument is not a valid type.
     :raises jsonschema.exceptions.RefResolutionError: if one of the names
         can't be found in the schema's definitions block.
@@ -55,7 +56,7 @@ def make_schema_dict(schema, usage, names, required_names=None):
     elif isinstance(names, six.string_types):
         ref = '#/definitions/{}'.format(names)
         schema.resolve(ref)
-        new_schema = {'$ref': ref}
+        new_schema = schema.intern({'$ref': ref})
     elif isinstance(names, dict):
         new_schema = names
     elif isinstance(names, list):
@@ -71,6 +72,7 @@ def make_schema_dict(schema, usage, names, required_names=None):
             new_schema['properties'][name] = {'$ref': ref}
         if required_names:
             new_schema['required'] = required_names
+        new_schema = schema.intern(new_schema)
     else:
         raise TypeError(('{usage!r} must be a str, dict, list[str], or '
                          'None').format(usage=usage))
@@ -2,9 +2,11 @@
 
 import mock
 import pytest
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import RefResolutionError, ValidationError
 
-from doctor import Annotation, annotate, get_wrapped
+from doctor import (
+    PASSTHROUGH, Annotation, FastValidationError, LazyAnnotation, annotate,
+    WarmupError, get_wrapped, set_lazy, warmup)
 from doctor._schema import Schema
 
 
@@ -405,6 +407,19 @@ def test_annotate_with_callable(schema):
     }
 
 
+def test_annotate_callable_without_name(schema):
+    class SomeCallable(object):
+        def __call__(self, a):
+            return a
+
+    some_callable = annotate(schema, args=['a'])(SomeCallable())
+    annotation = get_wrapped(some_callable)._doctor_annotation
+    assert annotation.metrics.name == (
+        __name__ + '.test_annotate_callable_without_name.<locals>.'
+        'SomeCallable.__call__')
+    assert some_callable('foo') == 'foo'
+
+
 def test_annotate_validation(schema):
     calls = []
 
@@ -423,3 +438,224 @@ def test_annotate_validation(schema):
     with pytest.raises(ValidationError):
         # It should raise if the result fails validation.
         func('foo', True, d=100)
+
+
+def test_annotate_args_view(schema):
+    """It should validate against a dereferenced view of the schemas."""
+
+    @annotate(schema, args=['a', 'c'], result='result')
+    def func(a, c):
+        pass
+
+    annotation = get_wrapped(func)._doctor_annotation
+    assert annotation.args_view == {
+        'type': 'object',
+        'additionalProperties': True,
+        'properties': {
+            'a': {'type': 'string'},
+            'c': {'type': 'integer'}
+        }
+    }
+    assert annotation.result_view == {'type': 'integer', 'maximum': 2}
+    with pytest.raises(ValidationError):
+        annotation.validate_args({'a': 'foo', 'c': 'bad'})
+
+
+def test_annotation_validate_many(schema):
+    @annotate(schema, result='result')
+    def func(a, b):
+        pass
+
+    annotation = get_wrapped(func)._doctor_annotation
+    errors = annotation.validate_args_many([
+        {'a': 'foo', 'b': True},
+        {'a': 'foo'},
+        {'a': 1, 'b': False},
+    ])
+    assert errors[0] is None
+    assert errors[1].validator == 'required'
+    assert errors[2].validator == 'type'
+    assert list(errors[2].path) == ['a']
+
+    errors = annotation.validate_result_many([1, 3])
+    assert errors[0] is None
+    assert errors[1].validator == 'maximum'
+
+
+def test_annotate_stream():
+    schema = Schema({
+        'definitions': {
+            'rows': {'type': 'array', 'items': {'type': 'integer'}},
+        }
+    })
+    consumed = []
+
+    @annotate(schema, args=None, result='rows', stream=True)
+    def func(rows):
+        for row in rows:
+            consumed.append(row)
+            yield row
+
+    assert list(func([1, 2, 3])) == [1, 2, 3]
+
+    # Items should be validated lazily, as they're consumed.
+    del consumed[:]
+    iterator = func([1, 'bad', 3])
+    assert consumed == []
+    assert next(iterator) == 1
+    with pytest.raises(ValidationError) as exc_info:
+        next(iterator)
+    assert list(exc_info.value.path) == [1]
+    assert consumed == [1, 'bad']
+
+    with pytest.raises(TypeError):
+        annotate(schema, result=None, stream=True)(func)
+    with pytest.raises(TypeError):
+        annotate(schema, result={'type': 'array'}, stream=True)(func)
+
+
+def test_annotate_fast_fail(schema):
+    @annotate(schema, result='result', fast_fail=True)
+    def func(a, c):
+        return c
+
+    with mock.patch.object(schema.validator, 'iter_errors') as iter_errors:
+        with pytest.raises(FastValidationError) as exc_info:
+            func('a', 'bad')
+        assert list(exc_info.value.path) == ['c']
+        assert exc_info.value.validator == 'type'
+
+        with pytest.raises(ValidationError) as exc_info:
+            func('a', 3)
+        assert exc_info.value.validator == 'maximum'
+        assert not iter_errors.called
+
+    annotation = get_wrapped(func)._doctor_annotation
+    assert annotation.is_valid_args({'a': 'a', 'c': 1})
+    assert not annotation.is_valid_args({'a': 'a', 'c': 'bad'})
+    assert annotation.is_valid_result(1)
+    assert not annotation.is_valid_result(3)
+
+
+def test_annotate_coerce(schema):
+    @annotate(schema, args=['a', 'b', 'c'], coerce=True)
+    def func(a, b, c=None):
+        return a, b, c
+
+    assert func('1', 'true', '3') == ('1', True, 3)
+    assert func('1', b='0', c='-2') == ('1', False, -2)
+    assert func('1', True) == ('1', True, None)
+    with pytest.raises(ValidationError) as exc_info:
+        func('1', 'yes')
+    assert exc_info.value.instance == 'yes'
+
+    # Arguments should be converted even when they aren't validated.
+    annotation = get_wrapped(func)._doctor_annotation
+    annotation.mode = PASSTHROUGH
+    assert func('1', 'false', '5') == ('1', False, 5)
+
+
+def test_annotate_lazy(schema):
+    with mock.patch.object(Annotation, 'create',
+                           wraps=Annotation.create) as mock_create:
+        @annotate(schema, lazy=True)
+        def func(a, b):
+            return b
+
+        @annotate(schema, lazy=True)
+        def other_func(a, b):
+            return a
+
+        @annotate(schema, args=['bad'], lazy=True)
+        def bad_func(a):
+            pass
+
+        assert not mock_create.called
+        placeholder = get_wrapped(func)._doctor_annotation
+        assert isinstance(placeholder, LazyAnnotation)
+
+        # Calling the function should create the annotation.
+        assert func('foo', True) is True
+        assert mock_create.call_count == 1
+        annotation = get_wrapped(func)._doctor_annotation
+        assert isinstance(annotation, Annotation)
+        assert placeholder.annotation is annotation
+        with pytest.raises(ValidationError):
+            func('foo', 'bad')
+        assert mock_create.call_count == 1
+
+        # Accessing the annotation should also create it.
+        placeholder = get_wrapped(other_func)._doctor_annotation
+        assert placeholder.arg_names == ['a', 'b']
+        assert mock_create.call_count == 2
+        assert get_wrapped(other_func)._doctor_annotation is (
+            placeholder.annotation)
+
+    # Errors in the schema are raised when the annotation is created.
+    with pytest.raises(WarmupError) as excinfo:
+        warmup(bad_func)
+    [(name, error)] = excinfo.value.errors
+    assert isinstance(error, RefResolutionError)
+    with pytest.raises(RefResolutionError):
+        bad_func('a')
+
+
+def test_annotate_lazy_set_mode(schema):
+    @annotate(schema, lazy=True)
+    def func(a):
+        return a
+
+    # Setting attributes should create the annotation and set them on it.
+    placeholder = get_wrapped(func)._doctor_annotation
+    placeholder.mode = PASSTHROUGH
+    assert placeholder.annotation.mode is PASSTHROUGH
+    assert func(1) == 1
+
+
+def test_warmup(schema):
+    @annotate(schema, lazy=True)
+    def func(a):
+        pass
+
+    annotations = warmup()
+    assert get_wrapped(func)._doctor_annotation in annotations
+    assert warmup() == []
+
+
+def test_warmup_errors(schema):
+    @annotate(schema, args=['bad'], lazy=True)
+    def bad_func(a):
+        pass
+
+    @annotate(schema, lazy=True)
+    def func(a):
+        pass
+
+    # Every annotation is created before the failures are raised together.
+    with pytest.raises(WarmupError) as excinfo:
+        warmup()
+    [(name, error)] = excinfo.value.errors
+    assert name.endswith('bad_func')
+    assert isinstance(error, RefResolutionError)
+    assert isinstance(get_wrapped(func)._doctor_annotation, Annotation)
+
+    # Failures are only reported once.
+    assert warmup() == []
+
+
+def test_set_lazy(schema):
+    set_lazy(True)
+    try:
+        @annotate(schema)
+        def func(a):
+            pass
+    finally:
+        set_lazy(False)
+
+    @annotate(schema)
+    def eager_func(a):
+        pass
+
+    assert isinstance(get_wrapped(func)._doctor_annotation, LazyAnnotation)
+    assert isinstance(get_wrapped(eager_func)._doctor_annotation, Annotation)
+    warmup(func)
@@ -0,0 +1,86 @@
+import asyncio
+import inspect
+
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import add_hook, annotate, get_wrapped, remove_hook
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+            'items': {'type': 'array', 'items': {'type': 'integer'}},
+            'result': {'type': 'integer', 'maximum': 2},
+        }
+    })
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_annotate_coroutine(schema):
+    calls = []
+
+    @annotate(schema, result='result')
+    async def func(a):
+        calls.append(a)
+        await asyncio.sleep(0)
+        return a
+
+    assert inspect.iscoroutinefunction(func)
+    assert get_wrapped(func)._doctor_annotation.func is get_wrapped(func)
+    assert run(func(1)) == 1
+    with pytest.raises(ValidationError):
+        # It should validate arguments before awaiting the coroutine.
+        run(func('bad'))
+    assert calls == [1]
+    with pytest.raises(ValidationError):
+        # It should validate the awaited value, not the coroutine.
+        run(func(3))
+
+
+def test_annotate_coroutine_offload(schema):
+    @annotate(schema, args=['items'], offload_size=2)
+    async def func(items):
+        return items
+
+    loop = asyncio.new_event_loop()
+    try:
+        with mock.patch.object(loop, 'run_in_executor',
+                               wraps=loop.run_in_executor) as run_in_executor:
+            assert loop.run_until_complete(func([1])) == [1]
+            assert not run_in_executor.called
+            assert loop.run_until_complete(func([1, 2, 3])) == [1, 2, 3]
+            assert run_in_executor.call_count == 1
+            with pytest.raises(ValidationError):
+                loop.run_until_complete(func([1, 2, 'bad']))
+    finally:
+        loop.close()
+
+
+def test_annotate_coroutine_hooks(schema):
+    phases = []
+
+    def hook(annotation, phase, start, duration, error):
+        phases.append(phase)
+
+    @annotate(schema, result='result')
+    async def func(a):
+        return a
+
+    add_hook(hook)
+    try:
+        assert run(func(1)) == 1
+    finally:
+        remove_hook(hook)
+    assert phases == ['collect', 'args', 'call', 'result']
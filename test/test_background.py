@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import BackgroundValidator, annotate, get_wrapped
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+            'result': {'type': 'integer', 'maximum': 2},
+        }
+    })
+
+
+def test_background(schema):
+    violations = []
+    background = BackgroundValidator(
+        sink=lambda annotation, result, error: violations.append(
+            (annotation, result, error)))
+
+    @annotate(schema, result='result', background=background)
+    def func(a):
+        return a
+
+    assert func(1) == 1
+    # Invalid results should be returned, and reported to the sink later.
+    assert func(3) == 3
+    background.join()
+    assert background.submitted == 2
+    assert background.validated == 2
+    assert background.violations == 1
+    annotation, result, error = violations[0]
+    assert annotation is get_wrapped(func)._doctor_annotation
+    assert result == 3
+    assert error.validator == 'maximum'
+
+    # Arguments should still be validated synchronously.
+    with pytest.raises(ValidationError):
+        func('bad')
+
+
+@pytest.mark.parametrize('policy, expected', [
+    ('newest', [1, 2]),
+    ('oldest', [3, 4]),
+])
+def test_background_drop_policy(schema, policy, expected):
+    validated = []
+    blocked = threading.Event()
+    release = threading.Event()
+
+    def sink(annotation, result, error):
+        if result == 0:
+            blocked.set()
+            release.wait()
+        else:
+            validated.append(result)
+
+    background = BackgroundValidator(size=2, policy=policy, sink=sink)
+
+    @annotate(schema, args=None, result={'enum': []}, background=background)
+    def func(a):
+        return a
+
+    # Block the worker, so the queue fills up.
+    func(0)
+    blocked.wait()
+    for i in range(1, 5):
+        func(i)
+    release.set()
+    background.join()
+    assert validated == expected
+    assert background.dropped == 2
+
+
+def test_background_invalid(schema):
+    with pytest.raises(ValueError):
+        BackgroundValidator(size=0)
+    with pytest.raises(ValueError):
+        BackgroundValidator(policy='random')
+    with pytest.raises(TypeError):
+        annotate(schema, background='yes')(lambda a: a)
+    with pytest.raises(TypeError):
+        annotate(schema, result={'type': 'array', 'items': {}}, stream=True,
+                 background=True)(lambda a: a)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_background_fork(schema):
+    violations = []
+    background = BackgroundValidator(
+        sink=lambda annotation, result, error: violations.append(result))
+
+    @annotate(schema, result='result', background=background)
+    def func(a):
+        return a
+
+    # Start the workers in the parent.
+    func(3)
+    background.join()
+    assert violations == [3]
+
+    pid = os.fork()
+    if pid == 0:
+        # The child should get its own workers.
+        status = 1
+        try:
+            func(4)
+            deadline = time.time() + 5
+            while violations != [3, 4] and time.time() < deadline:
+                time.sleep(0.01)
+            if violations == [3, 4]:
+                status = 0
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    assert status == 0
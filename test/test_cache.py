@@ -0,0 +1,131 @@
+import threading
+
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import ValidationCache, annotate, get_wrapped
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'string'},
+            'b': {'type': 'integer'},
+        }
+    })
+
+
+def test_validation_cache():
+    cache = ValidationCache(size=2)
+    a = cache.fingerprint({'a': 'x', 'b': 1})
+    assert a == cache.fingerprint({'b': 1, 'a': 'x'})
+    assert a not in cache
+    cache.add(a)
+    assert a in cache
+    assert (cache.hits, cache.misses, cache.bypasses) == (1, 1, 0)
+
+    # Values that compare equal but have different types shouldn't match.
+    assert cache.fingerprint({'b': True}) != cache.fingerprint({'b': 1})
+    assert cache.fingerprint({'b': 1.0}) != cache.fingerprint({'b': 1})
+
+    # Mutable and unhashable values should bypass the cache.
+    assert cache.fingerprint({'a': [1]}) is None
+    assert cache.fingerprint({'a': {}}) is None
+    assert cache.fingerprint({'a': mock.sentinel.value}) is None
+    assert cache.bypasses == 3
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses, cache.bypasses) == (0, 0, 0)
+
+
+def test_validation_cache_lru():
+    cache = ValidationCache(size=2)
+    cache.add('a')
+    cache.add('b')
+    assert 'a' in cache
+    cache.add('c')
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_validation_cache_fifo():
+    cache = ValidationCache(size=2, policy='fifo')
+    cache.add('a')
+    cache.add('b')
+    assert 'a' in cache
+    cache.add('c')
+    assert 'a' not in cache
+    assert 'b' in cache
+    assert 'c' in cache
+
+
+def test_validation_cache_threads():
+    cache = ValidationCache(size=8)
+
+    def worker():
+        for i in range(2000):
+            if i % 16 not in cache:
+                cache.add(i % 16)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 8
+    assert cache.hits + cache.misses == 8000
+
+
+def test_validation_cache_invalid():
+    with pytest.raises(ValueError):
+        ValidationCache(size=0)
+    with pytest.raises(ValueError):
+        ValidationCache(policy='random')
+
+
+def test_annotate_cache(schema):
+    @annotate(schema, cache=True)
+    def func(a, b):
+        return b
+
+    cache = get_wrapped(func)._doctor_annotation.args_cache
+    assert isinstance(cache, ValidationCache)
+    assert func('x', 1) == 1
+    assert func('x', b=1) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Invalid arguments should never be cached.
+    for _ in range(2):
+        with pytest.raises(ValidationError):
+            func('x', 'bad')
+    assert len(cache) == 1
+
+    # Mutable arguments should always be validated.
+    with pytest.raises(ValidationError):
+        func(['x'], 1)
+    assert cache.bypasses == 1
+
+
+def test_annotate_cache_instance(schema):
+    cache = ValidationCache(size=1, policy='fifo')
+
+    @annotate(schema, cache=cache)
+    def func(a, b):
+        pass
+
+    assert get_wrapped(func)._doctor_annotation.args_cache is cache
+    with pytest.raises(TypeError):
+        annotate(schema, cache=mock.sentinel.cache)(func)
+
+
+def test_annotate_cache_disabled(schema):
+    @annotate(schema)
+    def func(a, b):
+        pass
+
+    assert get_wrapped(func)._doctor_annotation.args_cache is None
@@ -0,0 +1,69 @@
+import pytest
+
+from doctor._coerce import get_coercer, get_coercers
+
+
+@pytest.mark.parametrize('schema, value, expected', [
+    ({'type': 'integer'}, '42', 42),
+    ({'type': 'integer'}, '4.2', '4.2'),
+    ({'type': 'integer'}, 42, 42),
+    ({'type': 'integer'}, '-7', -7),
+    ({'type': 'integer'}, '1_000', '1_000'),
+    ({'type': 'integer'}, ' 7\n', ' 7\n'),
+    ({'type': 'integer'}, '7\n', '7\n'),
+    ({'type': 'integer'}, u'\u0661\u0662', u'\u0661\u0662'),
+    ({'type': 'integer'}, '007', '007'),
+    ({'type': 'number'}, '42', 42),
+    ({'type': 'number'}, '-4.5', -4.5),
+    ({'type': 'number'}, '1.5e3', 1500.0),
+    ({'type': 'number'}, 'nan', 'nan'),
+    ({'type': 'number'}, 'inf', 'inf'),
+    ({'type': 'number'}, '1e400', '1e400'),
+    ({'type': 'number'}, '1_000.5', '1_000.5'),
+    ({'type': 'number'}, ' 4.5', ' 4.5'),
+    ({'type': 'number'}, '.5', '.5'),
+    ({'type': 'number'}, u'\u0661.5', u'\u0661.5'),
+    ({'type': 'number'}, 'abc', 'abc'),
+    ({'type': 'boolean'}, 'True', True),
+    ({'type': 'boolean'}, '0', False),
+    ({'type': 'boolean'}, 'no', 'no'),
+    ({'type': ['integer', 'null']}, '7', 7),
+    ({'allOf': [{'type': 'integer'}, {'minimum': 1}]}, '7', 7),
+    ({'type': 'array'}, 'a,b', ['a', 'b']),
+    ({'type': 'array', 'items': {'type': 'integer'}}, '1,2,x', [1, 2, 'x']),
+    ({'type': 'array', 'items': {'type': 'integer'}}, '', []),
+    ({'type': 'array'}, [1], [1]),
+])
+def test_get_coercer(schema, value, expected):
+    assert get_coercer(schema)(value) == expected
+
+
+@pytest.mark.parametrize('schema', [
+    {'type': 'string'},
+    {'type': ['integer', 'string']},
+    {'type': 'object'},
+    {'enum': [1, 2]},
+    True,
+])
+def test_get_coercer_none(schema):
+    assert get_coercer(schema) is None
+
+
+def test_get_coercers():
+    coercers = get_coercers({
+        'a': {'type': 'string'},
+        'b': {'type': 'integer'},
+    })
+    assert list(coercers) == ['b']
+
+
+def test_get_coercer_array_shared():
+    # Compiled collectors are cached by coercer, so arrays of the same type
+    # should share one.
+    schema = {'type': 'array', 'items': {'type': 'integer'}}
+    coercer = get_coercer(schema)
+    assert get_coercer(dict(schema)) is coercer
+    assert get_coercer({'type': 'array'}) is get_coercer({'type': 'array'})
+    assert get_coercer({'type': 'array', 'items': {'type': 'number'}}) \
+        is not coercer
+    assert coercer(u'1,2') == [1, 2]
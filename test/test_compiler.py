@@ -0,0 +1,170 @@
+import pytest
+from jsonschema import Draft4Validator
+from jsonschema.exceptions import RefResolutionError, ValidationError
+from jsonschema.validators import extend
+
+from doctor._compiler import (
+    Compiler, compile_properties_collector, compile_validator)
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'id': {'type': 'integer', 'minimum': 1},
+            'name': {'type': 'string', 'minLength': 1, 'maxLength': 5},
+            'email': {'type': 'string', 'pattern': '^[^@]+@[^@]+$'},
+            'color': {'enum': ['red', 'green']},
+            'score': {'type': 'number', 'maximum': 10,
+                      'exclusiveMaximum': True, 'multipleOf': 0.5},
+            'tags': {'type': 'array', 'items': {'type': 'string'},
+                     'maxItems': 2, 'uniqueItems': True},
+            'user': {
+                'type': 'object',
+                'properties': {
+                    'id': {'$ref': '#/definitions/id'},
+                    'name': {'$ref': '#/definitions/name'},
+                    'friends': {'type': 'array',
+                                'items': {'$ref': '#/definitions/user'}},
+                },
+                'required': ['id'],
+                'additionalProperties': False,
+            },
+            'either': {'anyOf': [{'type': 'null'},
+                                 {'$ref': '#/definitions/id'}]},
+            'exactly': {'oneOf': [{'type': 'integer'}, {'minimum': 5}]},
+            'never': {'not': {'type': 'string'}},
+            'labels': {
+                'type': 'object',
+                'patternProperties': {'^x-': {'type': 'integer'},
+                                      '-y$': {'minimum': 2}},
+                'additionalProperties': False,
+            },
+            'ip': {'type': 'string', 'format': 'ipv4'},
+            'missing': {'$ref': '#/definitions/nope'},
+        }
+    })
+
+
+# Pairs of (definition name, instance) that are compared against jsonschema.
+INSTANCES = [
+    ('id', 1), ('id', 0), ('id', True), ('id', 1.5), ('id', 'x'),
+    ('name', 'bob'), ('name', ''), ('name', 'bobbybob'), ('name', 1),
+    ('email', 'a@b'), ('email', 'ab'), ('email', None),
+    ('color', 'red'), ('color', 'blue'), ('color', 1),
+    ('score', 9.5), ('score', 10), ('score', 0.3), ('score', False),
+    ('tags', []), ('tags', ['a', 'b']), ('tags', ['a', 'a']),
+    ('tags', ['a', 'b', 'c']), ('tags', [1]), ('tags', {}),
+    ('user', {'id': 1}), ('user', {'id': 1, 'name': 'bob'}), ('user', {}),
+    ('user', {'id': 1, 'other': True}), ('user', []),
+    ('user', {'id': 1, 'friends': [{'id': 2}, {'id': 3, 'friends': []}]}),
+    ('user', {'id': 1, 'friends': [{'id': 2}, {'id': 0}]}),
+    ('either', None), ('either', 1), ('either', 0), ('either', 'x'),
+    ('exactly', 1), ('exactly', 6), ('exactly', 5.5), ('exactly', 'x'),
+    ('never', 1), ('never', 'x'),
+    ('labels', {}), ('labels', {'x-a': 1}), ('labels', {'x-a': '1'}),
+    ('labels', {'x-y': 1}), ('labels', {'a-y': 2}), ('labels', {'a': 1}),
+    ('ip', '1.2.3.4'), ('ip', 'x'),
+]
+
+
+@pytest.mark.parametrize('name,instance', INSTANCES)
+def test_compile_validator_matches_jsonschema(schema, name, instance):
+    """Compiled functions should agree with jsonschema about validity."""
+    subschema = {'$ref': '#/definitions/{}'.format(name)}
+    validate = compile_validator(schema, subschema)
+    expected = schema.validator.is_valid(instance, subschema)
+    assert (validate(instance) is None) == expected
+
+
+def test_compile_validator_path_and_keyword(schema):
+    validate = compile_validator(schema, {'$ref': '#/definitions/user'})
+    assert validate({'id': 1}) is None
+    assert validate([]) == ((), 'type')
+    assert validate({}) == ((), 'required')
+    assert validate({'id': 1, 'name': ''}) == (('name',), 'minLength')
+    assert validate({'id': 1, 'x': 1}) == ((), 'additionalProperties')
+    assert validate({'id': 1, 'friends': [{'id': 2}, {'id': 0}]}) == (
+        ('friends', 1, 'id'), 'minimum')
+
+    validate = compile_validator(schema, {'$ref': '#/definitions/tags'})
+    assert validate(['a', 'a']) == ((), 'uniqueItems')
+    assert validate(['a', 1]) == ((1,), 'type')
+
+
+def test_compile_validator_formats():
+    schema = Schema({
+        'definitions': {
+            'ip': {'type': 'string', 'format': 'ipv4'},
+            'email': {'format': 'email'},
+            'other': {'format': 'unknown'},
+        }
+    }, format_checker=True)
+    for name, valid, invalid in [('ip', '1.2.3.4', '1.2.3'),
+                                 ('email', 'a@b', 'ab')]:
+        subschema = {'$ref': '#/definitions/{}'.format(name)}
+        validate = compile_validator(schema, subschema)
+        assert validate(valid) is None
+        assert validate(invalid) == ((), 'format')
+        assert not schema.validator.is_valid(invalid, subschema)
+        # Formats only apply to strings.
+        assert validate(1) == (((), 'type') if name == 'ip' else None)
+    validate = compile_validator(schema, {'$ref': '#/definitions/other'})
+    assert validate('x') is None
+
+
+def test_compile_validator_unresolvable_ref(schema):
+    """Bad references should only raise when validating, as before."""
+    validate = compile_validator(schema, {'$ref': '#/definitions/missing'})
+    with pytest.raises(RefResolutionError):
+        validate(1)
+
+
+def test_compile_validator_custom_keywords():
+    """Overridden keywords should use the validator's implementation."""
+    def minimum(validator, minimum, instance, schema):
+        if instance != minimum:
+            yield ValidationError('not the minimum')
+
+    validator_cls = extend(Draft4Validator, {'minimum': minimum})
+    schema = Schema({'definitions': {}}, validator_cls=validator_cls)
+    validate = compile_validator(schema, {'minimum': 5})
+    assert validate(5) is None
+    assert validate(6) == ((), 'minimum')
+
+
+def test_compile_validator_empty_subschemas(schema):
+    """Blocks with nothing to check should still be valid Python."""
+    validate = compile_validator(schema, {
+        'type': 'object',
+        'properties': {'a': {'type': 'array', 'items': {}}},
+        'additionalProperties': {},
+    })
+    assert validate({'a': [1, 'x'], 'b': None}) is None
+    assert validate({'a': 1}) == (('a',), 'type')
+
+
+def test_compiler_source(schema):
+    compiler = Compiler(schema)
+    name = compiler.compile({'type': 'object', 'required': ['a']})
+    assert 'def {}(v0):'.format(name) in compiler.source
+    assert compiler.build(name)({'a': 1}) is None
+    assert compiler.build(name)({}) == ((), 'required')
+
+
+def test_compile_properties_collector():
+    collect = compile_properties_collector(['self', 'a', 'b', 'c'],
+                                           {'a': {}, 'c': {}})
+    assert collect(('self', 1, 2, 3), {}) == {'a': 1, 'c': 3}
+    assert collect(('self', 1), {'c': 3, 'd': 4}) == {'a': 1, 'c': 3}
+    assert collect(('self',), {'b': 2}) == {}
+    assert collect(('self', 1, 2, 3, 4), {}) == {'a': 1, 'c': 3}
+
+    collect = compile_properties_collector(['a'], {})
+    assert collect((1,), {'a': 1}) == {}
+
+    collect = compile_properties_collector(['a', 'b'], {'a': {}, 'b': {}},
+                                           {'b': int})
+    assert collect(('1', '2'), {}) == {'a': '1', 'b': 2}
+    assert collect(('1',), {'b': '3'}) == {'a': '1', 'b': 3}
@@ -0,0 +1,148 @@
+import copy
+import marshal
+import threading
+
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import DeltaCache, annotate, get_wrapped
+from doctor._delta import fingerprint
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'name': {'type': 'string', 'pattern': '^[a-z]+$'},
+            'config': {
+                'type': 'object',
+                'properties': {
+                    'name': {'$ref': '#/definitions/name'},
+                    'servers': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'host': {'$ref': '#/definitions/name'},
+                                'port': {'type': 'integer'},
+                            },
+                            'required': ['host'],
+                        },
+                    },
+                },
+                'additionalProperties': {'type': 'integer'},
+            },
+        }
+    })
+
+
+def test_fingerprint():
+    value = {'a': [1, {'b': None}], 'c': 'd'}
+    assert fingerprint(value) == fingerprint(copy.deepcopy(value))
+    assert fingerprint({'a': [1.0, {'b': None}], 'c': 'd'}) != (
+        fingerprint(value))
+    assert fingerprint([True]) != fingerprint([1])
+    assert fingerprint([(1,)]) != fingerprint([[1]])
+    assert fingerprint({'a': object()}) is None
+    assert fingerprint('a' * 1000) != fingerprint('a' * 1001)
+
+
+def test_fingerprint_once():
+    value = {'a': {'b': {'c': [1, 2]}}, 'd': ['x' * 1000]}
+    with mock.patch('marshal.dumps', wraps=marshal.dumps) as dumps:
+        digest = fingerprint(value)
+    # Each dict and list should only be serialized once.
+    assert dumps.call_count == 5
+    assert digest == fingerprint(copy.deepcopy(value))
+
+
+def test_delta_cache(schema):
+    delta = DeltaCache()
+    validate = delta.compile(schema, schema.dereference(
+        {'$ref': '#/definitions/config'}))
+    config = {
+        'name': 'app',
+        'servers': [{'host': 'a', 'port': 1}, {'host': 'b', 'port': 2}],
+        'retries': 3,
+    }
+    assert validate(config) is None
+    assert delta.hits == 0
+
+    # Only the parts that changed should be validated again.
+    config = copy.deepcopy(config)
+    config['servers'][1]['port'] = 3
+    with mock.patch('doctor._delta._Node.validate',
+                    autospec=True, wraps=lambda node, instance: None) as val:
+        assert validate(config) is None
+    # The changed server, and the scalars next to the changed values.
+    validated = [call[0][1] for call in val.call_args_list]
+    assert sorted(validated, key=repr) == ['app', 'b', 3, 3]
+    assert delta.hits == 1
+
+    config['servers'][0]['host'] = 'A'
+    assert validate(config) == (('servers', 0, 'host'), 'pattern')
+    config['servers'][0] = {'port': 1}
+    assert validate(config) == (('servers', 0), 'required')
+    config['servers'][0] = {'host': 'a', 'port': 1}
+    config['retries'] = 'x'
+    assert validate(config) == (('retries',), 'type')
+
+    # Values that can't be fingerprinted should be validated as a whole.
+    config['retries'] = mock.sentinel.retries
+    assert validate(config) == (('retries',), 'type')
+
+    delta.clear()
+    assert len(delta) == 0
+    assert (delta.hits, delta.misses) == (0, 0)
+
+
+def test_delta_cache_size(schema):
+    delta = DeltaCache(size=2)
+    validate = delta.compile(schema, schema.dereference(
+        {'$ref': '#/definitions/config'}))
+    validate({'servers': [{'host': 'a'}, {'host': 'b'}]})
+    assert len(delta) == 2
+    with pytest.raises(ValueError):
+        DeltaCache(size=0)
+
+
+def test_delta_cache_threads(schema):
+    delta = DeltaCache(size=4)
+    validate = delta.compile(schema, schema.dereference(
+        {'$ref': '#/definitions/config'}))
+    failures = []
+
+    def worker():
+        for i in range(500):
+            config = {'name': 'app', 'servers': [{'host': 'a', 'port': i % 8}]}
+            failures.append(validate(config))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == [None] * 2000
+    assert len(delta) == 4
+
+
+def test_annotate_delta(schema):
+    @annotate(schema, args=['config'], delta=True)
+    def func(config):
+        return config
+
+    config = {'name': 'app', 'servers': [{'host': 'a'}]}
+    assert func(config) == config
+    assert func(copy.deepcopy(config)) == config
+    annotation = get_wrapped(func)._doctor_annotation
+    assert annotation.delta.hits == 1
+    with pytest.raises(ValidationError) as exc_info:
+        func({'name': 'App'})
+    assert list(exc_info.value.path) == ['config', 'name']
+
+    with pytest.raises(TypeError):
+        @annotate(schema, args=['config'], delta=mock.sentinel.delta)
+        def bad_func(config):
+            pass
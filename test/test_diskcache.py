@@ -0,0 +1,26 @@
+from doctor import DiskCache
+
+
+def test_disk_cache(tmpdir):
+    path = tmpdir.join('sub', 'test.cache')
+    cache = DiskCache(str(path))
+    assert cache.get('a') is None
+    assert 'a' not in cache
+    cache.save()
+    assert not path.exists()
+
+    cache.set('a', {'b': [1, 2]})
+    assert 'a' in cache
+    cache.save()
+    assert path.exists()
+    assert DiskCache(str(path)).get('a') == {'b': [1, 2]}
+
+
+def test_disk_cache_corrupt(tmpdir):
+    path = tmpdir.join('test.cache')
+    path.write('not a pickle')
+    cache = DiskCache(str(path))
+    assert cache.entries == {}
+    cache.set('a', 1)
+    cache.save()
+    assert DiskCache(str(path)).get('a') == 1
@@ -0,0 +1,81 @@
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import (
+    FunctionMetrics, annotate, get_metrics, get_wrapped, reset_metrics,
+    set_metrics, snapshot_metrics)
+from doctor._metrics import LATENCY_BUCKETS
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+        }
+    })
+
+
+@pytest.fixture
+def metrics_enabled():
+    set_metrics(True)
+    reset_metrics()
+    yield
+    set_metrics(False)
+
+
+def test_metrics(schema, metrics_enabled):
+    @annotate(schema, result={'type': 'integer'})
+    def func(a):
+        return a
+
+    metrics = get_wrapped(func)._doctor_annotation.metrics
+    assert metrics is get_metrics(metrics.name)
+    assert metrics.name.startswith('test_metrics.')
+
+    func(1)
+    func(2)
+    with pytest.raises(ValidationError):
+        func('bad')
+
+    snapshot = snapshot_metrics()[metrics.name]
+    assert snapshot['calls'] == 3
+    assert snapshot['args_validations'] == 3
+    assert snapshot['args_failures'] == 1
+    assert snapshot['result_validations'] == 2
+    assert snapshot['result_failures'] == 0
+    assert snapshot['validation_time'] > 0
+    assert len(snapshot['histogram']) == len(LATENCY_BUCKETS) + 1
+    assert snapshot['histogram'][-1][0] is None
+    assert sum(count for _, count in snapshot['histogram']) == 5
+
+    reset_metrics()
+    assert metrics.calls == 0
+
+
+def test_metrics_disabled(schema):
+    @annotate(schema)
+    def func(a):
+        return a
+
+    metrics = get_wrapped(func)._doctor_annotation.metrics
+    metrics.reset()
+    func(1)
+    assert metrics.calls == 0
+    assert metrics.args_validations == 0
+
+
+def test_measure():
+    metrics = FunctionMetrics('test')
+
+    def fail(value):
+        raise ValidationError('bad')
+
+    assert metrics.measure('args', lambda value: value, 1) == 1
+    with pytest.raises(ValidationError):
+        metrics.measure('result', fail, 1)
+    assert metrics.args_validations == 1
+    assert metrics.args_failures == 0
+    assert metrics.result_validations == 1
+    assert metrics.result_failures == 1
@@ -0,0 +1,99 @@
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import (
+    EveryNth, FirstN, FULL, PASSTHROUGH, Sampled, ValidationMode, annotate,
+    get_mode, get_wrapped, set_mode)
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+        }
+    })
+
+
+@pytest.fixture
+def global_mode():
+    """Restore the global mode after the test."""
+    mode = get_mode()
+    yield
+    set_mode(mode)
+
+
+def count_failures(func, calls):
+    failures = 0
+    for _ in range(calls):
+        try:
+            func('bad')
+        except ValidationError:
+            failures += 1
+    return failures
+
+
+def test_modes(schema):
+    @annotate(schema)
+    def func(a):
+        return a
+
+    annotation = get_wrapped(func)._doctor_annotation
+    assert annotation.mode is None
+    assert count_failures(func, 5) == 5
+
+    annotation.mode = PASSTHROUGH
+    assert func('bad') == 'bad'
+
+    annotation.mode = FULL
+    assert count_failures(func, 5) == 5
+
+    annotation.mode = EveryNth(3)
+    assert count_failures(func, 7) == 3
+
+    annotation.mode = FirstN(2)
+    annotation.call_count = 0
+    assert count_failures(func, 5) == 2
+
+    annotation.mode = Sampled(0.5, random=mock.Mock(side_effect=[0.1, 0.9]))
+    assert count_failures(func, 2) == 1
+
+    # Modes that don't override should_validate validate every call.
+    annotation.mode = ValidationMode()
+    assert count_failures(func, 2) == 2
+
+
+def test_global_mode(schema, global_mode):
+    @annotate(schema)
+    def func(a):
+        return a
+
+    @annotate(schema, mode=FULL)
+    def always_validated(a):
+        return a
+
+    assert get_mode() is FULL
+    set_mode(PASSTHROUGH)
+    assert get_mode() is PASSTHROUGH
+    assert func('bad') == 'bad'
+    with pytest.raises(ValidationError):
+        always_validated('bad')
+
+    set_mode(FULL)
+    with pytest.raises(ValidationError):
+        func('bad')
+
+
+def test_mode_invalid(schema):
+    with pytest.raises(TypeError):
+        set_mode('full')
+    with pytest.raises(TypeError):
+        annotate(schema, mode='full')(lambda a: a)
+    with pytest.raises(ValueError):
+        Sampled(2)
+    with pytest.raises(ValueError):
+        EveryNth(0)
+    with pytest.raises(ValueError):
+        FirstN(-1)
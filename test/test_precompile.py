@@ -0,0 +1,106 @@
+import json
+import warnings
+
+import mock
+import pytest
+
+from doctor._cli import main
+from doctor._precompile import (
+    generate_module, load_module, precompiled_path, schema_hash)
+from doctor._resolver import fetch_document
+from doctor._schema import Schema
+
+
+@pytest.fixture
+def schema_path(tmpdir):
+    tmpdir.join('common.json').write(json.dumps({
+        'definitions': {'name': {'type': 'string'}},
+    }))
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({
+        'definitions': {
+            'id': {'type': 'integer', 'minimum': 1},
+            'item': {
+                'type': 'object',
+                'properties': {
+                    'id': {'$ref': '#/definitions/id'},
+                    'name': {'$ref': 'common.json#/definitions/name'},
+                },
+                'patternProperties': {'^x-': {'$ref': '#/definitions/id'}},
+                'required': ['id'],
+            },
+        },
+    }))
+    return str(path)
+
+
+def test_generate_module(schema_path):
+    schema = Schema.from_file(schema_path, precompiled=None)
+    source = generate_module(schema, name='schema.json')
+    assert repr(schema_hash(schema)) in source
+    # The module shouldn't contain anything specific to where the schema
+    # was when it was generated.
+    assert schema.resolver.base_uri not in source
+    compile(source, 'schema_validators.py', 'exec')
+
+
+def test_from_file_precompiled(schema_path):
+    assert main(['compile', schema_path]) == 0
+
+    with mock.patch('doctor._compiler.Compiler') as mock_compiler:
+        schema = Schema.from_file(schema_path)
+        validate = schema.compile({'$ref': '#/definitions/item'})
+        assert not mock_compiler.called
+    assert validate({'id': 1, 'name': 'a', 'x-a': 2}) is None
+    assert validate({'id': 0}) == (('id',), 'minimum')
+    assert validate({'id': 1, 'name': 1}) == (('name',), 'type')
+    assert validate({'id': 1, 'x-a': 0}) == (('x-a',), 'minimum')
+
+    # Other subschemas should call the precompiled validators.
+    validate = schema.compile({'type': 'array',
+                               'items': {'$ref': '#/definitions/id'}})
+    assert validate([1, 0]) == ((1,), 'minimum')
+
+
+def test_from_file_precompiled_cache_fetches_once(schema_path, tmpdir):
+    """The precompiled module and the disk cache should share the digests
+    of other documents, instead of each fetching them."""
+    assert main(['compile', schema_path]) == 0
+    cache_dir = str(tmpdir.join('cache'))
+    with mock.patch('doctor._schema.fetch_document',
+                    wraps=fetch_document) as mock_fetch:
+        schema = Schema.from_file(schema_path, cache_dir=cache_dir)
+    assert schema.precompiled
+    assert mock_fetch.call_count == 1
+
+
+def test_precompiled_external_change(schema_path, tmpdir):
+    """Changing a document the schema refers to should invalidate the
+    precompiled module, since checks for its definitions are inlined."""
+    assert main(['compile', schema_path]) == 0
+    tmpdir.join('common.json').write(json.dumps({
+        'definitions': {'name': {'type': 'integer'}},
+    }))
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        schema = Schema.from_file(schema_path)
+    assert schema.precompiled == {}
+    assert len(caught) == 1
+    validate = schema.compile({'$ref': '#/definitions/item'})
+    assert validate({'id': 1, 'name': 1}) is None
+    assert validate({'id': 1, 'name': 'a'}) == (('name',), 'type')
+
+
+def test_precompiled_mismatch(schema_path, tmpdir):
+    output = str(tmpdir.join('validators.py'))
+    assert main(['compile', schema_path, '-o', output]) == 0
+    module = load_module(output)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        schema = Schema({'definitions': {}}, precompiled=module)
+    assert schema.precompiled == {}
+    assert len(caught) == 1
+
+
+def test_precompiled_path():
+    assert precompiled_path('/a/schema.json') == '/a/schema_validators.py'
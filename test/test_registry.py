@@ -0,0 +1,154 @@
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import (
+    annotate, get_annotation, get_annotations, get_wrapped, warmup)
+from doctor._schema import Schema
+
+
+def make_schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+            'b': {'type': 'string', 'maxLength': 3},
+        }
+    })
+
+
+def test_get_annotation():
+    schema = make_schema()
+
+    @annotate(schema)
+    def eager(a):
+        pass
+
+    @annotate(schema, lazy=True)
+    def lazy(b):
+        pass
+
+    name = __name__ + '.test_get_annotation.<locals>.'
+    annotation = get_annotation(name + 'eager')
+    assert annotation.func is get_wrapped(eager)
+    # Lazy annotations should be created when they are looked up.
+    annotation = get_annotation(name + 'lazy')
+    assert annotation.args_schema is not None
+    assert get_wrapped(lazy)._doctor_annotation is annotation
+
+    with pytest.raises(KeyError):
+        get_annotation(name + 'missing')
+
+
+def test_get_annotations():
+    schema = make_schema()
+    other_schema = make_schema()
+
+    @annotate(schema, lazy=True)
+    def func_a(a):
+        pass
+
+    @annotate(schema)
+    def func_b(b):
+        pass
+
+    @annotate(other_schema)
+    def func_c(a):
+        pass
+
+    name = __name__ + '.test_get_annotations.<locals>.'
+    annotations = get_annotations(schema)
+    assert sorted(annotations) == [name + 'func_a', name + 'func_b']
+    assert annotations[name + 'func_a'].func is get_wrapped(func_a)
+    assert list(get_annotations(other_schema)) == [name + 'func_c']
+    assert get_annotation(name + 'func_c').func is get_wrapped(func_c)
+
+
+def test_warmup_processes():
+    schema = make_schema()
+
+    @annotate(schema, lazy=True)
+    def func_a(a):
+        return a
+
+    @annotate(schema, lazy=True)
+    def func_b(b):
+        return b
+
+    annotations = warmup(func_a, func_b, processes=2)
+    assert len(annotations) == 2
+    # The compiled validators should have been sent back from the workers,
+    # without giving the schema a cache.
+    assert len(schema.compiled_code) == 2
+    assert schema.cache is None
+    assert func_a(1) == 1
+    assert func_b('abc') == 'abc'
+    with pytest.raises(ValidationError):
+        func_b('abcd')
+
+
+def test_warmup_bad_kwarg():
+    with pytest.raises(TypeError):
+        warmup(workers=2)
+
+
+def test_register_collision():
+    schema = make_schema()
+
+    # Python 2 functions don't have a qualified name, so these would both be
+    # registered as <module>.get.
+    class A(object):
+        def get(self, a):
+            return a
+        get.__qualname__ = 'test_register_collision_get'
+
+    class B(object):
+        def get(self, b):
+            return b
+        get.__qualname__ = 'test_register_collision_get'
+
+    get_a = annotate(schema, is_method=True)(A.__dict__['get'])
+    get_b = annotate(schema, is_method=True)(B.__dict__['get'])
+    assert get_a(None, 1) == 1
+    assert get_b(None, 'abc') == 'abc'
+    name = __name__ + '.test_register_collision_get'
+    with pytest.raises(ValueError):
+        get_annotation(name)
+    assert name not in get_annotations(schema)
+
+
+def test_register_property():
+    schema = make_schema()
+
+    class A(object):
+        @property
+        @annotate(schema, is_method=True)
+        def value(self):
+            return self._value
+
+        @value.setter
+        @annotate(schema, is_method=True, args=['a'])
+        def value(self, a):
+            self._value = a
+
+    a = A()
+    a.value = 1
+    assert a.value == 1
+    with pytest.raises(ValidationError):
+        a.value = 'a'
+    with pytest.raises(ValueError):
+        get_annotation(__name__ + '.test_register_property.<locals>.A.value')
+
+
+def test_register_same_definition():
+    schema = make_schema()
+
+    def make_func():
+        @annotate(schema)
+        def func(a):
+            return a
+        return func
+
+    make_func()
+    func = make_func()
+    name = __name__ + '.test_register_same_definition.<locals>.make_func.'
+    # Functions created again from the same definition replace each other.
+    assert get_annotation(name + '<locals>.func').func is get_wrapped(func)
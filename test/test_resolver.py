@@ -0,0 +1,125 @@
+import json
+
+import mock
+import pytest
+
+from doctor import CachingRefResolver, ResolutionCache
+from doctor._resolver import fetch_document
+from doctor._schema import Schema
+
+
+@pytest.fixture
+def cache():
+    return ResolutionCache(size=4)
+
+
+def test_no_collisions(cache):
+    """Schemas with the same URL shouldn't share resolutions."""
+    integer = Schema({'definitions': {'a': {'type': 'integer'}}},
+                     resolver_cls=lambda *args: CachingRefResolver(
+                         *args, resolution_cache=cache))
+    string = Schema({'definitions': {'a': {'type': 'string'}}},
+                    resolver_cls=lambda *args: CachingRefResolver(
+                        *args, resolution_cache=cache))
+    assert integer.resolve('#/definitions/a')[1] == {'type': 'integer'}
+    assert integer.resolve('#/definitions/a')[1] == {'type': 'integer'}
+    assert cache.hits == 1
+    assert string.resolve('#/definitions/a')[1] == {'type': 'string'}
+    assert cache.hits == 1
+
+
+def test_shared_remote(tmpdir, cache):
+    """Remote documents should only be loaded once for all schemas."""
+    tmpdir.join('common.json').write(json.dumps({
+        'definitions': {'id': {'type': 'integer'}},
+    }))
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({'definitions': {
+        'id': {'$ref': 'common.json#/definitions/id'},
+    }}))
+
+    def resolver_cls(*args):
+        return CachingRefResolver(*args, resolution_cache=cache)
+
+    with mock.patch.object(CachingRefResolver, 'resolve_remote',
+                           side_effect=lambda url: json.loads(
+                               tmpdir.join('common.json').read())) as remote:
+        for _ in range(3):
+            schema = Schema.from_file(str(path), resolver_cls=resolver_cls)
+            assert schema.dereference({'$ref': '#/definitions/id'}) == {
+                'type': 'integer'}
+        assert remote.call_count == 1
+
+
+def test_lru(cache):
+    document = {'definitions': dict((str(i), {'enum': [i]})
+                                    for i in range(6))}
+    for i in range(6):
+        cache.set('', '/definitions/{}'.format(i), document, i)
+    assert len(cache) == 4
+    assert cache.get('', '/definitions/0') is None
+    assert cache.get('', '/definitions/2') == 2
+    cache.set('', '/definitions/6', document, 6)
+    # 2 was used most recently, so 3 should be evicted instead.
+    assert cache.get('', '/definitions/2') == 2
+    assert cache.get('', '/definitions/3') is None
+
+
+def test_invalidate(cache):
+    document = {}
+    cache.set('http://a/', '/x', document, 1)
+    cache.set('http://a/', '/y', document, 2)
+    cache.set('http://b/', '/x', document, 3)
+    cache.invalidate('http://a/#/x')
+    assert len(cache) == 1
+    assert cache.get('http://b/', '/x', document) == 3
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        ResolutionCache(size=0)
+
+
+def test_fetch_document_file(tmpdir):
+    """Unchanged files shouldn't be read again."""
+    path = tmpdir.join('common.json')
+    path.write(json.dumps({'type': 'integer'}))
+    url = 'file:' + str(path)
+    resolver = CachingRefResolver('', {})
+    document, digest = fetch_document(resolver, url)
+    assert document == {'type': 'integer'}
+    with mock.patch('doctor._resolver.open', create=True) as mock_open:
+        assert fetch_document(resolver, url) == (document, digest)
+        assert not mock_open.called
+
+    path.write(json.dumps({'type': 'string', 'minLength': 1}))
+    document, new_digest = fetch_document(resolver, url)
+    assert document == {'type': 'string', 'minLength': 1}
+    assert new_digest != digest
+
+
+def test_fetch_document_http():
+    """Documents fetched over HTTP should be revalidated with their ETag."""
+    url = 'http://example.com/unchanged.json'
+    resolver = CachingRefResolver('', {})
+    first = mock.Mock(status_code=200, headers={'ETag': '"a"'})
+    first.json.return_value = {'type': 'integer'}
+    with mock.patch('doctor._resolver.requests') as mock_requests:
+        mock_requests.get.return_value = first
+        document, digest = fetch_document(resolver, url)
+        assert document == {'type': 'integer'}
+        mock_requests.get.return_value = mock.Mock(status_code=304)
+        assert fetch_document(resolver, url) == (document, digest)
+    mock_requests.get.assert_called_with(
+        url, headers={'If-None-Match': '"a"'})
+
+
+def test_fetch_document_custom_handler():
+    """Documents with a custom handler should be fetched every time."""
+    handler = mock.Mock(return_value={'type': 'integer'})
+    resolver = CachingRefResolver('', {}, handlers={'custom': handler})
+    for _ in range(2):
+        assert fetch_document(resolver, 'custom:a')[0] == {'type': 'integer'}
+    assert handler.call_count == 2
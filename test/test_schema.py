@@ -0,0 +1,292 @@
+import json
+
+import mock
+import pytest
+from jsonschema import Draft4Validator
+from jsonschema.exceptions import RefResolutionError, ValidationError
+
+from doctor import FastValidationError, annotate, get_wrapped
+from doctor._schema import Schema
+
+
+@pytest.fixture
+def schema():
+    return Schema({
+        'definitions': {
+            'id': {'type': 'integer'},
+            'ids': {'type': 'array', 'items': {'$ref': '#/definitions/id'}},
+            'node': {
+                'type': 'object',
+                'properties': {
+                    'id': {'$ref': '#/definitions/id'},
+                    'children': {'type': 'array',
+                                 'items': {'$ref': '#/definitions/node'}},
+                },
+            },
+            'missing': {'$ref': '#/definitions/nope'},
+            'literal': {'enum': [{'$ref': '#/definitions/id'}]},
+        }
+    })
+
+
+def test_dereference(schema):
+    view = schema.dereference({
+        'type': 'object',
+        'properties': {
+            'a': {'$ref': '#/definitions/id'},
+            'b': {'$ref': '#/definitions/ids'},
+        },
+    })
+    assert view == {
+        'type': 'object',
+        'properties': {
+            'a': {'type': 'integer'},
+            'b': {'type': 'array', 'items': {'type': 'integer'}},
+        },
+    }
+    # Inlined definitions should be shared between views.
+    assert view['properties']['a'] is view['properties']['b']['items']
+    assert schema.dereference({'$ref': '#/definitions/id'}) is (
+        view['properties']['a'])
+
+
+def test_dereference_recursive(schema):
+    """Recursive references should be left in place."""
+    view = schema.dereference({'$ref': '#/definitions/node'})
+    assert view['properties']['id'] == {'type': 'integer'}
+    assert view['properties']['children']['items'] == {
+        '$ref': '#/definitions/node'}
+    assert schema.validator.is_valid(
+        {'id': 1, 'children': [{'id': 2, 'children': []}]}, view)
+    assert not schema.validator.is_valid(
+        {'id': 1, 'children': [{'id': 'x'}]}, view)
+
+
+def test_dereference_unresolvable(schema):
+    view = schema.dereference({'$ref': '#/definitions/missing'})
+    assert view == {'$ref': '#/definitions/nope'}
+    with pytest.raises(RefResolutionError):
+        schema.validator.validate(1, view)
+
+
+def test_dereference_ignores_values(schema):
+    """Things that aren't subschemas shouldn't be dereferenced."""
+    view = schema.dereference({'$ref': '#/definitions/literal'})
+    assert view == {'enum': [{'$ref': '#/definitions/id'}]}
+
+
+def test_validate(schema):
+    subschema = {'$ref': '#/definitions/ids'}
+    schema.validate([1, 2], subschema)
+    with pytest.raises(ValidationError) as exc_info:
+        schema.validate([1, 'x'], subschema)
+    assert 'is not of type' in exc_info.value.message
+    with pytest.raises(FastValidationError) as exc_info:
+        schema.validate([1, 'x'], subschema, fast_fail=True)
+    assert list(exc_info.value.path) == [1]
+    assert exc_info.value.validator == 'type'
+
+
+def test_is_valid(schema):
+    assert schema.is_valid([1, 2], {'$ref': '#/definitions/ids'})
+    assert not schema.is_valid([1, 'x'], {'$ref': '#/definitions/ids'})
+
+
+def test_validate_many(schema):
+    errors = schema.validate_many([1, 'x', 2, None],
+                                  {'$ref': '#/definitions/id'})
+    assert errors[0] is None
+    assert isinstance(errors[1], ValidationError)
+    assert errors[1].validator == 'type'
+    assert errors[1].instance == 'x'
+    assert errors[2] is None
+    assert isinstance(errors[3], ValidationError)
+
+
+def test_validate_many_generator(schema):
+    """It should accept any iterable, not just lists."""
+    errors = schema.validate_many((i for i in range(3)),
+                                  {'$ref': '#/definitions/id'})
+    assert errors == [None, None, None]
+
+
+def test_from_file(tmpdir):
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({'definitions': {'id': {'type': 'integer'}}}))
+    schema = Schema.from_file(str(path))
+    assert schema.cache is None
+    assert schema.resolver.resolution_scope.startswith('file:')
+    assert schema.resolve('#/definitions/id')[1] == {'type': 'integer'}
+
+
+def test_from_file_cache(tmpdir):
+    path = tmpdir.join('schema.json')
+    cache_dir = tmpdir.join('cache')
+    path.write(json.dumps({'definitions': {'id': {'type': 'integer'}}}))
+    subschema = {'$ref': '#/definitions/id'}
+
+    schema = Schema.from_file(str(path), cache_dir=str(cache_dir))
+    validate = schema.compile(subschema)
+    assert schema.dereference(subschema) == {'type': 'integer'}
+    schema.save_cache()
+    assert len(cache_dir.listdir()) == 1
+
+    # A new schema should load everything from the cache.
+    with mock.patch('doctor._compiler.Compiler') as mock_compiler, \
+            mock.patch('json.loads') as mock_loads:
+        schema = Schema.from_file(str(path), cache_dir=str(cache_dir))
+        cached_validate = schema.compile(subschema)
+        assert not mock_compiler.called
+        assert not mock_loads.called
+    assert schema.dereference(subschema) == {'type': 'integer'}
+    for instance in (1, 'x', None):
+        assert cached_validate(instance) == validate(instance)
+
+    # Changing the file should invalidate the cache.
+    path.write(json.dumps({'definitions': {'id': {'type': 'string'}}}))
+    schema = Schema.from_file(str(path), cache_dir=str(cache_dir))
+    assert schema.compile(subschema)('x') is None
+    schema.save_cache()
+    assert len(cache_dir.listdir()) == 2
+
+
+def test_from_file_cache_external_change(tmpdir):
+    """Changing a document the schema refers to should invalidate the
+    cache."""
+    common = tmpdir.join('common.json')
+    common.write(json.dumps({'definitions': {'n': {'minimum': 1}}}))
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({
+        'definitions': {'n': {'$ref': 'common.json#/definitions/n'}}}))
+    cache_dir = str(tmpdir.join('cache'))
+    subschema = {'$ref': '#/definitions/n'}
+
+    schema = Schema.from_file(str(path), cache_dir=cache_dir)
+    assert schema.compile(subschema)(2) is None
+    assert schema.dereference(subschema) == {'minimum': 1}
+    schema.save_cache()
+
+    common.write(json.dumps({'definitions': {'n': {'minimum': 5}}}))
+    schema = Schema.from_file(str(path), cache_dir=cache_dir)
+    assert schema.compile(subschema)(2) == ((), 'minimum')
+    assert schema.dereference(subschema) == {'minimum': 5}
+    assert not schema.is_valid(2, subschema)
+
+
+def test_pattern_and_format_tables():
+    raw_schema = {
+        'definitions': {
+            'slug': {'type': 'string', 'pattern': '^[a-z]+$'},
+            'labels': {'patternProperties': {'^x-': {'format': 'email'}}},
+            'bad': {'pattern': '('},
+        }
+    }
+    schema = Schema(raw_schema)
+    # Patterns should be compiled up front, and shared.
+    assert sorted(schema.patterns) == ['^[a-z]+$', '^x-']
+    assert schema.get_pattern('^x-') is schema.patterns['^x-']
+    assert schema.get_pattern('^a') is schema.patterns['^a']
+    # Formats aren't checked by default.
+    assert schema.formats == {'email': None}
+    schema.validate({'x-a': 'ab'}, {'$ref': '#/definitions/labels'})
+
+    schema = Schema(raw_schema, format_checker=True)
+    conforms = schema.formats['email']
+    assert conforms('a@b')
+    assert not conforms('ab')
+    with pytest.raises(ValidationError) as exc_info:
+        schema.validate({'x-a': 'ab'}, {'$ref': '#/definitions/labels'})
+    assert exc_info.value.validator == 'format'
+    with pytest.raises(FastValidationError):
+        schema.validate({'x-a': 'ab'}, {'$ref': '#/definitions/labels'},
+                        fast_fail=True)
+    assert schema.get_format('unknown') is None
+
+    with pytest.raises(TypeError):
+        Schema(raw_schema, format_checker='email')
+
+
+def test_validator_cls_without_format_checker():
+    class Validator(Draft4Validator):
+        def __init__(self, schema, resolver=None):
+            super(Validator, self).__init__(schema, resolver=resolver)
+
+    schema = Schema({'definitions': {'a': {'type': 'integer'}}},
+                    validator_cls=Validator)
+    assert isinstance(schema._validator, Validator)
+    schema.validate(1, {'$ref': '#/definitions/a'})
+    with pytest.raises(ValidationError):
+        schema.validate('1', {'$ref': '#/definitions/a'})
+
+
+def test_intern():
+    schema = Schema({'definitions': {'a': {'type': 'integer'}}})
+
+    @annotate(schema, args=['a'])
+    def func(a):
+        pass
+
+    @annotate(schema, args=['a'])
+    def other_func(a):
+        pass
+
+    # Identical schemas should share one copy, one view and one validator.
+    annotation = get_wrapped(func)._doctor_annotation
+    other_annotation = get_wrapped(other_func)._doctor_annotation
+    assert annotation.args_schema is other_annotation.args_schema
+    assert annotation.args_view is other_annotation.args_view
+    assert annotation.args_validator is other_annotation.args_validator
+    assert annotation.collect_properties is (
+        other_annotation.collect_properties)
+    assert not hasattr(annotation, '__dict__')
+
+    subschema = {'type': 'string'}
+    assert schema.intern(subschema) is subschema
+    assert schema.intern({'type': 'string'}) is subschema
+    assert schema.compile({'type': 'string'}) is schema.compile(subschema)
+
+
+def test_reload():
+    schema = Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+            'b': {'type': 'object', 'properties': {
+                'c': {'$ref': '#/definitions/c'}}},
+            'c': {'type': 'integer'},
+            'd': {'type': 'string'},
+        }
+    })
+
+    @annotate(schema, args=['a'])
+    def uses_a(a):
+        return a
+
+    @annotate(schema, args=['b'])
+    def uses_c(b):
+        return b
+
+    @annotate(schema, args=None, result='d')
+    def uses_d():
+        return 'd'
+
+    annotations = [get_wrapped(func)._doctor_annotation
+                   for func in (uses_a, uses_c, uses_d)]
+    validators = [annotation.args_validator for annotation in annotations]
+    assert annotations[1].dependencies == set(['#/definitions/b',
+                                               '#/definitions/c'])
+    uses_c({'c': 1})
+
+    raw_schema = json.loads(json.dumps(schema.raw_schema))
+    raw_schema['definitions']['c'] = {'type': 'string'}
+    raw_schema['definitions']['e'] = {'type': 'null'}
+    refreshed = schema.reload(raw_schema)
+
+    # Only the annotation that depends on c (through b) should change.
+    assert refreshed == [annotations[1]]
+    assert annotations[0].args_validator is validators[0]
+    assert annotations[1].args_validator is not validators[1]
+    assert uses_c({'c': 'x'}) == {'c': 'x'}
+    with pytest.raises(ValidationError):
+        uses_c({'c': 1})
+    assert schema.resolve('#/definitions/e')[1] == {'type': 'null'}
+    assert schema.validator.schema is raw_schema
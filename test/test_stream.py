@@ -0,0 +1,151 @@
+import io
+import json
+
+import mock
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor._schema import Schema
+from doctor._stream import _Reader
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'row': {
+                'type': 'object',
+                'properties': {'id': {'type': 'integer'}},
+                'required': ['id'],
+            },
+            'rows': {
+                'type': 'array',
+                'items': {'$ref': '#/definitions/row'},
+                'maxItems': 3,
+            },
+            'export': {
+                'type': 'object',
+                'properties': {'rows': {'$ref': '#/definitions/rows'}},
+                'patternProperties': {'^x-': {'type': 'string'}},
+                'additionalProperties': False,
+                'required': ['rows'],
+            },
+            'unique': {'type': 'array', 'uniqueItems': True},
+        }
+    })
+
+
+ROWS = {'$ref': '#/definitions/rows'}
+EXPORT = {'$ref': '#/definitions/export'}
+
+
+def validate(schema, document, subschema, chunk_size=4):
+    """Validate using tiny chunks, so values are split across reads."""
+    data = json.dumps(document).encode('utf-8')
+    schema.validate_stream(io.BytesIO(data), subschema,
+                           chunk_size=chunk_size)
+
+
+def test_validate_stream_array(schema):
+    validate(schema, [], ROWS)
+    validate(schema, [{'id': 1}, {'id': 12345}], ROWS)
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, [{'id': 1}, {'id': 'x'}], ROWS)
+    assert list(exc_info.value.path) == [1, 'id']
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, [{'id': 1}] * 4, ROWS)
+    assert exc_info.value.validator == 'maxItems'
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, {'rows': []}, ROWS)
+    assert exc_info.value.validator == 'type'
+
+
+def test_validate_stream_object(schema):
+    validate(schema, {'rows': [{'id': 1}], 'x-note': 'hi'}, EXPORT)
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, {'rows': [{'id': 1}, {}]}, EXPORT)
+    assert list(exc_info.value.path) == ['rows', 1]
+    assert exc_info.value.validator == 'required'
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, {'x-note': 'hi'}, EXPORT)
+    assert exc_info.value.validator == 'required'
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, {'rows': [], 'x-note': 1}, EXPORT)
+    assert list(exc_info.value.path) == ['x-note']
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, {'rows': [], 'other': 1}, EXPORT)
+    assert exc_info.value.validator == 'additionalProperties'
+
+
+def test_validate_stream_nested(schema):
+    """Arrays and objects inside the document should be streamed too."""
+    document = {'meta': {'tags': ['a', 'b']},
+                'rows': [{'id': 1}, {'id': 2, 'extra': [1, {}]}]}
+    subschema = {'type': 'object', 'properties': {'rows': ROWS}}
+    values = []
+    read_value = _Reader.read_value
+
+    def record(reader):
+        value = read_value(reader)
+        values.append(value)
+        return value
+
+    with mock.patch.object(_Reader, 'read_value', record):
+        validate(schema, document, subschema)
+    assert not [value for value in values if isinstance(value, (dict, list))]
+
+    document['rows'][1]['id'] = 'x'
+    with pytest.raises(ValidationError) as exc_info:
+        validate(schema, document, subschema)
+    assert list(exc_info.value.path) == ['rows', 1, 'id']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3])
+def test_validate_stream_split_numbers(schema, chunk_size):
+    """Numbers split across reads shouldn't be cut short."""
+    numbers = [i + 0.123456 for i in range(20)] + [1e10, -2.5e-3, 10, 0]
+    validate(schema, numbers, {'type': 'array', 'items': {'type': 'number'}},
+             chunk_size=chunk_size)
+    validate(schema, dict(('k{}'.format(i), number)
+                          for i, number in enumerate(numbers)),
+             {'type': 'object', 'additionalProperties': {'type': 'number'},
+              'maxProperties': len(numbers)},
+             chunk_size=chunk_size)
+    validate(schema, 12.5, {'type': 'number'}, chunk_size=chunk_size)
+    with pytest.raises(ValidationError):
+        validate(schema, [1.5, 'x'],
+                 {'type': 'array', 'items': {'type': 'number'}},
+                 chunk_size=chunk_size)
+
+
+def test_validate_stream_fallback(schema):
+    """Schemas that need the whole document should still work."""
+    validate(schema, [1, 2], {'$ref': '#/definitions/unique'})
+    with pytest.raises(ValidationError):
+        validate(schema, [1, 1], {'$ref': '#/definitions/unique'})
+    validate(schema, 12345, {'type': 'integer'})
+    with pytest.raises(ValidationError):
+        validate(schema, 'x', {'type': 'integer'})
+
+
+def test_validate_stream_text(schema):
+    schema.validate_stream(io.StringIO(u' [ {"id": 1} ] '), ROWS)
+
+
+def test_validate_stream_invalid_json(schema):
+    for data in (b'[{"id": 1}', b'[{"id": 1}} ', b'[] []', b''):
+        with pytest.raises(ValueError):
+            schema.validate_stream(io.BytesIO(data), ROWS, chunk_size=4)
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_validate_file(schema, tmpdir, use_mmap):
+    path = tmpdir.join('rows.json')
+    path.write(json.dumps([{'id': i} for i in range(3)]))
+    schema.validate_file(str(path), ROWS, use_mmap=use_mmap)
+    path.write(json.dumps([{'id': 1}, {'id': None}]))
+    with pytest.raises(ValidationError):
+        schema.validate_file(str(path), ROWS, use_mmap=use_mmap)
+    path.write('')
+    with pytest.raises(ValueError):
+        schema.validate_file(str(path), ROWS, use_mmap=use_mmap)
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import annotate
+from doctor._schema import Schema
+
+
+@pytest.fixture
+def schema(tmpdir):
+    # Validating items pushes the scope of common.json onto the resolver,
+    # since patternProperties isn't compiled. If threads shared a resolver,
+    # they would resolve #/definitions/positive against the wrong document.
+    tmpdir.join('common.json').write(json.dumps({
+        'definitions': {
+            'positive': {'type': 'integer', 'minimum': 1},
+            'item': {
+                'type': 'object',
+                'patternProperties': {
+                    '^n': {'$ref': '#/definitions/positive'},
+                },
+            },
+        },
+    }))
+    path = tmpdir.join('schema.json')
+    path.write(json.dumps({
+        'definitions': {
+            'item': {'$ref': 'common.json#/definitions/item'},
+        },
+    }))
+    return Schema.from_file(str(path))
+
+
+def run_threads(func, thread_count, calls):
+    """Call func(i) for i in range(calls), spread over thread_count threads.
+
+    :returns: A tuple of (elapsed seconds, list of results or exceptions).
+    """
+    results = [None] * calls
+
+    def worker(offset):
+        for i in range(offset, calls, thread_count):
+            try:
+                results[i] = func(i)
+            except Exception as exc:
+                results[i] = exc
+
+    threads = [threading.Thread(target=worker, args=(offset,))
+               for offset in range(thread_count)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.time() - start, results
+
+
+def test_validate_from_threads(schema):
+    @annotate(schema, args=None, result='item')
+    def handler(i):
+        # Simulate an I/O bound handler.
+        time.sleep(0.005)
+        return {'n{}'.format(i): i % 4}
+
+    def check(results):
+        for i, result in enumerate(results):
+            if i % 4:
+                assert result == {'n{}'.format(i): i % 4}
+            else:
+                assert type(result) is ValidationError
+                assert list(result.path) == ['n{}'.format(i)]
+
+    calls = 64
+    serial_time, results = run_threads(handler, 1, calls)
+    check(results)
+    parallel_time, results = run_threads(handler, 8, calls)
+    check(results)
+    # Handlers spend most of their time sleeping, so throughput should
+    # scale with the number of threads.
+    assert parallel_time < serial_time / 3
+
+
+def test_thread_local_validators(schema):
+    validators = []
+
+    def worker():
+        validators.append((schema.validator, schema.resolver))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    validator, resolver = validators[0]
+    assert validator is not schema.validator
+    assert resolver is not schema.resolver
+    assert validator.resolver is resolver
+    assert resolver.store is schema.resolver.store
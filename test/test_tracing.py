@@ -0,0 +1,73 @@
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from doctor import PASSTHROUGH, add_hook, annotate, get_wrapped, remove_hook
+from doctor._schema import Schema
+
+
+@pytest.fixture(scope='module')
+def schema():
+    return Schema({
+        'definitions': {
+            'a': {'type': 'integer'},
+        }
+    })
+
+
+@pytest.fixture
+def events():
+    events = []
+
+    def hook(annotation, phase, start, duration, error):
+        assert duration >= 0
+        events.append((annotation, phase, error))
+
+    add_hook(hook)
+    yield events
+    remove_hook(hook)
+
+
+def test_hooks(schema, events):
+    @annotate(schema, result={'type': 'integer'})
+    def func(a):
+        return a
+
+    annotation = get_wrapped(func)._doctor_annotation
+    assert func(1) == 1
+    assert events == [(annotation, 'collect', None),
+                      (annotation, 'args', None),
+                      (annotation, 'call', None),
+                      (annotation, 'result', None)]
+
+    del events[:]
+    with pytest.raises(ValidationError):
+        func('bad')
+    assert [phase for _, phase, _ in events] == ['collect', 'args']
+    assert isinstance(events[-1][2], ValidationError)
+
+
+def test_hooks_call_error(schema, events):
+    @annotate(schema)
+    def func(a):
+        raise KeyError(a)
+
+    with pytest.raises(KeyError):
+        func(1)
+    assert [phase for _, phase, _ in events] == ['collect', 'args', 'call']
+    assert isinstance(events[-1][2], KeyError)
+
+
+def test_hooks_passthrough(schema, events):
+    @annotate(schema, mode=PASSTHROUGH)
+    def func(a):
+        return a
+
+    assert func('bad') == 'bad'
+    assert [phase for _, phase, _ in events] == ['call']
+
+
+def test_remove_hook():
+    with pytest.raises(ValueError):
+        remove_hook(lambda *args: None)
+    with pytest.raises(TypeError):
+        add_hook('hook')